@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""
+Compression ratio against encode and decode throughput of the recording codec, per stream,
+on simulated signals at the maximum sample rates (EEG 256 Hz, IMU 800 Hz, PPG 100 Hz raw,
+25 Hz algo, algorithm results at 1 Hz). Records are encoded in recorder-sized chunks
+(256 KiB); MB/s are of uncompressed records. "max err" is 0 for the lossless settings.
+
+    python benchmarks/bench_codec.py [--seconds 600] [--streams eeg imu ...]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from zenlite_codec import Codec
+from zenlite_recorder import RECORD_DTYPES
+
+CHUNK_BYTES = 256 * 1024
+
+# stream -> (samples per second, samples per packet)
+RATES = {
+    "eeg": (256, 16),
+    "imu": (800, 32),
+    "ppg_raw": (100, 20),
+    "ppg_algo": (25, 5),
+    "algo": (1, 1),
+}
+
+QUANTIZE = {"value": 0.01, "acc": 1e-4, "gyro": 1e-3, "euler": 1e-3}
+
+CODECS = [
+    ("zlib-6 plain", Codec("zlib", 6, delta=False, shuffle=False)),
+    ("zlib-1", Codec("zlib", 1)),
+    ("zlib-6", Codec("zlib", 6)),
+    ("bz2-9", Codec("bz2", 9)),
+    ("lzma-6", Codec("lzma", 6)),
+    ("zlib-6 quant", Codec("zlib", 6, quantize=QUANTIZE)),
+    ("lzma-6 quant", Codec("lzma", 6, quantize=QUANTIZE)),
+]
+
+
+def make_records(stream, seconds, rng):
+    rate, packet = RATES[stream]
+    n = int(seconds * rate) // packet * packet
+    records = np.zeros(n, dtype=RECORD_DTYPES[stream])
+    t = np.arange(n) / rate
+    # one host timestamp per packet, with arrival jitter
+    packet_time = 1.7e9 + t[::packet] + rng.uniform(0.0, 0.01, n // packet)
+    records["time"] = np.repeat(packet_time, packet)
+    records["seq"] = np.repeat(np.arange(n // packet), packet)
+    if stream == "eeg":
+        records["value"] = (20.0 * np.sin(2 * np.pi * 10.0 * t) + 4.0 * np.sin(2 * np.pi * 50.0 * t)
+                            + rng.normal(0.0, 6.0, n))
+    elif stream == "imu":
+        records["acc"] = rng.normal(0.0, 0.01, (n, 3)) + (0.0, 0.0, 1.0)
+        records["gyro"] = rng.normal(0.0, 0.5, (n, 3))
+        records["euler"] = np.cumsum(rng.normal(0.0, 0.05, (n, 3)), axis=0)
+    elif stream == "ppg_raw":
+        pulse = np.sin(2 * np.pi * 1.2 * t)
+        for name, base, amplitude in (("green1_count", 200000, 3000), ("green2_count", 198000, 2900),
+                                      ("ir_count", 150000, 1500), ("red_count", 120000, 1200)):
+            records[name] = base + amplitude * pulse + rng.normal(0, 50, n)
+    elif stream == "ppg_algo":
+        records["hr"] = 70.0 + np.cumsum(rng.normal(0.0, 0.05, n))
+        records["hr_conf"] = rng.integers(90, 100, n)
+        records["spo2"] = 97.5 + rng.normal(0.0, 0.3, n)
+        records["spo2_conf"] = 100
+        records["spo2_progress"] = 100
+    elif stream == "algo":
+        records["stress"] = np.clip(50.0 + np.cumsum(rng.normal(0.0, 2.0, n)), 0.0, 100.0)
+        records["meditation"] = np.nan
+        records["stage"] = -1
+        records["conf"] = np.nan
+        records["drowsiness"] = np.nan
+    return records
+
+
+def run(codec, records):
+    step = max(1, CHUNK_BYTES // records.dtype.itemsize)
+    chunks = [records[i:i + step] for i in range(0, len(records), step)]
+    t0 = time.perf_counter()
+    encoded = [codec.encode(chunk) for chunk in chunks]
+    t1 = time.perf_counter()
+    decoded = [codec.decode(data, records.dtype, len(chunk)) for data, chunk in zip(encoded, chunks)]
+    t2 = time.perf_counter()
+    decoded = np.concatenate(decoded)
+    quantized = [name for name in codec.quantize if name in records.dtype.names]
+    if not quantized:
+        assert decoded.tobytes() == records.tobytes(), "lossless codec changed the records"
+        error = 0.0
+    else:
+        error = max(float(np.nanmax(np.abs(decoded[name].astype(np.float64) - records[name])))
+                    for name in quantized)
+    size = sum(len(data) for data in encoded)
+    return records.nbytes / size, records.nbytes / (t1 - t0) / 1e6, records.nbytes / (t2 - t1) / 1e6, error
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=600.0, help="seconds of recording per stream")
+    parser.add_argument("--streams", nargs="+", default=list(RATES), choices=list(RATES))
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for stream in args.streams:
+        records = make_records(stream, args.seconds, rng)
+        print(f"\n{stream}: {len(records)} records, {records.nbytes / 1e6:.1f} MB raw")
+        print(f"{'codec':>13} | {'ratio':>6} {'enc MB/s':>9} {'dec MB/s':>9} | {'max err':>8}")
+        for name, codec in CODECS:
+            ratio, encode, decode, error = run(codec, records)
+            print(f"{name:>13} | {ratio:>5.2f}x {encode:>9.1f} {decode:>9.1f} | {error:>8.2g}")
+
+
+if __name__ == "__main__":
+    main()
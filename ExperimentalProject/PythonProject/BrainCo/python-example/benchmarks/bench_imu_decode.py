@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""
+Compare the former per-point IMU decoders with the vectorized (N, 3) decoders
+for every IMUSampleRate.
+
+    python benchmarks/bench_imu_decode.py [--packets-per-second 25] [--seconds 2]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from zenlite_sdk import ffi, IMUSampleRate, IMU_SAMPLE_RATE_HZ, ACCData, EulerAngleData
+
+
+def legacy_point3d(c_data):
+    # ACCData / GyroData decoding before the (N, 3) arrays
+    points = ffi.unpack(c_data.data, c_data.size)
+    x = [0.0] * c_data.size
+    y = [0.0] * c_data.size
+    z = [0.0] * c_data.size
+    for i in range(0, c_data.size):
+        x[i] = points[i].x
+        y[i] = points[i].y
+        z[i] = points[i].z
+    return x, y, z
+
+
+def legacy_euler(c_data):
+    return ffi.unpack(c_data.yaw, c_data.size), ffi.unpack(c_data.pitch, c_data.size), ffi.unpack(c_data.roll, c_data.size)
+
+
+def make_packets(size):
+    values = np.random.default_rng(0).standard_normal((size, 3)).astype(np.float32)
+    points = ffi.new("Point3D[]", [tuple(row) for row in values.tolist()])
+    acc = ffi.new("ACCData *", {"sequence_num": 1, "data": points, "size": size})
+    yaw, pitch, roll = [ffi.new("float[]", values[:, i].tolist()) for i in range(3)]
+    euler = ffi.new("EulerAngleData *", {"yaw": yaw, "pitch": pitch, "roll": roll, "size": size})
+    # keep the backing arrays alive for the duration of the benchmark
+    return acc, euler, (points, yaw, pitch, roll)
+
+
+def bench(fn, arg, seconds):
+    # seconds per call, calibrated to roughly `seconds` of wall time
+    timer = timeit.Timer(lambda: fn(arg))
+    number, elapsed = timer.autorange()
+    number = max(number, int(number * seconds / elapsed))
+    return min(timer.repeat(repeat=3, number=number)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--packets-per-second", type=int, default=25, help="BLE notifications per second (default 25)")
+    parser.add_argument("--seconds", type=float, default=0.5, help="time budget per measurement")
+    args = parser.parse_args()
+
+    print(f"{'rate':>6} {'pts/pkt':>8} | {'acc legacy':>11} {'acc numpy':>10} {'x':>6} | "
+          f"{'euler legacy':>12} {'euler numpy':>11} {'x':>6} | {'cpu/s legacy':>12} {'cpu/s numpy':>11}")
+    for rate in IMUSampleRate:
+        if rate not in IMU_SAMPLE_RATE_HZ:
+            continue
+        hz = IMU_SAMPLE_RATE_HZ[rate]
+        size = max(1, hz // args.packets_per_second)
+        acc, euler, _keep = make_packets(size)
+
+        acc_old = bench(legacy_point3d, acc[0], args.seconds)
+        acc_new = bench(ACCData, acc[0], args.seconds)
+        euler_old = bench(legacy_euler, euler[0], args.seconds)
+        euler_new = bench(EulerAngleData, euler[0], args.seconds)
+        packets = hz / size
+        # acc + gyro + euler per second of stream, as a share of one core
+        cpu_old = packets * (2 * acc_old + euler_old)
+        cpu_new = packets * (2 * acc_new + euler_new)
+        print(f"{rate.name:>6} {size:>8} | {acc_old * 1e6:>9.1f}us {acc_new * 1e6:>8.1f}us {acc_old / acc_new:>5.1f}x | "
+              f"{euler_old * 1e6:>10.1f}us {euler_new * 1e6:>9.1f}us {euler_old / euler_new:>5.1f}x | "
+              f"{cpu_old * 100:>11.3f}% {cpu_new * 100:>10.3f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+"""
+Sustained write throughput of the binary SessionRecorder against the former per-packet
+text writers of ZenLiteGUI.save_data_to_file, at the maximum sample rates
+(EEG 256 Hz, IMU 800 Hz acc + gyro, PPG 100 Hz raw + algo, algorithm results at 1 Hz).
+"worst call" is the longest time a single packet kept the caller busy; with the background
+recorder the caller only queues the packet.
+
+    python benchmarks/bench_recorder.py [--seconds 60] [--dir /tmp]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from zenlite_sdk import ffi, ZenLiteSDK, ArrayMode, EEGData, IMUData, PPGData
+from zenlite_recorder import SessionRecorder
+
+EEG_HZ, EEG_PACKET = 256, 16
+IMU_HZ, IMU_PACKET = 800, 32
+PPG_HZ, PPG_PACKET = 100, 20
+
+
+def make_packets():
+    rng = np.random.default_rng(0)
+    keep = []
+
+    def new(c_type, init):
+        value = ffi.new(c_type, init)
+        keep.append(value)
+        return value
+
+    eeg = EEGData(new("EEGData *", {"sequence_num": 1, "sample_rate": EEG_HZ,
+                                    "eeg_data": new("float[]", rng.standard_normal(EEG_PACKET).tolist()),
+                                    "eeg_size": EEG_PACKET})[0], ArrayMode.copy)
+    points = [tuple(p) for p in rng.standard_normal((IMU_PACKET, 3)).tolist()]
+    imu = IMUData(new("IMUData *", {
+        "acc_data": new("ACCData *", {"sequence_num": 1, "data": new("Point3D[]", points), "size": IMU_PACKET}),
+        "gyro_data": new("GyroData *", {"sequence_num": 1, "data": new("Point3D[]", points), "size": IMU_PACKET}),
+        "sample_rate": IMU_HZ})[0])
+    raw = new("PPGRawData[]", [(200000 + i, 199000 + i, 150000 + i, 120000 + i) for i in range(PPG_PACKET)])
+    algo = new("PPGAlgoData[]", PPG_PACKET)
+    ppg = PPGData(new("PPGData *", {"sequence_num": 1, "report_rate": PPG_HZ, "raw_data": raw,
+                                    "raw_data_size": PPG_PACKET, "algo_data": algo,
+                                    "algo_data_size": PPG_PACKET})[0])
+    return eeg, imu, ppg
+
+
+def packet_schedule(seconds):
+    # (kind, count) in arrival order for `seconds` of recording
+    per_second = [("eeg", EEG_HZ // EEG_PACKET), ("imu", IMU_HZ // IMU_PACKET), ("ppg", PPG_HZ // PPG_PACKET), ("algo", 2)]
+    order = []
+    for kind, count in per_second:
+        order.extend((i / count, kind) for i in range(count))
+    order.sort()
+    return [kind for _, kind in order] * int(seconds)
+
+
+class LegacyWriter:
+    """save_data_to_file before the recorder: open, format and close per packet"""
+
+    def __init__(self, base, ext):
+        self.base = base
+        self.ext = ext
+
+    def write(self, kind, eeg, imu, ppg):
+        ts_now = time.time()
+        if kind == "eeg":
+            file_name = self.base + '_eeg' + self.ext
+            if self.ext == '.csv':
+                if not os.path.exists(file_name):
+                    with open(file_name, 'w') as f:
+                        f.write("time,ch0\n")
+                with open(file_name, 'a') as f:
+                    for v in eeg.eeg_data:
+                        f.write(f"{ts_now},{v}\n")
+            else:
+                with open(file_name, 'a', newline='') as f:
+                    json.dump({'time': ts_now, 'data': eeg.eeg_data.tolist(), 'sample_rate': eeg.sample_rate,
+                               'sequence_num': eeg.sequence_num}, f)
+                    f.write("\n")
+        elif kind == "imu":
+            file_name = self.base + '_imu' + self.ext
+            if self.ext == '.csv':
+                if not os.path.exists(file_name):
+                    with open(file_name, 'w') as f:
+                        f.write('time,acc.x,acc.y,acc.z,gyro.x,gyro.y,gyro.z,euler.yaw,euler.pitch,euler.roll\n')
+                parts = [imu.acc, imu.gyro, imu.euler]
+                data_len = next((len(data) for data in parts if data is not None), 0)
+                imu_array = np.full((data_len, 10), np.nan)
+                imu_array[:, 0] = ts_now
+                for i, data in enumerate(parts):
+                    if data is not None:
+                        imu_array[:, i * 3 + 1:i * 3 + 4] = data
+                with open(file_name, 'a') as f:
+                    for i in range(imu_array.shape[0]):
+                        f.write(",".join(str(v) for v in imu_array[i]))
+                        f.write('\n')
+            else:
+                with open(file_name, 'a') as f:
+                    json.dump({'time': ts_now, "sample_rate": imu.sample_rate, "acc": imu.acc_data.to_json(),
+                               "gyro": imu.gyro_data.to_json(), "euler": []}, f)
+                    f.write("\n")
+        elif kind == "ppg":
+            with open(self.base + '_ppg.txt', 'a') as f:
+                json.dump({'time': ts_now, 'sample_rate': ppg.sample_rate,
+                           'raw_data': [vars(i) for i in ppg.raw_data], 'algo_data': [vars(i) for i in ppg.algo_data],
+                           'respiratory': {'rate': "None", 'curve': "None", 'state': "None"}}, f)
+                f.write("\n")
+        else:
+            with open(self.base + '_algo.txt', 'a') as f:
+                json.dump({"stress": 42.0, "time": ts_now}, f)
+                f.write("\n")
+
+    def close(self):
+        pass
+
+
+class RecorderWriter:
+    def __init__(self, base, background=False):
+        self.recorder = SessionRecorder(base, background=background)
+
+    def write(self, kind, eeg, imu, ppg):
+        if kind == "eeg":
+            self.recorder.record_eeg(eeg)
+        elif kind == "imu":
+            self.recorder.record_imu(imu)
+        elif kind == "ppg":
+            self.recorder.record_ppg(ppg)
+        else:
+            self.recorder.record_algo({"stress": 42.0})
+
+    def close(self):
+        self.recorder.close()
+
+
+def run(writer, schedule, packets, folder):
+    wall0, cpu0 = time.perf_counter(), time.process_time()
+    worst = 0
+    for kind in schedule:
+        t0 = time.perf_counter_ns()
+        writer.write(kind, *packets)
+        worst = max(worst, time.perf_counter_ns() - t0)
+    writer.close()
+    wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+    size = sum(os.path.getsize(os.path.join(folder, name)) for name in os.listdir(folder))
+    return wall, cpu, size, worst / 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=int, default=60, help="seconds of recording to write per writer")
+    parser.add_argument("--dir", default=None, help="directory for the temporary files")
+    args = parser.parse_args()
+
+    ZenLiteSDK.set_array_mode(ArrayMode.copy)
+    packets = make_packets()
+    schedule = packet_schedule(args.seconds)
+    print(f"{len(schedule)} packets for {args.seconds} s at EEG {EEG_HZ} Hz, IMU {IMU_HZ} Hz, PPG {PPG_HZ} Hz")
+    print(f"{'writer':>12} | {'wall':>8} {'x realtime':>11} {'packets/s':>10} {'MB/s':>7} | {'cpu/rec s':>9} | {'size':>8} | {'worst call':>10}")
+    writers = [("legacy .txt", lambda base: LegacyWriter(base, ".txt")),
+               ("legacy .csv", lambda base: LegacyWriter(base, ".csv")),
+               ("recorder", RecorderWriter),
+               ("background", lambda base: RecorderWriter(base, background=True))]
+    for name, factory in writers:
+        folder = tempfile.mkdtemp(prefix="bench_recorder_", dir=args.dir)
+        try:
+            wall, cpu, size, worst_us = run(factory(os.path.join(folder, "session")), schedule, packets, folder)
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+        print(f"{name:>12} | {wall:>7.2f}s {args.seconds / wall:>10.0f}x {len(schedule) / wall:>10.0f} "
+              f"{size / wall / 1e6:>7.1f} | {cpu / args.seconds * 100:>8.3f}% | {size / 1e6:>6.1f}MB | {worst_us:>8.0f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+"""
+Per-device callback latency and process CPU of a SessionManager as the number of
+headsets grows. Each simulated device gets its own thread that feeds EEG, IMU, PPG and
+stress packets through the SDK's native callback entry points at the device's real packet
+rates (times --speed), into one DevicePipeline per device.
+
+    python benchmarks/bench_session_scaling.py [--devices 1 2 4 8 16] [--seconds 3] [--speed 1]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from zenlite_sdk import ffi, ZenLiteDevice, IMU_SAMPLE_RATE_HZ
+from zenlite_session import StreamProfile, SessionManager
+
+# native callback entry points, as libzenlite calls them
+_ON_EEG = ZenLiteDevice._ZenLiteDevice__on_eeg_data_internal
+_ON_IMU = ZenLiteDevice._ZenLiteDevice__on_imu_data_internal
+_ON_PPG = ZenLiteDevice._ZenLiteDevice__on_ppg_data_internal
+_ON_STRESS = ZenLiteDevice._ZenLiteDevice__on_stress_internal
+
+EEG_PACKET = 16   # samples per EEG notification at 256 Hz
+IMU_PACKETS_PER_SECOND = 25
+PPG_PACKET = 5    # algo rows per PPG notification at 25 Hz
+
+
+class SimulatedDevice(threading.Thread):
+    def __init__(self, uuid, imu_hz, seconds, speed, stop):
+        super(SimulatedDevice, self).__init__(daemon=True)
+        self.uuid_ptr = ffi.new("char[40]", uuid.encode("utf-8"))
+        self.seconds = seconds
+        self.speed = speed
+        self.stop = stop
+        self.latencies = []
+        rng = np.random.default_rng(hash(uuid) & 0xffff)
+        self._keep = []
+        self.eeg = self._eeg_packet(rng)
+        self.imu = self._imu_packet(rng, imu_hz)
+        self.ppg = self._ppg_packet()
+        # (period, callback, argument) of every stream
+        self.schedule = [(EEG_PACKET / 256.0, _ON_EEG, self.eeg),
+                         (1.0 / IMU_PACKETS_PER_SECOND, _ON_IMU, self.imu),
+                         (PPG_PACKET / 25.0, _ON_PPG, self.ppg),
+                         (1.0, _ON_STRESS, 42.0)]
+
+    def _new(self, c_type, init):
+        value = ffi.new(c_type, init)
+        self._keep.append(value)
+        return value
+
+    def _eeg_packet(self, rng):
+        samples = self._new("float[]", rng.standard_normal(EEG_PACKET).tolist())
+        return self._new("EEGData *", {"sequence_num": 0, "sample_rate": 256.0, "eeg_data": samples, "eeg_size": EEG_PACKET})
+
+    def _imu_packet(self, rng, imu_hz):
+        size = max(1, imu_hz // IMU_PACKETS_PER_SECOND)
+        points = [tuple(row) for row in rng.standard_normal((size, 3)).tolist()]
+        acc = self._new("ACCData *", {"data": self._new("Point3D[]", points), "size": size})
+        gyro = self._new("GyroData *", {"data": self._new("Point3D[]", points), "size": size})
+        return self._new("IMUData *", {"acc_data": acc, "gyro_data": gyro, "sample_rate": float(imu_hz)})
+
+    def _ppg_packet(self):
+        algo = self._new("PPGAlgoData[]", PPG_PACKET)
+        return self._new("PPGData *", {"algo_data": algo, "algo_data_size": PPG_PACKET, "report_rate": 25.0})
+
+    def run(self):
+        start = time.perf_counter()
+        due = [start] * len(self.schedule)
+        while not self.stop.is_set() and time.perf_counter() - start < self.seconds:
+            i = min(range(len(due)), key=due.__getitem__)
+            delay = due[i] - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            period, callback, arg = self.schedule[i]
+            t0 = time.perf_counter_ns()
+            callback(self.uuid_ptr, arg)
+            self.latencies.append(time.perf_counter_ns() - t0)
+            due[i] += period / self.speed
+
+
+def run(n, seconds, speed, imu_hz):
+    session = SessionManager(StreamProfile())
+    stop = threading.Event()
+    sims = []
+    for i in range(n):
+        uuid = "BENCH-%04d" % i
+        device = ZenLiteDevice.create_zl_device(i, uuid, "bench-%d" % i, -50.0, False, 100)
+        device.callback_stats.reset()
+        # no connect(): the simulated device feeds the callbacks directly
+        session.attach(device)
+        sims.append(SimulatedDevice(uuid, imu_hz, seconds, speed, stop))
+
+    wall0, cpu0 = time.perf_counter(), time.process_time()
+    for sim in sims:
+        sim.start()
+    for sim in sims:
+        sim.join()
+    wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+
+    latencies = np.concatenate([np.asarray(sim.latencies, dtype=np.float64) for sim in sims]) / 1e3
+    per_device_p99 = [np.percentile(sim.latencies, 99) / 1e3 for sim in sims if sim.latencies]
+    eeg_samples = [p.eeg.total for p in session.pipelines.values()]
+    return {
+        "callbacks_per_s": len(latencies) / wall,
+        "p50_us": np.percentile(latencies, 50),
+        "p99_us": np.percentile(latencies, 99),
+        "worst_device_p99_us": max(per_device_p99),
+        "cpu_pct": cpu / wall * 100,
+        "eeg_min_max": (min(eeg_samples), max(eeg_samples)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--seconds", type=float, default=3.0, help="simulated run time per step")
+    parser.add_argument("--speed", type=float, default=1.0, help="packet rate multiplier")
+    parser.add_argument("--imu-rate", type=int, default=50, choices=sorted(IMU_SAMPLE_RATE_HZ.values()))
+    args = parser.parse_args()
+
+    print(f"{'devices':>7} | {'cb/s':>8} {'p50':>8} {'p99':>8} {'worst p99':>10} | {'cpu':>7} | eeg samples/device")
+    for n in args.devices:
+        r = run(n, args.seconds, args.speed, args.imu_rate)
+        print(f"{n:>7} | {r['callbacks_per_s']:>8.0f} {r['p50_us']:>6.1f}us {r['p99_us']:>6.1f}us "
+              f"{r['worst_device_p99_us']:>8.1f}us | {r['cpu_pct']:>6.1f}% | {r['eeg_min_max'][0]}..{r['eeg_min_max'][1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+#!/usr/bin/env python
+"""
+Converts the text recordings of the GUI data logger,
+
+    data/YYYYMMDD/HH-MM-SS_label_{eeg,imu,ppg,algo,evt}.{txt,csv}
+
+into the binary recording format (.zlr, see zenlite_recorder) or into flat CSV files with one
+column per field (<base>_<stream>.columns.csv, readable with pandas.read_csv). Files are
+converted in parallel, one file per task; a file is skipped when it was already converted
+with the same settings and has not changed since (see <out>/.converted.jsonl).
+
+    python convert_legacy.py data [--out converted] [--format zlr|csv] [--codec zlib] [--workers 8]
+
+Labels (_evt files) become the evt stream of the recording; their sample indexes are left
+unknown (-1) and looked up by time when the recording is read. The PPG respiratory fields and
+anything else the recording format has no field for are not converted.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from zenlite_codec import Codec
+from zenlite_recorder import (RECORD_DTYPES, EEG_RECORD_DTYPE, IMU_RECORD_DTYPE, PPG_RAW_RECORD_DTYPE,
+                              PPG_ALGO_RECORD_DTYPE, ALGO_RECORD_DTYPE, EVENT_RECORD_DTYPE, StreamWriter,
+                              event_record, index_path, stream_path)
+
+LEGACY_FILE = re.compile(r"^(?P<base>\d{2}-\d{2}-\d{2}_.*)_(?P<stream>eeg|imu|ppg|algo|evt)\.(?P<ext>txt|csv)$")
+CONVERTED_LOG = ".converted.jsonl"
+_CHUNK_BYTES = 1024 * 1024  # chunk size of the converted streams
+
+
+class LegacyFile:
+    def __init__(self, root, path, match):
+        self.path = path
+        self.rel = os.path.relpath(path, root)
+        self.base = os.path.join(os.path.dirname(self.rel), match.group("base"))  # relative session base
+        self.stream = match.group("stream")
+        self.ext = match.group("ext")
+        stat = os.stat(path)
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime
+
+
+def find_legacy_files(root):
+    files = []
+    for folder, _, names in os.walk(root):
+        for name in sorted(names):
+            match = LEGACY_FILE.match(name)
+            if match:
+                files.append(LegacyFile(root, os.path.join(folder, name), match))
+    return files
+
+
+class ConversionLog:
+    """Append-only log of converted files: relative path, size, mtime and settings"""
+
+    def __init__(self, path):
+        self.path = path
+        self._done = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._done[entry["source"]] = entry
+
+    def is_done(self, legacy, settings):
+        entry = self._done.get(legacy.rel)
+        return (entry is not None and entry["size"] == legacy.size and entry["mtime"] == legacy.mtime
+                and entry["settings"] == settings)
+
+    def add(self, result, settings):
+        entry = {"source": result["source"], "size": result["size"], "mtime": result["mtime"],
+                 "settings": settings, "outputs": result["outputs"], "records": result["records"]}
+        self._done[entry["source"]] = entry
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+
+# parsers: legacy file -> {stream: records}
+def _json_lines(path, counters):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # typically the last line of a session that was still being written
+                counters["skipped_lines"] += 1
+
+
+def _csv_values(path, columns, counters):
+    rows = []
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            try:
+                values = [float(v) for v in row]
+            except ValueError:
+                values = None
+            if values is None or len(values) != columns:
+                counters["skipped_lines"] += 1
+                continue
+            rows.append(values)
+    return np.array(rows, dtype=np.float64).reshape(-1, columns)
+
+
+def _packet_seq(times):
+    # csv rows of one packet share its timestamp
+    return np.concatenate(([0], np.cumsum(np.diff(times) != 0))) if len(times) else np.empty(0, dtype=np.int64)
+
+
+def _number(value, default):
+    return default if value is None or value == "None" else value
+
+
+def _parse_eeg_txt(path, counters):
+    times, seqs, sizes, values = [], [], [], []
+    for record in _json_lines(path, counters):
+        data = record["data"]
+        times.append(record["time"])
+        seqs.append(record.get("sequence_num", 0))
+        sizes.append(len(data))
+        values.extend(data)
+    records = np.empty(len(values), dtype=EEG_RECORD_DTYPE)
+    records["time"] = np.repeat(times, sizes)
+    records["seq"] = np.repeat(seqs, sizes)
+    records["value"] = values
+    return {"eeg": records}
+
+
+def _parse_eeg_csv(path, counters):
+    values = _csv_values(path, 2, counters)
+    records = np.empty(len(values), dtype=EEG_RECORD_DTYPE)
+    records["time"] = values[:, 0]
+    records["seq"] = _packet_seq(values[:, 0])
+    records["value"] = values[:, 1]
+    return {"eeg": records}
+
+
+def _parse_imu_txt(path, counters):
+    blocks = []
+    for record in _json_lines(path, counters):
+        acc, gyro, euler = record.get("acc"), record.get("gyro"), record.get("euler")
+        parts = [np.column_stack((part["x"], part["y"], part["z"])) if part else None for part in (acc, gyro)]
+        parts.append(np.column_stack((euler["yaw"], euler["pitch"], euler["roll"])) if euler else None)
+        size = next((len(part) for part in parts if part is not None), 0)
+        block = np.empty(size, dtype=IMU_RECORD_DTYPE)
+        block["time"] = record["time"]
+        block["seq"] = (acc or gyro or {}).get("sequence_num", 0)
+        for name, part in zip(("acc", "gyro", "euler"), parts):
+            block[name] = part if part is not None and len(part) == size else np.nan
+        blocks.append(block)
+    return {"imu": np.concatenate(blocks) if blocks else np.empty(0, dtype=IMU_RECORD_DTYPE)}
+
+
+def _parse_imu_csv(path, counters):
+    values = _csv_values(path, 10, counters)
+    records = np.empty(len(values), dtype=IMU_RECORD_DTYPE)
+    records["time"] = values[:, 0]
+    records["seq"] = _packet_seq(values[:, 0])
+    records["acc"] = values[:, 1:4]
+    records["gyro"] = values[:, 4:7]
+    records["euler"] = values[:, 7:10]
+    return {"imu": records}
+
+
+def _ppg_block(rows, dtype, timestamp, seq):
+    block = np.zeros(len(rows), dtype=dtype)
+    block["time"] = timestamp
+    block["seq"] = seq
+    for name in dtype.names[2:]:
+        default = np.nan if dtype.fields[name][0].kind == "f" else 0
+        block[name] = [_number(row.get(name), default) for row in rows]
+    return block
+
+
+def _parse_ppg_txt(path, counters):
+    raw, algo = [], []
+    for seq, record in enumerate(_json_lines(path, counters)):
+        if record.get("raw_data"):
+            raw.append(_ppg_block(record["raw_data"], PPG_RAW_RECORD_DTYPE, record["time"], seq))
+        if record.get("algo_data"):
+            algo.append(_ppg_block(record["algo_data"], PPG_ALGO_RECORD_DTYPE, record["time"], seq))
+    return {"ppg_raw": np.concatenate(raw) if raw else np.empty(0, dtype=PPG_RAW_RECORD_DTYPE),
+            "ppg_algo": np.concatenate(algo) if algo else np.empty(0, dtype=PPG_ALGO_RECORD_DTYPE)}
+
+
+def _parse_algo_txt(path, counters):
+    lines = list(_json_lines(path, counters))
+    records = np.empty(len(lines), dtype=ALGO_RECORD_DTYPE)
+    records["seq"] = np.arange(1, len(lines) + 1)
+    for name in ALGO_RECORD_DTYPE.names:
+        if name == "seq":
+            continue
+        default = -1 if name == "stage" else np.nan
+        records[name] = [_number(line.get(name), default) for line in lines]
+    return {"algo": records}
+
+
+def _events(events):
+    records = [event_record(label, timestamp, seq) for seq, (timestamp, label) in enumerate(events, 1)]
+    return {"evt": np.concatenate(records) if records else np.empty(0, dtype=EVENT_RECORD_DTYPE)}
+
+
+def _parse_evt_txt(path, counters):
+    return _events((event["time"], str(event["event"])) for event in _json_lines(path, counters))
+
+
+def _parse_evt_csv(path, counters):
+    events = []
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            try:
+                events.append((float(row[0]), ",".join(row[1:])))
+            except (ValueError, IndexError):
+                counters["skipped_lines"] += 1
+    return _events(events)
+
+
+_PARSERS = {
+    ("eeg", "txt"): _parse_eeg_txt,
+    ("eeg", "csv"): _parse_eeg_csv,
+    ("imu", "txt"): _parse_imu_txt,
+    ("imu", "csv"): _parse_imu_csv,
+    ("ppg", "txt"): _parse_ppg_txt,
+    ("algo", "txt"): _parse_algo_txt,
+    ("evt", "txt"): _parse_evt_txt,
+    ("evt", "csv"): _parse_evt_csv,
+}
+
+
+# writers
+def _write_zlr(out_base, stream, records, meta, codec):
+    path = stream_path(out_base, stream)
+    tmp = path + ".tmp"
+    writer = StreamWriter(tmp, stream, RECORD_DTYPES[stream], meta, flush_bytes=_CHUNK_BYTES, codec=codec)
+    step = max(1, _CHUNK_BYTES // records.dtype.itemsize)
+    for start in range(0, len(records), step):
+        writer.write(records[start:start + step])
+    writer.close()
+    # complete files only ever appear under their final name
+    os.replace(index_path(tmp), index_path(path))
+    os.replace(tmp, path)
+    return path
+
+
+def _columns(records):
+    names, columns = [], []
+    for name in records.dtype.names:
+        values = records[name]
+        if values.ndim == 1:
+            names.append(name)
+            columns.append(values)
+        else:
+            axes = ("yaw", "pitch", "roll") if name == "euler" else ("x", "y", "z")
+            for axis, column in zip(axes, values.reshape(len(values), -1).T):
+                names.append(name + "_" + axis)
+                columns.append(column)
+    return names, columns
+
+
+def _write_csv(out_base, stream, records):
+    path = out_base + "_" + stream + ".columns.csv"
+    names, columns = _columns(records)
+    if any(column.dtype.kind == "S" for column in columns):
+        # event labels: few rows, written with the csv module
+        with open(path + ".tmp", "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(names)
+            for row in zip(*columns):
+                writer.writerow([value.decode("utf-8", "ignore") if isinstance(value, bytes) else value for value in row])
+        os.replace(path + ".tmp", path)
+        return path
+    formats = ["%.17g" if c.dtype.itemsize == 8 and c.dtype.kind == "f" else "%.9g" if c.dtype.kind == "f" else "%d"
+               for c in columns]
+    tmp = path + ".tmp"
+    np.savetxt(tmp, np.column_stack([c.astype(np.float64) for c in columns]) if len(records) else np.empty((0, len(names))),
+               fmt=formats, delimiter=",", header=",".join(names), comments="")
+    os.replace(tmp, path)
+    return path
+
+
+def convert_file(source, rel, stream, ext, out_base, fmt, codec_spec):
+    """Convert one legacy file; runs in a worker process"""
+    t0 = time.perf_counter()
+    counters = {"skipped_lines": 0}
+    os.makedirs(os.path.dirname(out_base) or ".", exist_ok=True)
+    outputs, records = [], 0
+    parser = _PARSERS.get((stream, ext))
+    if parser is None:
+        raise ValueError("no parser for %s files" % rel)
+    codec = Codec.from_spec(codec_spec) if codec_spec else None
+    meta = {"source": os.path.basename(source), "label": os.path.basename(out_base).split("_", 1)[-1]}
+    for out_stream, out_records in parser(source, counters).items():
+        if not len(out_records):
+            continue
+        if fmt == "zlr":
+            outputs.append(_write_zlr(out_base, out_stream, out_records, meta, codec))
+        else:
+            outputs.append(_write_csv(out_base, out_stream, out_records))
+        records += len(out_records)
+    stat = os.stat(source)
+    return {
+        "source": rel,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "outputs": [os.path.basename(path) for path in outputs],
+        "bytes_out": sum(os.path.getsize(path) for path in outputs if os.path.exists(path)),
+        "records": records,
+        "skipped_lines": counters["skipped_lines"],
+        "seconds": time.perf_counter() - t0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("root", help="folder of the legacy recordings, e.g. data")
+    parser.add_argument("--out", default=None, help="output folder (default: next to the legacy files)")
+    parser.add_argument("--format", choices=("zlr", "csv"), default="zlr")
+    parser.add_argument("--codec", choices=("none", "zlib", "bz2", "lzma"), default="none",
+                        help="chunk compression of .zlr outputs")
+    parser.add_argument("--level", type=int, default=6)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--force", action="store_true", help="convert files that were converted before")
+    args = parser.parse_args(argv)
+
+    out = args.out or args.root
+    os.makedirs(out, exist_ok=True)
+    codec_spec = Codec(args.codec, args.level).spec() if args.format == "zlr" and args.codec != "none" else None
+    settings = {"format": args.format, "codec": codec_spec}
+    log = ConversionLog(os.path.join(out, CONVERTED_LOG))
+    files = find_legacy_files(args.root)
+    todo = [legacy for legacy in files if args.force or not log.is_done(legacy, settings)]
+    total_bytes = sum(legacy.size for legacy in todo)
+    print("%d legacy files, %d to convert (%.1f MB), %d already converted"
+          % (len(files), len(todo), total_bytes / 1e6, len(files) - len(todo)))
+    if not todo:
+        return 0
+
+    wall0 = time.perf_counter()
+    done_bytes = out_bytes = records = skipped = failed = 0
+    task_seconds = 0.0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(convert_file, legacy.path, legacy.rel, legacy.stream, legacy.ext,
+                               os.path.join(out, legacy.base), args.format, codec_spec): legacy
+                   for legacy in todo}
+        for future in as_completed(futures):
+            legacy = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                failed += 1
+                print("FAILED %s: %s" % (legacy.rel, e), file=sys.stderr)
+                continue
+            log.add(result, settings)
+            done_bytes += legacy.size
+            out_bytes += result["bytes_out"]
+            records += result["records"]
+            skipped += result["skipped_lines"]
+            task_seconds += result["seconds"]
+            elapsed = time.perf_counter() - wall0
+            print("[%5.1f%% %7.1f s] %-50s %8d records %7.1f MB/s" % (
+                done_bytes / total_bytes * 100 if total_bytes else 100.0, elapsed, legacy.rel, result["records"],
+                legacy.size / result["seconds"] / 1e6 if result["seconds"] > 0 else 0.0))
+    wall = time.perf_counter() - wall0
+    print("converted %d files in %.1f s: %.1f MB in (%.1f MB/s), %.1f MB out, %d records (%.0f records/s), "
+          "%d skipped lines, %d failed, %.1fx parallel speedup"
+          % (len(todo) - failed, wall, done_bytes / 1e6, done_bytes / wall / 1e6, out_bytes / 1e6,
+             records, records / wall, skipped, failed, task_seconds / wall if wall > 0 else 0.0))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
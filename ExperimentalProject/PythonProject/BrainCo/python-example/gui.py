@@ -11,14 +11,14 @@ import json
 from gui_widgets import MainWindow, QT_THEME
 from data_logger_widget import DataLoggerWidget
 from zenlite_sdk import *
+from zenlite_recorder import SessionRecorder, RECORDING_EXT
+from zenlite_acquisition import AcquisitionCore
+from zenlite_filter import FilterBank, EEG_FILTERS
+from gui_scheduler import RefreshScheduler
 
-_DEBUG_EEG_MODE = False
-
-EEG_WINDOW_TIME = 5  # second
-IMU_WINDOW_TIME = 5  # second
-PPG_WINDOW_TIME = 30  # second
-ALGO_WINDOW_TIME = 2000  # second
-SLEEP_STAGE_WINDOW = 30
+PLOT_FRAME_BUDGET = 0.015  # second of redraw per plot timer tick
+PLOT_MIN_INTERVAL = 0.1  # second
+PLOT_MAX_INTERVAL = 1.0  # second
 
 DATA_PATH = "data"
 ICON = "logo.ico"
@@ -29,6 +29,10 @@ class ListenerMetaClass(type(QObject), type(ZenLiteDeviceListener)):
 
 
 class DeviceListener(QObject, ZenLiteDeviceListener, metaclass=ListenerMetaClass):
+    """
+    Observer of the AcquisitionCore of the connected device: re-emits packets as Qt signals
+    and passes device state to the GUI. Buffering and recording happen in the core.
+    """
     eeg_update_signal = Signal(object)
     imu_update_signal = Signal(object)
     ppg_update_signal = Signal(object)
@@ -38,36 +42,6 @@ class DeviceListener(QObject, ZenLiteDeviceListener, metaclass=ListenerMetaClass
     def __init__(self, gui):
         super(DeviceListener, self).__init__()
         self._gui = gui
-        self._meditation_buffer = None
-        self._stress_buffer = None
-        self._eeg_buffer = None
-        self._imu_buffer = {"acc": None, "gyro": None, "euler": None}
-        self._ppg_algo_buffer = {
-            "hr": None,
-            "rr": None,
-            "spo2": None,
-            "activity": None,
-            "hrv": None,
-            "hrv_stress": None,
-            "stress": None,
-        }
-        self._ppg_raw_buffer = {
-            "green1_count": None,
-            "green2_count": None,
-            "ir_count": None,
-            "red_count": None,
-        }
-        self._ppg_respiratory_rate = None
-        self._ppg_respiratory_buffer = None
-        self._sleep_stage_buffer = {
-            "time": None,
-            "stage": None,
-            "conf": None,
-            "drowsiness": None,
-        }
-        self._eeg_sample_rate = 0
-        self._imu_sample_rate = 0
-        self._ppg_sample_rate = 0
 
     @logwrap
     def on_device_info_ready(self, device_info):
@@ -75,105 +49,12 @@ class DeviceListener(QObject, ZenLiteDeviceListener, metaclass=ListenerMetaClass
 
     def on_eeg_data(self, eeg_data):
         self.eeg_update_signal.emit(eeg_data)
-        self._eeg_sample_rate = eeg_data.sample_rate
-        window_size = EEG_WINDOW_TIME * eeg_data.sample_rate
-        if self._eeg_buffer is None:
-            self._eeg_buffer = np.array(eeg_data.eeg_data)
-        else:
-            self._eeg_buffer = trim_data(np.concatenate([self._eeg_buffer, eeg_data.eeg_data], 0), 0, window_size)
 
     def on_imu_data(self, imu_data):
         self.imu_update_signal.emit(imu_data)
-        self._imu_sample_rate = imu_data.sample_rate
-        window_size = IMU_WINDOW_TIME * imu_data.sample_rate
-        if imu_data.acc_data is not None:
-            acc = [imu_data.acc_data.x, imu_data.acc_data.y, imu_data.acc_data.z]
-            if self._imu_buffer['acc'] is None:
-                self._imu_buffer['acc'] = np.array(acc)
-            else:
-                self._imu_buffer['acc'] = trim_data(np.concatenate([self._imu_buffer['acc'], acc], 1), 1, window_size)
-        if imu_data.gyro_data is not None:
-            gyro = [imu_data.gyro_data.x, imu_data.gyro_data.y, imu_data.gyro_data.z]
-            if self._imu_buffer['gyro'] is None:
-                self._imu_buffer['gyro'] = np.array(gyro)
-            else:
-                self._imu_buffer['gyro'] = trim_data(np.concatenate([self._imu_buffer['gyro'], gyro], 1), 1, window_size)
-        if imu_data.euler_angle_data is not None:
-            euler = [imu_data.euler_angle_data.yaw, imu_data.euler_angle_data.pitch, imu_data.euler_angle_data.roll]
-            if self._imu_buffer['euler'] is None:
-                self._imu_buffer['euler'] = np.array(euler)
-            else:
-                self._imu_buffer['euler'] = trim_data(np.concatenate([self._imu_buffer['euler'], euler], 1), 1, window_size)
 
     def on_ppg_data(self, ppg_data):
         self.ppg_update_signal.emit(ppg_data)
-        self._ppg_sample_rate = ppg_data.sample_rate
-        window_size = PPG_WINDOW_TIME * ppg_data.sample_rate
-        self._ppg_respiratory_rate = ppg_data.respiratory_rate
-        if ppg_data.respiratory_curve is not None and len(ppg_data.respiratory_curve) > 0:
-            if self._ppg_respiratory_buffer is None:
-                self._ppg_respiratory_buffer = np.array(ppg_data.respiratory_curve)
-            else:
-                self._ppg_respiratory_buffer = trim_data(np.concatenate([self._ppg_respiratory_buffer, ppg_data.respiratory_curve], 0), 0, window_size)
-        if ppg_data.raw_data is not None:
-            for data in ppg_data.raw_data:
-                if self._ppg_raw_buffer['green1_count'] is None:
-                    self._ppg_raw_buffer['green1_count'] = np.array([data.green1_count])
-                else:
-                    self._ppg_raw_buffer['green1_count'] = trim_data(np.concatenate([self._ppg_raw_buffer['green1_count'], [data.green1_count]], 0), 0, window_size)
-                if self._ppg_raw_buffer['green2_count'] is None:
-                    self._ppg_raw_buffer['green2_count'] = np.array([data.green2_count])
-                else:
-                    self._ppg_raw_buffer['green2_count'] = trim_data(np.concatenate([self._ppg_raw_buffer['green2_count'], [data.green2_count]], 0), 0, window_size)
-                if self._ppg_raw_buffer['ir_count'] is None:
-                    self._ppg_raw_buffer['ir_count'] = np.array([data.ir_count])
-                else:
-                    self._ppg_raw_buffer['ir_count'] = trim_data(np.concatenate([self._ppg_raw_buffer['ir_count'], [data.ir_count]], 0), 0, window_size)
-                if self._ppg_raw_buffer['red_count'] is None:
-                    self._ppg_raw_buffer['red_count'] = np.array([data.red_count])
-                else:
-                    self._ppg_raw_buffer['red_count'] = trim_data(np.concatenate([self._ppg_raw_buffer['red_count'], [data.red_count]], 0), 0, window_size)
-        if ppg_data.algo_data is not None:
-            for data in ppg_data.algo_data:
-                hr = [[data.hr], [data.hr_conf]]
-                rr = [[data.rr], [data.rr_conf]]
-                spo2 = [[data.spo2], [data.spo2_conf]]
-                activity = [data.activity]
-                hrv = [data.hrv]
-                hrv_stress = [data.hrv_stress]
-                stress = [data.stress]
-                if self._ppg_algo_buffer['hr'] is None:
-                    self._ppg_algo_buffer['hr'] = np.array(hr)
-                else:
-                    self._ppg_algo_buffer['hr'] = trim_data(np.concatenate([self._ppg_algo_buffer['hr'], hr], 1), 1, window_size)
-                if data.rr_conf == 100:
-                    if self._ppg_algo_buffer['rr'] is None:
-                        self._ppg_algo_buffer['rr'] = np.array(rr)
-                    else:
-                        self._ppg_algo_buffer['rr'] = trim_data(np.concatenate([self._ppg_algo_buffer['rr'], rr], 1), 1, window_size)
-                if self._ppg_algo_buffer['spo2'] is None:
-                    self._ppg_algo_buffer['spo2'] = np.array(spo2)
-                else:
-                    self._ppg_algo_buffer['spo2'] = trim_data(np.concatenate([self._ppg_algo_buffer['spo2'], spo2], 1), 1, window_size)
-                if self._ppg_algo_buffer['activity'] is None:
-                    self._ppg_algo_buffer['activity'] = np.array(activity)
-                else:
-                    self._ppg_algo_buffer['activity'] = trim_data(np.concatenate([self._ppg_algo_buffer['activity'], activity], 0), 0, window_size)
-                if data.hrv >= 0:
-                    if self._ppg_algo_buffer['hrv'] is None:
-                        self._ppg_algo_buffer['hrv'] = np.array(hrv)
-                    else:
-                        self._ppg_algo_buffer['hrv'] = trim_data(np.concatenate([self._ppg_algo_buffer['hrv'], hrv], 0), 0, window_size)
-                if data.hrv_stress >= 0:
-                    if self._ppg_algo_buffer['hrv_stress'] is None:
-                        self._ppg_algo_buffer['hrv_stress'] = np.array(hrv_stress)
-                    else:
-                        self._ppg_algo_buffer['hrv_stress'] = trim_data(np.concatenate([self._ppg_algo_buffer['hrv_stress'], hrv_stress], 0), 0, window_size)
-                if data.stress >= 0:
-                    if self._ppg_algo_buffer['stress'] is None:
-                        self._ppg_algo_buffer['stress'] = np.array(stress)
-                    else:
-                        self._ppg_algo_buffer['stress'] = trim_data(np.concatenate([self._ppg_algo_buffer['stress'], stress], 0), 0, window_size)
 
     def on_brain_wave(self, brain_wave):
         pass  # print("on_brain_wave not implemented")
@@ -192,55 +73,20 @@ class DeviceListener(QObject, ZenLiteDeviceListener, metaclass=ListenerMetaClass
 
     def on_stress(self, stress):
         self.algo_update_signal.emit({"stress": stress})
-        if self._stress_buffer is None:
-            self._stress_buffer = np.array([stress])
-        else:
-            self._stress_buffer = trim_data(np.concatenate([self._stress_buffer, [stress]], 0), 0, ALGO_WINDOW_TIME)
 
     def on_meditation(self, meditation):
         self.algo_update_signal.emit({"meditation": meditation})
-        if self._meditation_buffer is None:
-            self._meditation_buffer = np.array([meditation])
-        else:
-            self._meditation_buffer = trim_data(np.concatenate([self._meditation_buffer, [meditation]], 0), 0, ALGO_WINDOW_TIME)
 
     def on_sleep_stage(self, stage, conf, drowsiness):
         self.algo_update_signal.emit(dict(zip(['stage', 'conf', 'drowsiness'], [stage, conf, drowsiness])))
-        stage = stage.value
-        for key, value in zip(['time', 'stage', 'conf', 'drowsiness'], [time.time(), stage, conf, drowsiness]):
-            if self._sleep_stage_buffer[key] is None:
-                self._sleep_stage_buffer[key] = np.array([value])
-            else:
-                self._sleep_stage_buffer[key] = trim_data(np.concatenate([self._sleep_stage_buffer[key], [value]], 0), 0, SLEEP_STAGE_WINDOW)
-
-    def get_eeg_buffer_for_plot(self):
-        return self._eeg_sample_rate, self._eeg_buffer if self._eeg_buffer is None else self._eeg_buffer.copy()
-
-    def get_imu_buffer_for_plot(self):
-        return self._imu_sample_rate, self._imu_buffer if self._imu_buffer is None else self._imu_buffer.copy()
-
-    def get_ppg_buffer_for_plot(self):
-        return self._ppg_sample_rate, \
-               self._ppg_raw_buffer if self._ppg_raw_buffer is None else self._ppg_raw_buffer.copy(), \
-               self._ppg_algo_buffer if self._ppg_algo_buffer is None else self._ppg_algo_buffer.copy()
-
-    def get_stress_for_plot(self):
-        return self._stress_buffer if self._stress_buffer is None else self._stress_buffer.copy()
-
-    def get_meditation_for_plot(self):
-        return self._meditation_buffer if self._meditation_buffer is None else self._meditation_buffer.copy()
-
-    def get_sleep_stage_for_plot(self):
-        return self._sleep_stage_buffer
-
-    def get_respiratory_for_plot(self):
-        return self._ppg_sample_rate, self._ppg_respiratory_rate, self._ppg_respiratory_buffer
 
 
 class ZenLiteGUI:
 
     def __init__(self):
         self.app = QApplication(sys.argv)
+        # packets are re-emitted to the Qt thread, so they must own their samples
+        ZenLiteSDK.set_array_mode(ArrayMode.copy)
         # self._view_stack = QStackedWidget()
         # self._view_stack.setFixedSize(_WINDOW_SIZE)
         # self.splash_screen = SplashScreen(self)
@@ -250,19 +96,44 @@ class ZenLiteGUI:
         self.main_window.close_window_signal.connect(self.on_window_close)
         self.main_window.scan_button.clicked.connect(self.on_clicked_scan_button)
         self.main_window.connect_button.clicked.connect(self.on_clicked_connect_button)
-        self.data_logger = DataLoggerWidget(file_exts=['.txt', '.csv'], icon=icon)
+        self.data_logger = DataLoggerWidget(file_exts=[RECORDING_EXT, '.txt', '.csv'], icon=icon)
         self.data_logger.start_signal.connect(self.on_start_data_logging)
         self.data_logger.stop_signal.connect(self.on_stop_data_logging)
         self.data_logger.label_signal.connect(self.on_clicked_add_label)
         self.main_window.tools_menu.addAction("data logger", self.data_logger.show)
         self.data_filename = ""
+        self.recorder = None
 
         self.current_device = None
+        self.current_core = None
         self.current_device_listener = None
 
+        self.plot_scheduler = RefreshScheduler(budget=PLOT_FRAME_BUDGET, min_interval=PLOT_MIN_INTERVAL,
+                                               max_interval=PLOT_MAX_INTERVAL,
+                                               visible=self.main_window.is_plot_visible,
+                                               width=self.main_window.plot_width)
+        for name, snapshot, update in (
+                ("eeg", AcquisitionCore.get_eeg_buffer_for_plot, self.main_window.update_eeg_plot),
+                ("eeg_spectrum", AcquisitionCore.get_eeg_spectrum_for_plot, self.main_window.update_eeg_spectrum_plot),
+                ("imu", AcquisitionCore.get_imu_buffer_for_plot, self.main_window.update_imu_plot),
+                ("ppg_raw", AcquisitionCore.get_ppg_raw_for_plot, self.main_window.update_ppg_raw_plot),
+                ("ppg_algo", AcquisitionCore.get_ppg_algo_for_plot, self.main_window.update_ppg_algo_plot),
+                ("meditation", AcquisitionCore.get_meditation_for_plot, self.main_window.update_meditation_plot),
+                ("stress", AcquisitionCore.get_stress_for_plot, self.main_window.update_stress_plot),
+                ("sleep_stage", AcquisitionCore.get_sleep_stage_for_plot, self.main_window.update_sleep_stage_plot),
+                ("respiratory", AcquisitionCore.get_respiratory_for_plot, self.main_window.update_respiratory_plot)):
+            self.plot_scheduler.add(name, snapshot, update)
+        # a tab that comes into view is drawn at once instead of on the next tick
+        self.main_window.set_on_tab_change_cb(lambda index: self.on_plot_timer_timeout())
+        self.main_window.tools_menu.addAction("plot statistics", self.log_plot_stats)
+        # the EEG plot shows the signal as received unless this is checked
+        self.eeg_filter_action = self.main_window.tools_menu.addAction("filter EEG (50 Hz notch, 1-45 Hz)")
+        self.eeg_filter_action.setCheckable(True)
+        self.eeg_filter_action.toggled.connect(self.on_toggled_eeg_filter)
+
         self.plot_timer = QTimer()
         self.plot_timer.timeout.connect(self.on_plot_timer_timeout)
-        self.plot_timer.start(100)
+        self.plot_timer.start(int(PLOT_MIN_INTERVAL * 1000))
 
     """
     def on_selected_tab_changed(self, tab_index):
@@ -282,12 +153,28 @@ class ZenLiteGUI:
         file_name = "".join([datetime.datetime.now().strftime("%H-%M-%S"), "_", label])
         data_file = os.path.join(folder, file_name)
         self.data_filename = data_file
+        if self.data_logger.current_file_ext() == RECORDING_EXT:
+            device_name = self.current_device.name if self.current_device is not None else None
+            # files are written on the recorder's own thread, the SDK thread only queues packets
+            self.recorder = SessionRecorder(data_file, meta={"label": label, "device": device_name}, background=True,
+                                            segment_seconds=3600)
+            if self.current_core is not None:
+                self.current_core.recorder = self.recorder
 
     def on_stop_data_logging(self):
         self.data_filename = ""
+        recorder, self.recorder = self.recorder, None
+        if self.current_core is not None:
+            self.current_core.recorder = None
+        if recorder is not None:
+            recorder.close(drain=True, timeout=2.0)
+            ZLOG.LOG_INFO("recording stopped: %s" % recorder.io_stats())
 
     def on_clicked_add_label(self, label):
-        if len(self.data_filename):
+        if self.recorder is not None:
+            # stored in the recording with the current sample index of every stream
+            self.recorder.add_event(label)
+        elif len(self.data_filename):
             file_ext = self.data_logger.current_file_ext()
             file_name = self.data_filename + '_evt' + file_ext
             ts_now = time.time()
@@ -303,18 +190,21 @@ class ZenLiteGUI:
                     f.write("\n")
 
     def on_plot_timer_timeout(self):
-        if self.current_device_listener is not None:
-            sr, eeg = self.current_device_listener.get_eeg_buffer_for_plot()
-            self.main_window.update_eeg_plot(sr, eeg)
-            sr, imu = self.current_device_listener.get_imu_buffer_for_plot()
-            self.main_window.update_imu_plot(sr, imu)
-            sr, ppg_raw, ppg_algo = self.current_device_listener.get_ppg_buffer_for_plot()
-            self.main_window.update_ppg_raw_plot(sr, ppg_raw)
-            self.main_window.update_ppg_algo_plot(sr, ppg_algo)
-            self.main_window.update_meditation_plot(self.current_device_listener.get_meditation_for_plot())
-            self.main_window.update_stress_plot(self.current_device_listener.get_stress_for_plot())
-            self.main_window.update_sleep_stage_plot(self.current_device_listener.get_sleep_stage_for_plot())
-            self.main_window.update_respiratory_plot(*self.current_device_listener.get_respiratory_for_plot())
+        if self.current_core is None:
+            return
+        interval = self.plot_scheduler.frame(self.current_core)
+        if int(interval * 1000) != self.plot_timer.interval():
+            self.plot_timer.setInterval(int(interval * 1000))
+
+    def log_plot_stats(self):
+        ZLOG.LOG_INFO("plot refresh: %s" % self.plot_scheduler.stats())
+
+    def eeg_filter(self):
+        return FilterBank(**EEG_FILTERS) if self.eeg_filter_action.isChecked() else None
+
+    def on_toggled_eeg_filter(self, checked):
+        if self.current_core is not None:
+            self.current_core.set_filter("eeg", self.eeg_filter())
 
     def on_clicked_connect_button(self):
         device = self.main_window.dev_list_combobox.currentData()
@@ -327,12 +217,17 @@ class ZenLiteGUI:
                     self.main_window.scan_button.setText("Scan")
                     ZenLiteSDK.stop_scan()
                 self.current_device = device
+                # the core pairs and configures the device, buffers and records; the GUI observes it
+                self.current_core = AcquisitionCore(device, recorder=self.recorder)
+                self.current_core.set_filter("eeg", self.eeg_filter())
                 self.current_device_listener = DeviceListener(self)
+                self.plot_scheduler.reset()
                 self.current_device_listener.eeg_update_signal.connect(self.on_eeg_update)
                 self.current_device_listener.imu_update_signal.connect(self.on_imu_update)
                 self.current_device_listener.ppg_update_signal.connect(self.on_ppg_update)
                 self.current_device_listener.algo_update_signal.connect(self.on_algo_update)
-                self.current_device.set_listener(self.current_device_listener)
+                self.current_core.add_observer(self.current_device_listener)
+                self.current_device.set_listener(self.current_core)
                 self.current_device.connect()
             elif self.main_window.connect_button.text() == "Disconnect":
                 self.main_window.connect_button.setText('Disconnecting')
@@ -357,9 +252,9 @@ class ZenLiteGUI:
         if Connectivity.connected == connectivity:
             self.main_window.connect_button.setText('Disconnect')
             self.main_window.connect_button.setEnabled(True)
-            self.current_device.zl_pair(self.current_device.in_pairing_mode, self.on_dev_pair_response)
         elif Connectivity.disconnected == connectivity:
             self.current_device = None
+            self.current_core = None
             self.current_device_listener.deleteLater()
             self.main_window.connect_button.setText("Connect")
             self.main_window.connect_button.setEnabled(True)
@@ -390,25 +285,6 @@ class ZenLiteGUI:
     def on_dev_orientation_change(self, orientation):
         self.main_window.orientation_label.setText(orientation.name)
 
-    def on_dev_pair_response(self, device, res):
-        print(f"[{device.name}], on_pair_response:", res.success())
-        if _DEBUG_EEG_MODE:
-            from example import dev_analyze_eeg
-            dev_analyze_eeg(device)
-        elif res.success():
-            self.current_device.zl_config_afe(EEGSampleRate.sr256, self.on_afe_response)
-            self.current_device.zl_config_imu(IMUSampleRate.sr50, IMUMode.acc_gyro, self.on_imu_response)
-            self.current_device.zl_config_ppg(PPGReportRate.sr25, PPGMode.algo, 0, 0, self.on_ppg_response)
-
-    def on_afe_response(self, device, res):
-        print(f"[{device.name}], on_afe_response:", res.success())
-
-    def on_imu_response(self, device, res):
-        print(f"[{device.name}], on_imu_response:", res.success())
-
-    def on_ppg_response(self, device, res):
-        print(f"[{device.name}], on_ppg_response:", res.success())
-
     def on_eeg_update(self, eeg_data):
         self.save_data_to_file(eeg=eeg_data)
 
@@ -422,6 +298,8 @@ class ZenLiteGUI:
         self.save_data_to_file(algo=algo_data)
 
     def save_data_to_file(self, eeg=None, imu=None, ppg=None, algo=None):
+        if self.recorder is not None:
+            return  # .zlr recordings are written by the acquisition core, on the SDK thread
         if len(self.data_filename):
             file_ext = self.data_logger.current_file_ext()
             ts_now = time.time()
@@ -436,7 +314,7 @@ class ZenLiteGUI:
                             f.write(f"{ts_now},{v}\n")
                 elif file_ext.__contains__('txt'):
                     with open(file_name, 'a', newline='') as f:
-                        json.dump({'time': ts_now, 'data': eeg.eeg_data, 'sample_rate': eeg.sample_rate, 'sequence_num': eeg.sequence_num}, f)
+                        json.dump({'time': ts_now, 'data': eeg.eeg_data.tolist(), 'sample_rate': eeg.sample_rate, 'sequence_num': eeg.sequence_num}, f)
                         f.write("\n")
             if imu:
                 file_name = self.data_filename + '_imu' + file_ext
@@ -444,22 +322,20 @@ class ZenLiteGUI:
                     if not os.path.exists(file_name):
                         with open(file_name, 'w') as f:
                             f.write('time,acc.x,acc.y,acc.z,gyro.x,gyro.y,gyro.z,euler.yaw,euler.pitch,euler.roll\n')
-                    data_len = len(imu.acc_data.x if imu.acc_data else (imu.gyro_data.x if imu.gyro_data else (imu.euler_angle_data.x if imu.euler_angle_data else [])))
-                    imu_array = np.empty((data_len, 10))
-                    imu_array.fill(np.NaN)
+                    parts = [imu.acc, imu.gyro, imu.euler]
+                    data_len = next((len(data) for data in parts if data is not None), 0)
+                    imu_array = np.full((data_len, 10), np.nan)
                     imu_array[:, 0] = ts_now
-                    for i, data in enumerate([imu.acc_data, imu.gyro_data, imu.euler_angle_data]):
+                    for i, data in enumerate(parts):
                         if data is not None:
-                            imu_array[:, i * 3 + 1] = data.x if data != imu.euler_angle_data else data.yaw
-                            imu_array[:, i * 3 + 2] = data.y if data != imu.euler_angle_data else data.pitch
-                            imu_array[:, i * 3 + 3] = data.z if data != imu.euler_angle_data else data.roll
+                            imu_array[:, i * 3 + 1:i * 3 + 4] = data
                     with open(file_name, 'a') as f:
                         for i in range(imu_array.shape[0]):
                             f.write(",".join(str(v) for v in imu_array[i]))
                             f.write('\n')
                 elif file_ext.__contains__('txt'):
                     with open(file_name, 'a') as f:
-                        json.dump({'time': ts_now, "sample_rate": imu.sample_rate, "acc": vars(imu.acc_data) if imu.acc_data else [], "gyro": vars(imu.gyro_data) if imu.gyro_data else [], "euler": vars(imu.euler_angle_data) if imu.euler_angle_data else []}, f)
+                        json.dump({'time': ts_now, "sample_rate": imu.sample_rate, "acc": imu.acc_data.to_json() if imu.acc_data else [], "gyro": imu.gyro_data.to_json() if imu.gyro_data else [], "euler": imu.euler_angle_data.to_json() if imu.euler_angle_data else []}, f)
                         f.write("\n")
             if ppg:
                 # TODO: save ppg as csv
@@ -481,6 +357,7 @@ class ZenLiteGUI:
                     f.write("\n")
 
     def on_window_close(self):
+        self.on_stop_data_logging()
         if self.current_device is not None:
             self.current_device.disconnect()
 
@@ -489,13 +366,6 @@ class ZenLiteGUI:
         self.main_window.show()
 
 
-def trim_data(buffer, axis, size):
-    size = int(size)
-    if buffer.shape[axis] >= size:
-        buffer = np.delete(buffer, [i for i in range(buffer.shape[axis] - size)], axis)
-    return buffer
-
-
 def get_resource_path(relative_path):
     try:
         base_path = sys._MEIPASS
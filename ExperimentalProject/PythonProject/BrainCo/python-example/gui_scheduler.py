@@ -0,0 +1,104 @@
+import time
+from collections import deque
+
+import numpy as np
+
+
+class RefreshScheduler:
+    """
+    Decides what the GUI redraws on each plot timer tick.
+
+    Every plot is registered with a snapshot method of the device listener, which returns
+    (version, plot arguments) or (version, None) when the window did not change, and the
+    widget method that draws it. A frame skips plots that are not visible and plots whose
+    window did not change since they were last drawn, and stops once `budget` seconds are
+    spent; the plots it did not reach go first in the next frame.
+
+    The frame interval adapts between min_interval and max_interval: it grows by `backoff`
+    while frames overrun the budget and shrinks back by `recover` while they take less than
+    half of it, so the GUI stays responsive on a loaded machine.
+
+      visible(name) -> bool       whether the plot can be seen (e.g. its tab is the current one)
+      width(name) -> int / None   pixel width for decimated windows, None for full windows
+    """
+
+    def __init__(self, budget=0.015, min_interval=0.1, max_interval=1.0, backoff=1.5, recover=0.9,
+                 visible=None, width=None, history=200):
+        self.budget = budget
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.recover = recover
+        self.interval = min_interval
+        self._visible = visible or (lambda name: True)
+        self._width = width or (lambda name: None)
+        self._plots = []  # [name, snapshot, update], in drawing order
+        self._versions = {}
+        self._frame_times = deque(maxlen=history)
+        self._update_times = {}
+        self._counts = dict.fromkeys(("frames", "redrawn", "clean", "hidden", "deferred", "over_budget"), 0)
+
+    def add(self, name, snapshot, update):
+        """snapshot(listener, since[, width]) -> (version, args or None); update(*args) draws"""
+        self._plots.append([name, snapshot, update])
+        self._update_times[name] = [0, 0.0, 0.0]  # count, total, max seconds
+
+    def reset(self):
+        """Forget the drawn versions, e.g. for the listener of a new device"""
+        self._versions.clear()
+
+    def frame(self, listener):
+        """Redraw what is visible and changed, within the budget; returns the next interval in seconds"""
+        start = time.perf_counter()
+        counts = self._counts
+        drawn = []
+        for i, plot in enumerate(self._plots):
+            name, snapshot, update = plot
+            if time.perf_counter() - start >= self.budget:
+                counts["deferred"] += len(self._plots) - i
+                break
+            if not self._visible(name):
+                counts["hidden"] += 1
+                continue
+            width = self._width(name)
+            since = self._versions.get(name, 0)
+            version, args = snapshot(listener, since, width) if width else snapshot(listener, since)
+            if args is None:
+                counts["clean"] += 1
+                continue
+            t0 = time.perf_counter()
+            update(*args)
+            elapsed = time.perf_counter() - t0
+            self._versions[name] = version
+            times = self._update_times[name]
+            times[0] += 1
+            times[1] += elapsed
+            times[2] = max(times[2], elapsed)
+            counts["redrawn"] += 1
+            drawn.append(i)
+        # drawn plots move to the back, so those the budget cut off are first next frame
+        for i in reversed(drawn):
+            self._plots.append(self._plots.pop(i))
+        elapsed = time.perf_counter() - start
+        self._frame_times.append(elapsed)
+        counts["frames"] += 1
+        if elapsed > self.budget:
+            counts["over_budget"] += 1
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+        elif elapsed < self.budget / 2:
+            self.interval = max(self.min_interval, self.interval * self.recover)
+        return self.interval
+
+    def stats(self):
+        """Frame times over the last `history` frames, counters and per-plot draw times"""
+        frames = np.array(self._frame_times) * 1e3
+        stats = dict(self._counts)
+        stats.update({
+            "interval_ms": self.interval * 1e3,
+            "frame_mean_ms": float(frames.mean()) if len(frames) else 0.0,
+            "frame_p95_ms": float(np.percentile(frames, 95)) if len(frames) else 0.0,
+            "frame_max_ms": float(frames.max()) if len(frames) else 0.0,
+            "plots": {name: {"count": count, "mean_ms": total / count * 1e3 if count else 0.0, "max_ms": worst * 1e3}
+                      for name, (count, total, worst) in self._update_times.items()},
+        })
+        return stats
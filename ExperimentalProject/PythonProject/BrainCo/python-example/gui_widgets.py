@@ -3,11 +3,14 @@ from PySide6.QtWidgets import QMainWindow, QHBoxLayout, QVBoxLayout, QLabel, QPu
 from PySide6.QtCore import QSize, Signal
 from PySide6.QtGui import QIcon
 from pyqtgraph import PlotWidget, PlotCurveItem, ViewBox, DateAxisItem
-from scipy import fftpack
 import numpy as np
 
+from zenlite_spectrum import EEG_BANDS
+
 
 QT_THEME = 'dark_teal.xml'
+SPECTRUM_MAX_FREQ = 50  # Hz
+MIN_PLOT_WIDTH = 100  # pixels, decimation width of plots that are hidden or not laid out yet
 
 
 class Dimensions:
@@ -121,19 +124,32 @@ class EEGWidget(QWidget):
         super(EEGWidget, self).__init__()
         self.setLayout(QVBoxLayout())
         raw_plot = PlotWidget(title='Filtered EEG(uV)', labels={'bottom': 'Time(s)'})
-        fft_plot = PlotWidget(title='FFT(uV/Hz)', labels={'bottom': 'Frequency(Hz)'})
+        fft_plot = PlotWidget(title='Spectrum(uV/sqrt(Hz))', labels={'bottom': 'Frequency(Hz)'})
         self.raw_curve = raw_plot.plot(pen=Colors.SINGLE_CURVE)
+        self.raw_plot = raw_plot
         self.fft_curve = fft_plot.plot(pen=Colors.SINGLE_CURVE)
         for plot in [raw_plot, fft_plot]:
             plot.setBackground(Colors.PLOT_BACKGROUND)
             plot.showGrid(x=True, y=True, alpha=0.7)
             self.layout().addWidget(plot)
-
-    def update_plot(self, sr, eeg_data):
+        bands_layout = QHBoxLayout()
+        self.band_labels = {}
+        for band in EEG_BANDS:
+            self.band_labels[band] = QLabel("-")
+            bands_layout.addWidget(QLabel(band + ":"))
+            bands_layout.addWidget(self.band_labels[band])
+        self.layout().addLayout(bands_layout)
+
+    def update_plot(self, sr, x, eeg_data):
         if sr and eeg_data is not None:
-            self.raw_curve.setData(np.arange(0, len(eeg_data))/sr, eeg_data)
-            freqs, mags = calculate_fft(eeg_data, sr)
-            self.fft_curve.setData(freqs, mags)
+            self.raw_curve.setData(x/sr, eeg_data)
+
+    def update_spectrum(self, spectrum):
+        freqs = spectrum['freqs']
+        shown = (freqs > 0) & (freqs < SPECTRUM_MAX_FREQ)
+        self.fft_curve.setData(freqs[shown], np.sqrt(spectrum['psd'][shown]))
+        for band, power in spectrum['bands'].items():
+            self.band_labels[band].setText("%.1f uV^2" % power)
 
 
 class IMUWidget(QWidget):
@@ -222,17 +238,18 @@ class PPGRawWidget(QWidget):
         self.green2_curve = green2_plot.plot(pen=Colors.SINGLE_CURVE)
         self.ir_curve = ir_plot.plot(pen=Colors.SINGLE_CURVE)
         self.red_curve = red_plot.plot(pen=Colors.SINGLE_CURVE)
+        self.plots = [green1_plot, green2_plot, ir_plot, red_plot]
 
         for i, plot in enumerate([green1_plot, green2_plot, ir_plot, red_plot]):
             plot.setBackground(Colors.PLOT_BACKGROUND)
             plot.showGrid(x=True, y=True, alpha=0.7)
             self.layout().addWidget(plot, i % 2, i // 2, 1, 1)
 
-    def update_plot(self, sr, ppg_data):
+    def update_plot(self, sr, x, ppg_data):
         for label, curve in zip(['green1_count', 'green2_count', 'ir_count', 'red_count'],
                                 [self.green1_curve, self.green2_curve, self.ir_curve, self.red_curve]):
             if sr and ppg_data[label] is not None:
-                curve.setData(np.arange(0, len(ppg_data[label]))/sr, ppg_data[label].astype(np.float64))
+                curve.setData(x/sr, ppg_data[label])
 
 
 class MainWindow(QMainWindow):
@@ -306,6 +323,19 @@ class MainWindow(QMainWindow):
             plot.showGrid(x=True, y=True, alpha=0.7)
             algorithm_layout.addWidget(plot)
             algorithm_layout.layout().setStretch(algorithm_layout.count()-1, 2)
+        self.plot_tabs = {
+            "eeg": self.eeg_tab,
+            "eeg_spectrum": self.eeg_tab,
+            "imu": self.imu_tab,
+            "ppg_raw": self.ppg_raw_tab,
+            "ppg_algo": self.ppg_algo_tab,
+        }
+        self.decimated_plots = {
+            "eeg": self.eeg_tab.raw_plot,
+            "ppg_raw": self.ppg_raw_tab.plots[0],
+            "meditation": meditation_plot,
+            "stress": stress_plot,
+        }
 
         # information
         self.connectivity_label = QLabel("-")
@@ -345,26 +375,41 @@ class MainWindow(QMainWindow):
         for label in self.info_keys + self.info_labels:
             label[1].setText("-")
 
-    def update_eeg_plot(self, eeg_sr, eeg_data):
-        self.eeg_tab.update_plot(eeg_sr, eeg_data)
+    def is_plot_visible(self, name):
+        """Plots of the data tabs are visible only on the current tab, the others with the window"""
+        if self.isMinimized() or not self.isVisible():
+            return False
+        tab = self.plot_tabs.get(name)
+        return tab is None or tab is self.data_plot_tabs.currentWidget()
+
+    def plot_width(self, name):
+        """Pixel width of the plot of a decimated window, None for windows plotted as they are"""
+        plot = self.decimated_plots.get(name)
+        return None if plot is None else max(MIN_PLOT_WIDTH, int(plot.getViewBox().width()))
+
+    def update_eeg_plot(self, eeg_sr, x, eeg_data):
+        self.eeg_tab.update_plot(eeg_sr, x, eeg_data)
+
+    def update_eeg_spectrum_plot(self, spectrum):
+        self.eeg_tab.update_spectrum(spectrum)
 
     def update_imu_plot(self, imu_sr, imu_data):
         self.imu_tab.update_plot(imu_sr, imu_data)
 
-    def update_ppg_raw_plot(self, ppg_sr, ppg_data):
-        self.ppg_raw_tab.update_plot(ppg_sr, ppg_data)
+    def update_ppg_raw_plot(self, ppg_sr, x, ppg_data):
+        self.ppg_raw_tab.update_plot(ppg_sr, x, ppg_data)
 
     def update_ppg_algo_plot(self, ppg_sr, ppg_data):
         if ppg_data is not None:
             self.ppg_algo_tab.update_plot(ppg_sr, ppg_data)
 
-    def update_meditation_plot(self, values):
+    def update_meditation_plot(self, x, values):
         if values is not None:
-            self.meditation_curve.setData(values)
+            self.meditation_curve.setData(x, values)
 
-    def update_stress_plot(self, values):
+    def update_stress_plot(self, x, values):
         if values is not None:
-            self.stress_curve.setData(values)
+            self.stress_curve.setData(x, values)
 
     def update_respiratory_plot(self, sr, rate, curve):
         if rate is not None:
@@ -379,10 +424,3 @@ class MainWindow(QMainWindow):
         super(MainWindow, self).closeEvent(event)
         self.close_window_signal.emit()
 
-
-def calculate_fft(data, rate):
-    sig_freq = fftpack.fftfreq(len(data), d=1.0 / rate)
-    sig_fft = fftpack.fft(data)
-    sig_fft = abs(sig_fft) / (rate / 2) / len(data)
-    pidxs = np.where((sig_freq > 0) & (sig_freq < 50))
-    return sig_freq[pidxs], sig_fft[pidxs]
\ No newline at end of file
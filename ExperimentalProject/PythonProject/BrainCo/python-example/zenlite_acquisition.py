@@ -0,0 +1,216 @@
+import time
+
+import numpy as np
+
+from zenlite_recorder import SessionRecorder
+from zenlite_ring import RingBuffer, RingGroup, MinMaxRing
+from zenlite_session import ProfileListener
+from zenlite_spectrum import WelchSpectrum
+
+EEG_WINDOW_TIME = 5  # second
+IMU_WINDOW_TIME = 5  # second
+PPG_WINDOW_TIME = 30  # second
+ALGO_WINDOW_TIME = 2000  # second
+SLEEP_STAGE_WINDOW = 30
+PLOT_WIDTH = 800  # pixels, when the plot's own width is not known
+
+PPG_RAW_CHANNELS = ("green1_count", "green2_count", "ir_count", "red_count")
+SLEEP_STAGE_CHANNELS = ("time", "stage", "conf", "drowsiness")
+
+
+class AcquisitionCore(ProfileListener):
+    """
+    Data path of one device, without Qt: used by the GUI and by the headless daemon.
+
+      - pairs the device once it is connected and applies the StreamProfile (ready, errors)
+      - keeps the sliding windows and the EEG spectrum, read with the get_*_for_plot snapshots
+      - writes every packet to `recorder` (a SessionRecorder, see start_recording()), then
+        forwards it to the observers (see ProfileListener)
+      - filters the windows with `filters`, {"eeg" / "ppg_raw" / "acc" / "gyro": FilterBank};
+        the recorder and the observers get the packets unfiltered. The EEG filter gets 1-D
+        packets, the PPG raw filter (4, n) packets with axis=-1 and the IMU filters the
+        (n, 3) packets of IMUData with axis=0
+
+    Callbacks run on the SDK thread; snapshots, recording and observers may be changed from
+    any other thread. The signature fits SessionManager(pipeline_factory=AcquisitionCore).
+    """
+
+    def __init__(self, device, profile=None, recorder=None, configure=True, filters=None):
+        super(AcquisitionCore, self).__init__(device, profile, recorder, configure)
+        self.filters = {}
+        for stream, bank in (filters or {}).items():
+            self.set_filter(stream, bank)
+        # capacities are in samples; windows given in seconds are sized on the first packet
+        # long windows keep a min/max pyramid and are plotted at about 2 points per pixel
+        self._meditation_buffer = MinMaxRing(ALGO_WINDOW_TIME)
+        self._stress_buffer = MinMaxRing(ALGO_WINDOW_TIME)
+        self._eeg_buffer = MinMaxRing(1, dtype=np.float32)
+        self.eeg_spectrum = WelchSpectrum(average_seconds=EEG_WINDOW_TIME)
+        self._imu_buffer = RingGroup(**{key: RingBuffer(1, channels=3, dtype=np.float32)
+                                        for key in ("acc", "gyro", "euler")})
+        self._ppg_algo_buffer = RingGroup(
+            hr=RingBuffer(1, channels=2),
+            rr=RingBuffer(1, channels=2),
+            spo2=RingBuffer(1, channels=2),
+            activity=RingBuffer(1),
+            hrv=RingBuffer(1),
+            hrv_stress=RingBuffer(1),
+            stress=RingBuffer(1),
+        )
+        self._ppg_raw_buffer = MinMaxRing(1, channels=len(PPG_RAW_CHANNELS))
+        self._ppg_respiratory_rate = None
+        self._ppg_respiratory_buffer = RingBuffer(1, dtype=np.float32)
+        self._sleep_stage_buffer = RingBuffer(SLEEP_STAGE_WINDOW, channels=len(SLEEP_STAGE_CHANNELS))
+        self._eeg_sample_rate = 0
+        self._imu_sample_rate = 0
+        self._ppg_sample_rate = 0
+
+    # recording
+    def start_recording(self, base, meta=None, **recorder_args):
+        """Record from now on into a new SessionRecorder(base, meta, **recorder_args)"""
+        meta = dict(meta or {})
+        meta.setdefault("device", self.device.name if self.device is not None else None)
+        self.stop_recording()
+        self.recorder = SessionRecorder(base, meta=meta, **recorder_args)
+        return self.recorder
+
+    def stop_recording(self, timeout=5.0):
+        """Close the recorder, writing what it still has queued; returns its io_stats()"""
+        recorder, self.recorder = self.recorder, None
+        if recorder is None:
+            return None
+        recorder.close(drain=True, timeout=timeout)
+        return recorder.io_stats()
+
+    def add_event(self, label, timestamp=None):
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.add_event(label, timestamp)
+
+    # data
+    def on_eeg_data(self, eeg_data):
+        self._eeg_sample_rate = eeg_data.sample_rate
+        samples = self._filter("eeg", eeg_data.eeg_data, eeg_data.sample_rate)
+        self._eeg_buffer.resize(max(1, EEG_WINDOW_TIME * eeg_data.sample_rate))
+        self._eeg_buffer.append(samples)
+        if eeg_data.sample_rate:
+            self.eeg_spectrum.feed(samples, eeg_data.sample_rate)
+        self._forward("on_eeg_data", eeg_data)
+
+    def on_imu_data(self, imu_data):
+        self._imu_sample_rate = imu_data.sample_rate
+        with self._imu_buffer.lock:
+            self._imu_buffer.resize(max(1, IMU_WINDOW_TIME * imu_data.sample_rate))
+            for key, data in zip(['acc', 'gyro', 'euler'], [imu_data.acc, imu_data.gyro, imu_data.euler]):
+                if data is not None:
+                    self._imu_buffer[key].append(self._filter(key, data, imu_data.sample_rate).T)
+        self._forward("on_imu_data", imu_data)
+
+    def on_ppg_data(self, ppg_data):
+        self._ppg_sample_rate = ppg_data.sample_rate
+        window_size = max(1, PPG_WINDOW_TIME * ppg_data.sample_rate)
+        self._ppg_respiratory_rate = ppg_data.respiratory_rate
+        if ppg_data.respiratory_curve is not None and len(ppg_data.respiratory_curve) > 0:
+            self._ppg_respiratory_buffer.resize(window_size)
+            self._ppg_respiratory_buffer.append(ppg_data.respiratory_curve)
+        if ppg_data.raw is not None and len(ppg_data.raw):
+            self._ppg_raw_buffer.resize(window_size)
+            raw = np.array([ppg_data.raw[key] for key in PPG_RAW_CHANNELS])
+            self._ppg_raw_buffer.append(self._filter("ppg_raw", raw, ppg_data.sample_rate))
+        if ppg_data.algo is not None:
+            algo = ppg_data.algo
+            buffer = self._ppg_algo_buffer
+            with buffer.lock:
+                buffer.resize(window_size)
+                buffer['hr'].append([algo['hr'], algo['hr_conf']])
+                rr = algo[algo['rr_conf'] == 100]
+                buffer['rr'].append([rr['rr'], rr['rr_conf']])
+                buffer['spo2'].append([algo['spo2'], algo['spo2_conf']])
+                buffer['activity'].append(algo['activity'])
+                for key in ['hrv', 'hrv_stress', 'stress']:
+                    buffer[key].append(algo[key][algo[key] >= 0])
+        self._forward("on_ppg_data", ppg_data)
+
+    def set_filter(self, stream, bank):
+        """Filter the windows of `stream` with the FilterBank `bank` from the next packet on, None: unfiltered"""
+        if stream in ("acc", "gyro") and bank is not None and bank.axis not in (0, -2):
+            raise ValueError("the %s filter gets (n, 3) packets and needs axis=0" % stream)
+        filters = dict(self.filters)  # replaced, not changed, while the SDK thread reads it
+        if bank is None:
+            filters.pop(stream, None)
+        else:
+            filters[stream] = bank
+        self.filters = filters
+
+    def _filter(self, stream, samples, sample_rate):
+        bank = self.filters.get(stream)
+        if bank is None or not sample_rate:
+            return samples
+        return bank.filter(samples, sample_rate)
+
+    def on_stress(self, stress):
+        self._stress_buffer.append(stress)
+        self._forward("on_stress", stress)
+
+    def on_meditation(self, meditation):
+        self._meditation_buffer.append(meditation)
+        self._forward("on_meditation", meditation)
+
+    def on_sleep_stage(self, stage, conf, drowsiness):
+        self._sleep_stage_buffer.append([time.time(), stage.value, conf, drowsiness])
+        self._forward("on_sleep_stage", stage, conf, drowsiness)
+
+    # plot snapshots: (version, plot arguments), the arguments are None when the window did not
+    # change since version `since`; arrays are read-only copies taken under the window's lock
+    def get_eeg_buffer_for_plot(self, since=0, width=PLOT_WIDTH):
+        version, eeg = self._eeg_buffer.snapshot_decimated(width, since)
+        return version, eeg if eeg is None else (self._eeg_sample_rate,) + eeg
+
+    def get_eeg_spectrum_for_plot(self, since=0):
+        version, spectrum = self.eeg_spectrum.snapshot(since)
+        return version, spectrum if spectrum is None else (spectrum,)
+
+    def get_imu_buffer_for_plot(self, since=0):
+        version, imu = self._imu_buffer.snapshot(since)
+        return version, imu if imu is None else (self._imu_sample_rate, imu)
+
+    def get_ppg_raw_for_plot(self, since=0, width=PLOT_WIDTH):
+        version, raw = self._ppg_raw_buffer.snapshot_decimated(width, since)
+        if raw is None:
+            return version, None
+        x, raw = raw
+        return version, (self._ppg_sample_rate, x, dict(zip(PPG_RAW_CHANNELS, raw)))
+
+    def get_ppg_algo_for_plot(self, since=0):
+        version, algo = self._ppg_algo_buffer.snapshot(since)
+        return version, algo if algo is None else (self._ppg_sample_rate, algo)
+
+    def get_stress_for_plot(self, since=0, width=PLOT_WIDTH):
+        return self._stress_buffer.snapshot_decimated(width, since)
+
+    def get_meditation_for_plot(self, since=0, width=PLOT_WIDTH):
+        return self._meditation_buffer.snapshot_decimated(width, since)
+
+    def get_sleep_stage_for_plot(self, since=0):
+        version, stages = self._sleep_stage_buffer.snapshot(since)
+        return version, stages if stages is None else (dict(zip(SLEEP_STAGE_CHANNELS, stages)),)
+
+    def get_respiratory_for_plot(self, since=0):
+        version, curve = self._ppg_respiratory_buffer.snapshot(since)
+        return version, curve if curve is None else (self._ppg_sample_rate, self._ppg_respiratory_rate, curve)
+
+    def stats(self):
+        recorder = self.recorder
+        return {
+            "name": self.device.name if self.device is not None else None,
+            "connectivity": self.connectivity.name,
+            "ready": self.ready.is_set(),
+            "errors": len(self.errors),
+            "samples": {"eeg": self._eeg_buffer.total, "imu": self._imu_buffer["acc"].total,
+                        "ppg_raw": self._ppg_raw_buffer.total, "ppg_algo": self._ppg_algo_buffer["hr"].total,
+                        "stress": self._stress_buffer.total, "meditation": self._meditation_buffer.total,
+                        "sleep_stage": self._sleep_stage_buffer.total},
+            "band_powers": self.eeg_spectrum.band_powers() if self.eeg_spectrum.sample_rate else None,
+            "recording": recorder.io_stats() if recorder is not None else None,
+            "callbacks": self.device.callback_stats.snapshot() if self.device is not None else None,
+        }
@@ -0,0 +1,213 @@
+import asyncio
+import threading
+import time
+import weakref
+from collections import deque
+
+_DEFAULT_COMMAND_TIMEOUT = 5.0  # Seconds
+
+# get_sys_info lock of each ZenLiteDevice, shared by all its wrappers: the sys info callback slot is the device's
+_sys_info_locks = weakref.WeakKeyDictionary()
+
+
+class ZenLiteCommandError(Exception):
+    """
+    A command failed: error is the ZLError returned when the SDK refused to send it, or the
+    device's response object when the device answered with an error.
+    """
+
+    def __init__(self, command, error):
+        detail = getattr(error, "message", None) or getattr(error, "error", error)
+        super(ZenLiteCommandError, self).__init__("%s failed: %s" % (command, detail))
+        self.command = command
+        self.error = error
+
+
+def _resolve(future, result):
+    if not future.done():
+        future.set_result(result)
+
+
+def _resolve_threadsafe(loop, future, result):
+    # called on the SDK thread; the loop may already be gone if the caller stopped waiting
+    try:
+        loop.call_soon_threadsafe(_resolve, future, result)
+    except RuntimeError:
+        pass
+
+
+class AsyncZenLiteDevice:
+    """
+    asyncio front end for the commands of a connected ZenLiteDevice.
+
+    Each command returns the device's response object (AFEConfigResponse, IMUConfigResponse,
+    SysConfigResponse...) once it arrives. Responses are handed from the SDK thread to the
+    event loop with call_soon_threadsafe; a command that gets no response within its timeout
+    raises asyncio.TimeoutError and its msg_id is removed from the device's callback table.
+
+        adev = AsyncZenLiteDevice(device)
+        await adev.pair()
+        afe, imu, ppg = await asyncio.gather(
+            adev.config_afe(EEGSampleRate.sr256),
+            adev.config_imu(IMUSampleRate.sr50, IMUMode.acc_gyro),
+            adev.config_ppg(PPGReportRate.sr25, PPGMode.algo))
+    """
+
+    def __init__(self, device, timeout=_DEFAULT_COMMAND_TIMEOUT):
+        self.device = device
+        self.timeout = timeout
+
+    async def _command(self, name, send, timeout):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def on_response(device, res):
+            _resolve_threadsafe(loop, future, res)
+
+        err = send(on_response)
+        if err.code != 0:
+            raise ZenLiteCommandError(name, err)
+        try:
+            return await asyncio.wait_for(future, self.timeout if timeout is None else timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            self.device.discard_response_callback(err.msg_id)
+            raise
+
+    async def config_afe(self, sample_rate, timeout=None):
+        return await self._command("config_afe", lambda cb: self.device.zl_config_afe(sample_rate, cb), timeout)
+
+    async def config_imu(self, sample_rate, mode=0, timeout=None):
+        return await self._command("config_imu", lambda cb: self.device.zl_config_imu(sample_rate, mode, cb), timeout)
+
+    async def config_ppg(self, sample_rate, mode, raw_set_reg=0, raw_set_value=0, timeout=None):
+        return await self._command("config_ppg", lambda cb: self.device.zl_config_ppg(sample_rate, mode, raw_set_reg, raw_set_value, cb), timeout)
+
+    async def pair(self, in_pairing_mode=None, timeout=None):
+        if in_pairing_mode is None:
+            in_pairing_mode = self.device.in_pairing_mode
+        return await self._command("pair", lambda cb: self.device.zl_pair(in_pairing_mode, cb), timeout)
+
+    async def sys_cmd(self, cmd, timeout=None):
+        return await self._command("sys_cmd", lambda cb: self.device.zl_sys_cmd(cmd, cb), timeout)
+
+    async def set_device_name(self, name, timeout=None):
+        return await self._command("set_device_name", lambda cb: self.device.zl_set_device_name(name, cb), timeout)
+
+    async def set_sleep_idle_time(self, sec, timeout=None):
+        return await self._command("set_sleep_idle_time", lambda cb: self.device.zl_set_sleep_idle_time(sec, cb), timeout)
+
+    async def set_sleep_mode(self, enabled, timeout=None):
+        return await self._command("set_sleep_mode", lambda cb: self.device.zl_set_sleep_mode(enabled, cb), timeout)
+
+    async def get_sys_info(self, timeout=None):
+        """
+        SysInfoData of the device; raises ZenLiteCommandError if the device answers with an error.
+
+        The device has a single sys info callback, so overlapping calls are serialized, also
+        across wrappers of the same device: each one waits for the previous one to finish before
+        it sends its request. `timeout` covers the request only, not the wait for a previous call.
+        """
+        lock = _sys_info_locks.get(self.device)
+        if lock is None:
+            lock = _sys_info_locks[self.device] = asyncio.Lock()  # in the caller's event loop
+        async with lock:
+            loop = asyncio.get_running_loop()
+            info = loop.create_future()
+
+            def on_sys_info(device, sys_info):
+                _resolve_threadsafe(loop, info, sys_info)
+
+            timeout = self.timeout if timeout is None else timeout
+            start = loop.time()
+            try:
+                res = await self._command("get_sys_info", lambda cb: self.device.zl_get_sys_info(on_sys_info, cb), timeout)
+                if not res.success():
+                    raise ZenLiteCommandError("get_sys_info", res)
+                return await asyncio.wait_for(info, max(0.0, timeout - (loop.time() - start)))
+            finally:
+                # a reply that comes after a timeout or cancellation must not call into this call
+                if self.device._sys_info_cb is on_sys_info:
+                    self.device._sys_info_cb = None
+
+
+class DataStream:
+    """
+    Async iterator over one data stream of a device, created by ZenLiteDevice.eeg_stream(),
+    imu_stream(), ppg_stream() or algo_stream().
+
+    The SDK thread pushes packets into a bounded buffer (the oldest packet is dropped when it
+    is full, counted in `dropped`). With batch=True every iteration yields all packets that
+    arrived since the previous one, combined into one NumPy block; with batch=False it yields
+    one packet at a time, in the same block form. Close the stream (or leave an `async with`
+    block) to unsubscribe.
+
+        async with device.eeg_stream() as stream:
+            async for samples in stream:
+                features = extract(samples)
+    """
+
+    def __init__(self, combine, maxsize=1024, batch=True, on_close=None):
+        self._combine = combine
+        self._batch = batch
+        self._on_close = on_close
+        self._items = deque(maxlen=maxsize)
+        self._lock = threading.Lock()
+        self._waiter = None  # (loop, future) of a consumer waiting for data
+        self._closed = False
+        self.dropped = 0
+
+    def push(self, name, args):
+        """Called on the SDK thread with the callback name and decoded listener arguments"""
+        with self._lock:
+            if self._closed:
+                return
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append((name, args, time.time()))
+            waiter, self._waiter = self._waiter, None
+        if waiter is not None:
+            _resolve_threadsafe(waiter[0], waiter[1], None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while True:
+            with self._lock:
+                if self._items:
+                    if self._batch:
+                        items = list(self._items)
+                        self._items.clear()
+                    else:
+                        items = [self._items.popleft()]
+                    break
+                if self._closed:
+                    raise StopAsyncIteration
+                loop = asyncio.get_running_loop()
+                future = loop.create_future()
+                self._waiter = (loop, future)
+            await future
+        return self._combine(items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            waiter, self._waiter = self._waiter, None
+        if waiter is not None:
+            _resolve_threadsafe(waiter[0], waiter[1], None)
+        if self._on_close is not None:
+            self._on_close(self)
+
+    async def aclose(self):
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
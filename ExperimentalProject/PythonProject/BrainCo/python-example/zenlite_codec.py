@@ -0,0 +1,134 @@
+import bz2
+import lzma
+import zlib
+
+import numpy as np
+
+_COMPRESSORS = {
+    "none": (lambda data, level: data, lambda data: data),
+    "zlib": (lambda data, level: zlib.compress(data, level), zlib.decompress),
+    "bz2": (lambda data, level: bz2.compress(data, level), bz2.decompress),
+    "lzma": (lambda data, level: lzma.compress(data, preset=level), lzma.decompress),
+}
+
+_QUANTIZED_NAN = np.iinfo(np.int32).min  # NaN of a quantized field
+
+
+def _numeric(dtype):
+    return dtype.kind in "biuf" and dtype.itemsize in (1, 2, 4, 8)
+
+
+class Codec:
+    """
+    Chunk codec of the recording format: a chunk of structured records is split into one
+    column per field (and per element of array fields such as IMU acc x / y / z); each column
+    is delta-encoded, byte-shuffled and the columns are compressed together.
+
+      compressor  "zlib", "lzma", "bz2" or "none"
+      level       compression level (zlib / bz2 1..9, lzma preset 0..9)
+      delta       store the difference to the previous value of the column
+      shuffle     group the bytes of the column by significance (all lowest bytes first, ...)
+      quantize    {field: step} for float fields that may be stored lossy, as int32 multiples
+                  of step (e.g. {"value": 0.01} keeps EEG to 0.01 uV); NaN is kept, fields
+                  a stream does not have are ignored
+
+    Without quantize the codec is lossless: floats are delta-encoded on their bit patterns,
+    integers (PPG counts, sequence numbers) as integers, with wrap-around arithmetic. Other
+    fields (e.g. event labels) are stored as bytes, shuffled but not delta-encoded.
+    """
+
+    def __init__(self, compressor="zlib", level=6, delta=True, shuffle=True, quantize=None):
+        if compressor not in _COMPRESSORS:
+            raise ValueError("unknown compressor %r, use one of %s" % (compressor, ", ".join(_COMPRESSORS)))
+        self.compressor = compressor
+        self.level = level
+        self.delta = delta
+        self.shuffle = shuffle
+        self.quantize = dict(quantize or {})
+        self._compress, self._decompress = _COMPRESSORS[compressor]
+
+    def spec(self):
+        """JSON-serializable settings, stored in the stream header"""
+        return {"compressor": self.compressor, "level": self.level, "delta": self.delta,
+                "shuffle": self.shuffle, "quantize": self.quantize}
+
+    @classmethod
+    def from_spec(cls, spec):
+        return cls(**spec)
+
+    @property
+    def lossless(self):
+        return not self.quantize
+
+    def check(self, dtype):
+        """Raise ValueError if the codec cannot store records of dtype"""
+        for name in self.quantize:
+            if name in dtype.names and dtype.fields[name][0].base.kind != "f":
+                raise ValueError("cannot quantize %r: not a float field of %s" % (name, dtype))
+
+    def _columns(self, records):
+        for name in records.dtype.names:
+            values = records[name]
+            if values.ndim == 1:
+                yield name, values
+            else:
+                for column in values.reshape(len(values), -1).T:
+                    yield name, column
+
+    def encode(self, records):
+        parts = []
+        for name, values in self._columns(records):
+            step = self.quantize.get(name)
+            if not _numeric(values.dtype):
+                raw = np.ascontiguousarray(values).view(np.uint8).reshape(len(values), values.dtype.itemsize)
+                parts.append((raw.T if self.shuffle else raw).tobytes())
+                continue
+            if step is not None:
+                ints = np.round(values / step)
+                ints = np.where(np.isnan(ints), _QUANTIZED_NAN,
+                                np.clip(ints, _QUANTIZED_NAN + 1, np.iinfo(np.int32).max)).astype("<i4")
+            else:
+                ints = np.ascontiguousarray(values).view("<i%d" % values.dtype.itemsize)
+            if self.delta:
+                ints = np.diff(ints, prepend=ints.dtype.type(0))  # wraps around, cumsum undoes it
+            raw = ints.view(np.uint8)
+            if self.shuffle:
+                raw = raw.reshape(len(ints), ints.dtype.itemsize).T
+            parts.append(raw.tobytes())
+        return self._compress(b"".join(parts), self.level)
+
+    def decode(self, data, dtype, count):
+        """count records of dtype from a chunk made by encode()"""
+        raw = np.frombuffer(self._decompress(data), dtype=np.uint8)
+        records = np.empty(count, dtype=dtype)
+        pos = 0
+        for name in dtype.names:
+            field = records[name]
+            base = dtype.fields[name][0].base
+            step = self.quantize.get(name)
+            if not _numeric(base):
+                column_dtype = base
+            elif step is not None:
+                column_dtype = np.dtype("<i4")
+            else:
+                column_dtype = np.dtype("<i%d" % base.itemsize)
+            columns = []
+            for _ in range(int(np.prod(dtype.fields[name][0].shape))):
+                size = count * column_dtype.itemsize
+                column = raw[pos:pos + size]
+                pos += size
+                if self.shuffle:
+                    column = column.reshape(column_dtype.itemsize, count).T.copy()
+                ints = column.view(column_dtype).reshape(count)
+                if not _numeric(base):
+                    columns.append(ints)
+                    continue
+                if self.delta:
+                    ints = np.cumsum(ints, dtype=column_dtype)
+                if step is not None:
+                    values = np.where(ints == _QUANTIZED_NAN, np.nan, ints * step).astype(base)
+                else:
+                    values = ints.view(base)
+                columns.append(values)
+            field[:] = columns[0] if field.ndim == 1 else np.column_stack(columns).reshape(field.shape)
+        return records
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""
+Headless acquisition, without Qt: scans for the headsets, applies the GUI's stream profile
+(EEG 256 Hz, IMU 50 Hz acc + gyro, PPG 25 Hz algo) and records every device as a session
+with base <out>/<yyyymmdd>/<HH-MM-SS>_<label>_<device> (files <base>_<stream>.zlr with their
+.idx, and <base>.manifest.json) until the run time is over or it is interrupted
+(Ctrl+C / SIGTERM). The data path is the AcquisitionCore the GUI uses.
+
+    python zenlite_daemon.py --name Zenlite-OK --label baseline
+    python zenlite_daemon.py --count 2 --seconds 3600 --status-interval 10
+"""
+import argparse
+import datetime
+import json
+import os
+import signal
+import threading
+import time
+
+from zenlite_sdk import *
+from zen_logger import ZLOG
+from zenlite_acquisition import AcquisitionCore
+from zenlite_codec import Codec
+from zenlite_recorder import SessionRecorder
+from zenlite_session import SessionManager, StreamProfile
+
+DATA_PATH = "data"
+_TOTAL_RUN_SECONDS = 12 * 3600  # seconds
+
+
+def recording_base(out, label, device):
+    folder = os.path.join(out, datetime.datetime.now().strftime("%Y%m%d"))
+    os.makedirs(folder, exist_ok=True)
+    parts = [datetime.datetime.now().strftime("%H-%M-%S"), label, device.name]
+    return os.path.join(folder, "_".join(part for part in parts if part))
+
+
+def status(cores):
+    lines = []
+    for core in cores:
+        stats = core.stats()
+        recording = stats["recording"]
+        bands = stats["band_powers"]
+        lines.append("[%s] %s%s samples=%s%s%s" % (
+            stats["name"], stats["connectivity"], "" if stats["ready"] else " (configuring)",
+            json.dumps(stats["samples"]),
+            "" if recording is None else " written=%.1f kB/s dropped=%d" % (
+                recording["bytes_per_s"] / 1e3, recording.get("dropped", 0)),
+            "" if bands is None else " alpha=%.1f uV^2" % bands["alpha"]))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--name", nargs="+", help="device names to connect (default: the first --count devices found)")
+    parser.add_argument("--count", type=int, default=1, help="devices to connect when no --name is given")
+    parser.add_argument("--scan-timeout", type=float, default=15.0, help="seconds")
+    parser.add_argument("--out", default=DATA_PATH, help="recording folder")
+    parser.add_argument("--label", default="", help="recording label, stored in the recording metadata")
+    parser.add_argument("--no-record", action="store_true", help="acquire and report only")
+    parser.add_argument("--codec", choices=["none", "zlib", "lzma", "bz2"], default="none",
+                        help="chunk compression of the recording")
+    parser.add_argument("--segment-seconds", type=float, default=3600.0, help="start a new segment file every N s")
+    parser.add_argument("--seconds", type=float, default=_TOTAL_RUN_SECONDS, help="run time")
+    parser.add_argument("--status-interval", type=float, default=60.0, help="seconds between status lines")
+    args = parser.parse_args()
+
+    ZLOG.LOG_INFO("ZenLiteSDK version:" + get_sdk_version())
+    ZenLiteSDK.set_array_mode(ArrayMode.copy)
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda signum, frame: stop.set())
+
+    def new_recorder(device):
+        base = recording_base(args.out, args.label, device)
+        ZLOG.LOG_INFO("[%s] recording to %s" % (device.name, base))
+        return SessionRecorder(base, meta={"label": args.label, "device": device.name}, background=True,
+                               segment_seconds=args.segment_seconds,
+                               codec=None if args.codec == "none" else Codec(args.codec))
+
+    session = SessionManager(StreamProfile(), pipeline_factory=AcquisitionCore,
+                             recorder_factory=None if args.no_record else new_recorder)
+    cores = session.start(count=None if args.name else args.count, names=args.name, timeout=args.scan_timeout)
+    if not cores:
+        ZLOG.LOG_ERROR("no device found")
+        return 1
+
+    deadline = time.monotonic() + args.seconds
+    try:
+        while not stop.is_set() and time.monotonic() < deadline:
+            if stop.wait(min(args.status_interval, max(0.0, deadline - time.monotonic()))):
+                break
+            ZLOG.LOG_INFO(status(cores))
+    finally:
+        session.stop()  # disconnects, then closes the recorders after writing what they still queue
+        for core in cores:
+            if core.recorder is not None:
+                ZLOG.LOG_INFO("[%s] recording stopped: %s" % (core.device.name, core.recorder.io_stats()))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
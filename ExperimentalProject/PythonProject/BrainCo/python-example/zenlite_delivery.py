@@ -0,0 +1,210 @@
+import threading
+import time
+import traceback
+from collections import deque
+from enum import IntEnum
+
+from zen_logger import ZLOG
+
+
+class DeliveryPolicy(IntEnum):
+    """
+    What a stream queue does when the consumer falls behind.
+
+      block:       the producer waits for free space (up to block_timeout), then drops the oldest item
+      drop_oldest: the oldest pending item is discarded to make room
+      coalesce:    a pending item for the same handler is replaced by the newest one (latest value wins),
+                   the oldest item is discarded if the queue is still full
+    """
+    block = 0
+    drop_oldest = 1
+    coalesce = 2
+
+
+class StreamQueue:
+    """
+    Bounded, thread-safe queue of pending (handler, args) calls for one stream.
+
+    Producers call put() from the SDK callback thread; a StreamWorker drains it. Counters are
+    read with stats().
+    """
+
+    def __init__(self, name, maxsize=256, policy=DeliveryPolicy.block, block_timeout=1.0):
+        if maxsize < 1:
+            raise ValueError("maxsize must be >= 1")
+        self.name = name
+        self.maxsize = maxsize
+        self.policy = DeliveryPolicy(policy)
+        self.block_timeout = block_timeout
+        self._items = deque()
+        self._pending = {}  # handler -> queued item, coalesce policy only
+        self._cond = threading.Condition()
+        self._closed = False
+        self._enqueued = 0
+        self._delivered = 0
+        self._dropped = 0
+        self._coalesced = 0
+        self._max_depth = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    def put(self, handler, args):
+        """Queue handler(*args); returns False if the queue is closed"""
+        now = time.perf_counter()
+        with self._cond:
+            if self._closed:
+                return False
+            if self.policy == DeliveryPolicy.coalesce:
+                item = self._pending.get(handler)
+                if item is not None:
+                    item[1] = args
+                    self._coalesced += 1
+                    return True
+            if len(self._items) >= self.maxsize and self.policy == DeliveryPolicy.block:
+                self._cond.wait_for(lambda: len(self._items) < self.maxsize or self._closed, self.block_timeout)
+                if self._closed:
+                    return False
+            if len(self._items) >= self.maxsize:
+                self._discard_oldest()
+            item = [handler, args, now]
+            self._items.append(item)
+            if self.policy == DeliveryPolicy.coalesce:
+                self._pending[handler] = item
+            self._enqueued += 1
+            if len(self._items) > self._max_depth:
+                self._max_depth = len(self._items)
+            self._cond.notify_all()
+        return True
+
+    def get(self, timeout=None):
+        """Next (handler, args, enqueue_time), or None on timeout / when closed and empty"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout) or not self._items:
+                return None
+            item = self._items.popleft()
+            if self.policy == DeliveryPolicy.coalesce and self._pending.get(item[0]) is item:
+                del self._pending[item[0]]
+            self._cond.notify_all()
+        return item
+
+    def get_batch(self, max_items, timeout=None):
+        """Up to max_items pending items at once, waiting for at least one"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout) or not self._items:
+                return []
+            batch = [self._items.popleft() for _ in range(min(max_items, len(self._items)))]
+            if self.policy == DeliveryPolicy.coalesce:
+                for item in batch:
+                    if self._pending.get(item[0]) is item:
+                        del self._pending[item[0]]
+            self._cond.notify_all()
+        return batch
+
+    def task_done(self, enqueue_time):
+        latency = time.perf_counter() - enqueue_time
+        with self._cond:
+            self._delivered += 1
+            self._latency_total += latency
+            if latency > self._latency_max:
+                self._latency_max = latency
+            self._cond.notify_all()
+
+    def join(self, timeout=None):
+        """Wait until every queued item has been delivered"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._delivered + self._dropped >= self._enqueued, timeout)
+
+    def close(self, drain=True):
+        """Stop accepting items; without drain, pending items are dropped"""
+        with self._cond:
+            self._closed = True
+            if not drain:
+                while self._items:
+                    self._discard_oldest()
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def __len__(self):
+        return len(self._items)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "policy": self.policy.name,
+                "depth": len(self._items),
+                "max_depth": self._max_depth,
+                "enqueued": self._enqueued,
+                "delivered": self._delivered,
+                "dropped": self._dropped,
+                "coalesced": self._coalesced,
+                "latency_mean_ms": self._latency_total / self._delivered * 1e3 if self._delivered else 0.0,
+                "latency_max_ms": self._latency_max * 1e3,
+            }
+
+    def _discard_oldest(self):
+        item = self._items.popleft()
+        if self._pending.get(item[0]) is item:
+            del self._pending[item[0]]
+        self._dropped += 1
+
+
+class StreamWorker(threading.Thread):
+    """Daemon thread calling the handlers queued in one StreamQueue"""
+
+    def __init__(self, queue, name=None):
+        super(StreamWorker, self).__init__(name=name or "zl-delivery-" + queue.name, daemon=True)
+        self.queue = queue
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            handler, args, enqueue_time = item
+            try:
+                handler(*args)
+            except Exception:
+                ZLOG.LOG_ERROR("delivery[%s]: listener raised\n%s" % (self.queue.name, traceback.format_exc()))
+            finally:
+                self.queue.task_done(enqueue_time)
+
+
+class CallbackDelivery:
+    """
+    Queued delivery of SDK callbacks: one bounded StreamQueue and worker thread per stream.
+
+    streams maps callback names to stream names, e.g. {"stress": "algo", "meditation": "algo"};
+    policies maps stream names to a DeliveryPolicy (default block).
+    """
+
+    def __init__(self, streams, policies=None, maxsize=256, block_timeout=1.0):
+        policies = policies or {}
+        self._streams = dict(streams)
+        self._queues = {}
+        self._workers = []
+        for stream in sorted(set(self._streams.values())):
+            queue = StreamQueue(stream, maxsize, policies.get(stream, DeliveryPolicy.block), block_timeout)
+            self._queues[stream] = queue
+            self._workers.append(StreamWorker(queue))
+        for worker in self._workers:
+            worker.start()
+
+    def put(self, callback_name, handler, args):
+        queue = self._queues.get(self._streams.get(callback_name))
+        if queue is None or not queue.put(handler, args):
+            # unknown callback or delivery shutting down: deliver inline rather than lose it
+            handler(*args)
+
+    def stats(self):
+        return {stream: queue.stats() for stream, queue in self._queues.items()}
+
+    def close(self, drain=True, timeout=5.0):
+        """Stop the workers; with drain, pending items are delivered first (bounded by timeout)"""
+        for queue in self._queues.values():
+            queue.close(drain)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        for worker in self._workers:
+            worker.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
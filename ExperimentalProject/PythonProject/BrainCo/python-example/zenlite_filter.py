@@ -0,0 +1,114 @@
+import threading
+
+import numpy as np
+from scipy.signal import butter, iirnotch, sosfilt, sosfilt_zi, tf2sos
+
+from zen_logger import ZLOG
+
+# stage settings of FilterBank(**...), Hz; each with the time axis of its packets
+EEG_FILTERS = {"notch": 50.0, "bandpass": (1.0, 45.0)}  # 1-D eeg_data
+PPG_FILTERS = {"bandpass": (0.5, 5.0)}  # (4, n) PPG raw channels
+IMU_FILTERS = {"highpass": 0.3, "axis": 0}  # (n, 3) imu_data.acc / gyro
+
+
+class FilterBank:
+    """
+    Streaming IIR filter of one stream: notch, bandpass and highpass stages, applied in that
+    order as one cascade of second-order sections with scipy.signal.sosfilt.
+
+    The filter state (zi) is kept between calls, so a recording filtered packet by packet
+    is identical to the same recording filtered as one array, and the live output of the
+    listener matches what is computed offline on a SessionReader stream.
+
+      notch       mains frequency, or several (e.g. (50.0, 100.0)); quality factor notch_q
+      bandpass    (low, high), Butterworth of `order`
+      highpass    cutoff, Butterworth of `order`
+      axis        time axis of the packets; the other axes are channels, each filtered
+                  separately, e.g. (channels, n) with axis=-1 or IMU (n, 3) with axis=0
+      initial     "zeros" starts from rest; "steady" starts from the steady state of the
+                  first sample of each channel, which avoids the step response to a DC offset
+                  (PPG counts, accelerometer gravity)
+
+    Stages at or above the Nyquist frequency of the sample rate are left out (a bandpass then
+    becomes a highpass). The sample rate may be given later, with the first filter() call; a
+    new rate or a new number of channels restarts the filter.
+    """
+
+    def __init__(self, sample_rate=None, notch=None, bandpass=None, highpass=None, order=4, notch_q=30.0,
+                 axis=-1, initial="zeros"):
+        if initial not in ("zeros", "steady"):
+            raise ValueError("initial must be 'zeros' or 'steady'")
+        if notch is None:
+            self.notch = ()
+        else:
+            self.notch = tuple(np.atleast_1d(notch).astype(float))
+        self.bandpass = tuple(bandpass) if bandpass is not None else None
+        self.highpass = highpass
+        self.order = order
+        self.notch_q = notch_q
+        self.axis = axis
+        self.initial = initial
+        self.sample_rate = None
+        self.sos = None
+        self.samples = 0  # filtered since the last (re)start
+        self._zi = None
+        self._lock = threading.Lock()
+        if sample_rate:
+            self._configure(sample_rate)
+
+    def _configure(self, sample_rate):
+        fs = float(sample_rate)
+        nyquist = fs / 2.0
+        sections = []
+        for freq in self.notch:
+            if 0.0 < freq < nyquist:
+                sections.append(tf2sos(*iirnotch(freq, self.notch_q, fs=fs)))
+        if self.bandpass is not None:
+            low, high = self.bandpass
+            if high < nyquist:
+                sections.append(butter(self.order, (low, high), btype="bandpass", fs=fs, output="sos"))
+            elif low > 0.0:
+                sections.append(butter(self.order, low, btype="highpass", fs=fs, output="sos"))
+        if self.highpass is not None and 0.0 < self.highpass < nyquist:
+            sections.append(butter(self.order, self.highpass, btype="highpass", fs=fs, output="sos"))
+        self.sample_rate = fs
+        self.sos = np.concatenate(sections) if sections else np.empty((0, 6))
+        self.reset()
+
+    def reset(self):
+        """Start over from rest, e.g. after a gap in the data"""
+        self._zi = None
+        self.samples = 0
+
+    def filter(self, samples, sample_rate=None):
+        """Filtered float64 copy of `samples`, the next packet (or all) of the stream"""
+        samples = np.asarray(samples, dtype=np.float64)
+        with self._lock:
+            if sample_rate and sample_rate != self.sample_rate:
+                self._configure(sample_rate)
+            if self.sample_rate is None:
+                raise ValueError("sample rate unknown, pass it to the constructor or the first filter()")
+            if not len(self.sos) or samples.size == 0:
+                return samples.copy()
+            axis = self.axis % samples.ndim
+            # zi: (sections, *channel shape with the time axis as 2, ...)
+            shape = (len(self.sos),) + samples.shape[:axis] + (2,) + samples.shape[axis + 1:]
+            if self._zi is None or self._zi.shape != shape:
+                if self._zi is not None:
+                    ZLOG.LOG_WARNING("FilterBank: packet shape %s does not match the filter state %s, restarting "
+                                     "(is axis=%d the time axis?)" % (samples.shape, self._zi.shape, self.axis))
+                self._zi = self._initial_state(samples, axis, shape)
+            out, self._zi = sosfilt(self.sos, samples, axis=axis, zi=self._zi)
+            self.samples += samples.shape[axis]
+            return out
+
+    def _initial_state(self, samples, axis, shape):
+        self.samples = 0
+        if self.initial == "zeros":
+            return np.zeros(shape)
+        zi = sosfilt_zi(self.sos)  # (sections, 2), for a unit step
+        first = np.take(samples, [0], axis=axis)
+        expand = (slice(None),) + (None,) * axis + (slice(None),) + (None,) * (samples.ndim - axis - 1)
+        return zi[expand] * first[np.newaxis]
+
+    __call__ = filter
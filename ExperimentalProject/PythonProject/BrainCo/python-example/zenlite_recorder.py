@@ -0,0 +1,1170 @@
+import glob
+import json
+import os
+import struct
+import threading
+import time
+import traceback
+import zlib
+
+import numpy as np
+
+from zenlite_sdk import *
+from zenlite_codec import Codec
+from zenlite_delivery import DeliveryPolicy, StreamQueue
+from zen_logger import ZLOG
+
+RECORDING_EXT = ".zlr"
+RECORDING_MAGIC = b"ZLREC\x00"
+RECORDING_VERSION = 2  # 1: raw records, 2: compressed chunk frames (raw streams are still written as 1)
+_HEADER_PREFIX = struct.Struct("<6sHI")  # magic, version, json length
+_HEADER_ALIGN = 64  # records start on a 64-byte boundary so they can be memory mapped
+_FRAME = struct.Struct("<II")  # compressed chunk: payload length, record count
+
+INDEX_EXT = ".idx"
+INDEX_MAGIC = b"ZLIDX\x00"
+_INDEX_PREFIX = struct.Struct("<6sH")  # magic, version
+_REBUILD_CHUNK_RECORDS = 4096
+
+MANIFEST_EXT = ".manifest.json"
+MANIFEST_VERSION = 1
+
+_DEFAULT_FLUSH_BYTES = 256 * 1024
+_DEFAULT_FLUSH_INTERVAL = 1.0  # Seconds
+_DEFAULT_FSYNC_INTERVAL = 10.0  # Seconds
+_DEFAULT_QUEUE_SIZE = 4096  # packets, about a minute at the maximum sample rates
+_DEFAULT_BLOCK_TIMEOUT = 0.05  # Seconds
+_WRITER_BATCH = 256  # packets taken from the queue at once
+
+
+def _record_dtype(fields):
+    # every record starts with the host timestamp and the packet's sequence number
+    return np.dtype([("time", "<f8"), ("seq", "<i4")] + fields)
+
+
+def _packed_fields(dtype):
+    # field list of a C struct dtype, without its padding
+    fields = []
+    for name in dtype.names:
+        field = dtype.fields[name][0]
+        fields.append((name, field.base.str, field.shape) if field.shape else (name, field.str))
+    return fields
+
+
+# On-disk record layouts, one record per sample
+EEG_RECORD_DTYPE = _record_dtype([("value", "<f4")])
+IMU_RECORD_DTYPE = _record_dtype([("acc", "<f4", (3,)), ("gyro", "<f4", (3,)), ("euler", "<f4", (3,))])
+PPG_RAW_RECORD_DTYPE = _record_dtype(_packed_fields(PPG_RAW_DTYPE))
+PPG_ALGO_RECORD_DTYPE = _record_dtype(_packed_fields(PPG_ALGO_DTYPE))
+ALGO_RECORD_DTYPE = _record_dtype([(name, ALGO_DTYPE.fields[name][0].str) for name in ALGO_DTYPE.names if name != "time"])
+
+DATA_STREAMS = ("eeg", "imu", "ppg_raw", "ppg_algo", "algo")
+EVENT_LABEL_SIZE = 64  # bytes of utf-8, longer labels are cut
+# an event: its label and, per data stream, the index of the first sample recorded after it (-1: unknown)
+EVENT_RECORD_DTYPE = _record_dtype([("label", "S%d" % EVENT_LABEL_SIZE)] + [(stream, "<i8") for stream in DATA_STREAMS])
+
+RECORD_DTYPES = {
+    "eeg": EEG_RECORD_DTYPE,
+    "imu": IMU_RECORD_DTYPE,
+    "ppg_raw": PPG_RAW_RECORD_DTYPE,
+    "ppg_algo": PPG_ALGO_RECORD_DTYPE,
+    "algo": ALGO_RECORD_DTYPE,
+    "evt": EVENT_RECORD_DTYPE,
+}
+
+# intervals between two events, see EventIndex
+INTERVAL_DTYPE = np.dtype([("start_time", "<f8"), ("end_time", "<f8"), ("start_event", "<i8"), ("end_event", "<i8")]
+                          + [(stream + suffix, "<i8") for stream in DATA_STREAMS for suffix in ("_start", "_stop")])
+
+# One sidecar index entry per chunk of a stream file
+INDEX_DTYPE = np.dtype([
+    ("first_time", "<f8"),
+    ("last_time", "<f8"),
+    ("first_seq", "<i8"),
+    ("last_seq", "<i8"),
+    ("offset", "<i8"),  # byte offset of the chunk in the stream file
+    ("count", "<i8"),   # records in the chunk
+])
+
+
+def stream_path(base, stream):
+    return base + "_" + stream + RECORDING_EXT
+
+
+def segment_path(base, stream, segment):
+    """File of segment `segment` of a stream; the first segment is the plain stream file"""
+    if segment == 0:
+        return stream_path(base, stream)
+    return "%s_%s.%04d%s" % (base, stream, segment, RECORDING_EXT)
+
+
+def segment_paths(base, stream):
+    """Existing segment files of a stream, in order"""
+    first = stream_path(base, stream)
+    paths = [first] if os.path.exists(first) else []
+    pattern = glob.escape(base + "_" + stream) + ".[0-9][0-9][0-9][0-9]" + RECORDING_EXT
+    return paths + sorted(glob.glob(pattern))
+
+
+def manifest_path(base):
+    return base + MANIFEST_EXT
+
+
+def index_path(path):
+    return path + INDEX_EXT
+
+
+def write_header(f, stream, dtype, meta=None, codec=None):
+    """Write the file header of a recording stream; returns its size in bytes"""
+    header = {
+        "stream": stream,
+        "dtype": np.lib.format.dtype_to_descr(dtype),
+        "created": time.time(),
+        "meta": meta or {},
+    }
+    if codec is not None:
+        header["codec"] = codec.spec()
+    payload = json.dumps(header).encode("utf-8")
+    size = _HEADER_PREFIX.size + len(payload)
+    padding = -size % _HEADER_ALIGN
+    f.write(_HEADER_PREFIX.pack(RECORDING_MAGIC, RECORDING_VERSION if codec is not None else 1,
+                                len(payload) + padding))
+    f.write(payload + b" " * padding)
+    return size + padding
+
+
+def read_header(f):
+    """(header dict with 'dtype' as np.dtype, offset of the first record) of a recording stream"""
+    prefix = f.read(_HEADER_PREFIX.size)
+    if len(prefix) < _HEADER_PREFIX.size:
+        raise ValueError("not a ZenLite recording: file too short")
+    magic, version, length = _HEADER_PREFIX.unpack(prefix)
+    if magic != RECORDING_MAGIC:
+        raise ValueError("not a ZenLite recording: bad magic %r" % magic)
+    if version > RECORDING_VERSION:
+        raise ValueError("recording version %d is newer than this reader (%d)" % (version, RECORDING_VERSION))
+    header = json.loads(f.read(length).decode("utf-8"))
+    header["dtype"] = np.lib.format.descr_to_dtype(_as_descr(header["dtype"]))
+    return header, _HEADER_PREFIX.size + length
+
+
+def _as_descr(descr):
+    # json turns the (name, format[, shape]) tuples of a dtype descr into lists
+    if isinstance(descr, list):
+        return [tuple(tuple(part) if isinstance(part, list) else part for part in field) for field in descr]
+    return descr
+
+
+def _unwrap_seq(seq, first):
+    # int64 sequence numbers from `first` on, following the steps of `seq`; a drop counts as 1
+    step = np.diff(np.asarray(seq, dtype=np.int64))
+    return np.concatenate(([first], first + np.cumsum(np.where(step < 0, 1, step))))
+
+
+class _SeqUnwrapper:
+    # Makes the sequence numbers of a stream non-decreasing, chunk by chunk: the device counter
+    # wraps (or restarts on a reconnection), the unwrapped number then continues one after the last
+
+    def __init__(self):
+        self.last_raw = self.last = None
+
+    def __call__(self, seq):
+        if self.last is None:
+            first = int(seq[0])
+        else:
+            step = int(seq[0]) - self.last_raw
+            first = self.last + (step if step >= 0 else 1)
+        unwrapped = _unwrap_seq(seq, first)
+        self.last_raw, self.last = int(seq[-1]), int(unwrapped[-1])
+        return unwrapped
+
+
+def index_entry(records, offset, seq=None):
+    """INDEX_DTYPE entry of a chunk of records starting at byte `offset`; seq: their unwrapped sequence numbers"""
+    if seq is None:
+        seq = records["seq"]
+    entry = np.empty(1, dtype=INDEX_DTYPE)
+    entry["first_time"] = records["time"][0]
+    entry["last_time"] = records["time"][-1]
+    entry["first_seq"] = seq[0]
+    entry["last_seq"] = seq[-1]
+    entry["offset"] = offset
+    entry["count"] = len(records)
+    return entry
+
+
+class ChunkIndex:
+    """
+    Chunk table of one stream file: first / last host timestamp and sequence number, byte
+    offset and record count of every chunk, in file order. Lookups are binary searches over
+    the chunks, so a seek costs O(log chunks) before touching any record.
+
+    The sequence numbers are unwrapped (int64): the device counter wraps around, the index
+    continues one after the last number instead, so they never decrease and can be searched.
+    Until the first wrap they are the device's own.
+
+    The sidecar <stream file>.idx is written by StreamWriter as chunks are flushed; if it is
+    lost or out of date, rebuild() recreates it from the stream file.
+    """
+
+    def __init__(self, entries):
+        self.entries = np.asarray(entries, dtype=INDEX_DTYPE)
+        self.starts = np.concatenate(([0], np.cumsum(self.entries["count"])))  # first record of each chunk
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def records(self):
+        return int(self.starts[-1])
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            prefix = f.read(_INDEX_PREFIX.size)
+            if len(prefix) < _INDEX_PREFIX.size or _INDEX_PREFIX.unpack(prefix)[0] != INDEX_MAGIC:
+                raise ValueError("not a ZenLite recording index: " + path)
+            data = f.read()
+        # an entry cut short by a crash is dropped
+        return cls(np.frombuffer(data[:len(data) - len(data) % INDEX_DTYPE.itemsize], dtype=INDEX_DTYPE))
+
+    @classmethod
+    def rebuild(cls, records, offset, chunk_records=_REBUILD_CHUNK_RECORDS):
+        """Index of the records of a stream file starting at byte `offset`, in fixed-size chunks"""
+        unwrap = _SeqUnwrapper()
+        entries = []
+        for start in range(0, len(records), chunk_records):
+            chunk = records[start:start + chunk_records]
+            entries.append(index_entry(chunk, offset + start * records.dtype.itemsize, unwrap(chunk["seq"])))
+        return cls(np.concatenate(entries) if entries else np.empty(0, dtype=INDEX_DTYPE))
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(_INDEX_PREFIX.pack(INDEX_MAGIC, 1))
+            f.write(self.entries.tobytes())
+
+    def find_time(self, t):
+        """Index of the first chunk that may hold a sample at or after time t"""
+        return int(np.searchsorted(self.entries["last_time"], t, "left"))
+
+    def find_seq(self, seq):
+        """Index of the first chunk that may hold (unwrapped) sequence number seq or a later one"""
+        return int(np.searchsorted(self.entries["last_seq"], seq, "left"))
+
+
+class StreamWriter:
+    """
+    Append-only writer of one recording stream: a header, then fixed-size records.
+
+    Records are buffered in memory and written with one call when `flush_bytes` are pending
+    or `flush_interval` seconds have passed since the last write; each write is a chunk and
+    gets an entry in the sidecar index (see ChunkIndex). With a codec, each chunk is stored
+    compressed as a frame: payload length, record count, Codec.encode() output.
+
+    The file is fsync'ed at most every `fsync_interval` seconds (on a flush) and on close;
+    None never syncs, 0 syncs every chunk. crc32 is the checksum of everything after the header.
+    seq_unwrapper carries the unwrapped sequence numbers of the index over from a previous
+    file of the stream (the segments of a SegmentedStreamWriter).
+    """
+
+    def __init__(self, path, stream, dtype, meta=None, flush_bytes=_DEFAULT_FLUSH_BYTES,
+                 flush_interval=_DEFAULT_FLUSH_INTERVAL, codec=None, fsync_interval=None, seq_unwrapper=None):
+        self.path = path
+        self.stream = stream
+        self.dtype = np.dtype(dtype)
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.codec = codec
+        if codec is not None:
+            codec.check(self.dtype)
+        self._file = open(path, "wb")
+        self.header_size = write_header(self._file, stream, self.dtype, meta, codec)
+        self._index = open(index_path(path), "wb")
+        self._index.write(_INDEX_PREFIX.pack(INDEX_MAGIC, 1))
+        self._pending = []
+        self._pending_bytes = 0
+        self._pending_records = 0
+        self._last_flush = self._last_fsync = time.monotonic()
+        self.records = 0
+        self.bytes_written = self.header_size
+        self.raw_bytes = 0  # size of the records before compression
+        self.chunks = 0
+        self.fsyncs = 0
+        self.crc32 = 0
+        self.first_time = self.last_time = None
+        self.first_seq = self.last_seq = None
+        self._unwrap_seq = seq_unwrapper if seq_unwrapper is not None else _SeqUnwrapper()
+
+    def write(self, records):
+        if not len(records):
+            return
+        self._pending.append(records)
+        self._pending_bytes += records.nbytes
+        self._pending_records += len(records)
+        if self._pending_bytes >= self.flush_bytes or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush_if_due(self):
+        """Flush when flush_interval has passed, also without new records"""
+        if self._pending and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        data = np.concatenate(self._pending) if len(self._pending) > 1 else self._pending[0]
+        if self.codec is not None:
+            payload = self.codec.encode(data)
+            chunk = _FRAME.pack(len(payload), len(data)) + payload
+        else:
+            chunk = data.tobytes()
+        self._file.write(chunk)
+        self._file.flush()
+        # the index entry follows its data, so an index never points past the end of the file
+        self._index.write(index_entry(data, self.bytes_written, self._unwrap_seq(data["seq"])).tobytes())
+        self._index.flush()
+        self.records += len(data)
+        self.bytes_written += len(chunk)
+        self.raw_bytes += data.nbytes
+        self.chunks += 1
+        self.crc32 = zlib.crc32(chunk, self.crc32)
+        if self.first_time is None:
+            self.first_time, self.first_seq = float(data["time"][0]), int(data["seq"][0])
+        self.last_time, self.last_seq = float(data["time"][-1]), int(data["seq"][-1])
+        self._pending = []
+        self._pending_bytes = 0
+        self._pending_records = 0
+        if self.fsync_interval is not None and time.monotonic() - self._last_fsync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        """fsync the stream file and its index"""
+        os.fsync(self._file.fileno())
+        os.fsync(self._index.fileno())
+        self._last_fsync = time.monotonic()
+        self.fsyncs += 1
+
+    @property
+    def count(self):
+        """Records written so far, including the pending ones"""
+        return self.records + self._pending_records
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        if self.fsync_interval is not None:
+            self.sync()
+        self._file.close()
+        self._index.close()
+
+    def summary(self):
+        """Manifest entry of the file"""
+        return {"file": os.path.basename(self.path), "records": self.records, "bytes": self.bytes_written,
+                "crc32": self.crc32, "first_time": self.first_time, "last_time": self.last_time,
+                "first_seq": self.first_seq, "last_seq": self.last_seq}
+
+
+class SegmentedStreamWriter:
+    """
+    Writes one stream as a sequence of segment files (see segment_path): the current segment is
+    closed and the next one started at a chunk boundary once it holds `segment_bytes` bytes or is
+    `segment_seconds` old (either limit may be None). A crash can only damage the last segment.
+    on_segment(stream, summaries) is called with the summaries of all closed segments whenever
+    one is closed. Sample counts and the other StreamWriter counters cover all segments.
+    """
+
+    def __init__(self, base, stream, dtype, meta=None, segment_bytes=None, segment_seconds=None,
+                 on_segment=None, **writer_args):
+        self.base = base
+        self.stream = stream
+        self.dtype = np.dtype(dtype)
+        self.meta = dict(meta or {})
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.on_segment = on_segment
+        self.writer_args = writer_args
+        self.segments = []  # summaries of the closed segments
+        self._closed = {"records": 0, "bytes_written": 0, "raw_bytes": 0, "chunks": 0, "fsyncs": 0}
+        self._current = None
+        self._opened = None
+        self._unwrap_seq = _SeqUnwrapper()  # one sequence across the segments
+
+    def _open(self):
+        number = len(self.segments)
+        self._current = StreamWriter(segment_path(self.base, self.stream, number), self.stream, self.dtype,
+                                     dict(self.meta, segment=number), seq_unwrapper=self._unwrap_seq,
+                                     **self.writer_args)
+        self._opened = time.monotonic()
+
+    def _close_segment(self):
+        writer, self._current = self._current, None
+        writer.close()
+        summary = writer.summary()
+        summary["segment"] = len(self.segments)
+        self.segments.append(summary)
+        for name in self._closed:
+            self._closed[name] += getattr(writer, name)
+        if self.on_segment is not None:
+            self.on_segment(self.stream, list(self.segments))
+
+    def _rotate_if_due(self):
+        writer = self._current
+        if writer is None or not writer.count:
+            return
+        if (self.segment_bytes is not None and writer.bytes_written + writer._pending_bytes >= self.segment_bytes) or \
+                (self.segment_seconds is not None and time.monotonic() - self._opened >= self.segment_seconds):
+            self._close_segment()  # the next segment is opened by the next write
+
+    def write(self, records):
+        if not len(records):
+            return
+        if self._current is None:
+            self._open()
+        self._current.write(records)
+        self._rotate_if_due()
+
+    def flush_if_due(self):
+        if self._current is not None:
+            self._current.flush_if_due()
+            self._rotate_if_due()
+
+    def flush(self):
+        if self._current is not None:
+            self._current.flush()
+
+    def close(self):
+        if self._current is not None:
+            self._close_segment()
+
+    def _total(self, name):
+        return self._closed[name] + (getattr(self._current, name) if self._current is not None else 0)
+
+    @property
+    def count(self):
+        return self._closed["records"] + (self._current.count if self._current is not None else 0)
+
+    @property
+    def records(self):
+        return self._total("records")
+
+    @property
+    def bytes_written(self):
+        return self._total("bytes_written")
+
+    @property
+    def raw_bytes(self):
+        return self._total("raw_bytes")
+
+    @property
+    def chunks(self):
+        return self._total("chunks")
+
+    @property
+    def fsyncs(self):
+        return self._total("fsyncs")
+
+
+class Manifest:
+    """
+    <base>.manifest.json of a recording: per stream, the closed segments with their time and
+    sequence ranges, record counts, sizes and crc32. Rewritten atomically whenever a segment is
+    closed; a segment still being written when the process died is not listed.
+    """
+
+    def __init__(self, base, meta=None):
+        self.path = manifest_path(base)
+        self.data = {"version": MANIFEST_VERSION, "created": time.time(), "meta": dict(meta or {}), "streams": {}}
+
+    def update(self, stream, segments):
+        self.data["streams"][stream] = segments
+        self.save()
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=1)
+        os.replace(tmp, self.path)
+
+    @staticmethod
+    def load(base):
+        with open(manifest_path(base), encoding="utf-8") as f:
+            return json.load(f)
+
+
+def verify_recording(base):
+    """
+    Check every segment listed in the manifest of a recording against its size and crc32;
+    returns {file name: "ok" | "missing" | problem}.
+    """
+    folder = os.path.dirname(base)
+    results = {}
+    for stream, segments in Manifest.load(base)["streams"].items():
+        for summary in segments:
+            path = os.path.join(folder, summary["file"])
+            if not os.path.exists(path):
+                results[summary["file"]] = "missing"
+                continue
+            with open(path, "rb") as f:
+                read_header(f)
+                crc = 0
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    crc = zlib.crc32(block, crc)
+                size = f.tell()
+            if size != summary["bytes"]:
+                results[summary["file"]] = "size %d, expected %d" % (size, summary["bytes"])
+            elif crc != summary["crc32"]:
+                results[summary["file"]] = "crc32 mismatch"
+            else:
+                results[summary["file"]] = "ok"
+    return results
+
+
+def eeg_records(eeg_data, timestamp):
+    values = eeg_data.eeg_data
+    records = np.empty(len(values), dtype=EEG_RECORD_DTYPE)
+    records["time"] = timestamp
+    records["seq"] = eeg_data.sequence_num
+    records["value"] = values
+    return records
+
+
+def imu_records(imu_data, timestamp):
+    samples = imu_data.to_records()
+    records = np.empty(len(samples), dtype=IMU_RECORD_DTYPE)
+    records["time"] = timestamp
+    part = imu_data.acc_data if imu_data.acc_data is not None else imu_data.gyro_data
+    records["seq"] = part.sequence_num if part is not None else 0
+    for name in IMU_DTYPE.names:
+        records[name] = samples[name]
+    return records
+
+
+def struct_records(samples, sequence_num, timestamp, dtype):
+    records = np.empty(len(samples), dtype=dtype)
+    records["time"] = timestamp
+    records["seq"] = sequence_num
+    for name in samples.dtype.names:
+        records[name] = samples[name]
+    return records
+
+
+def algo_record(values, timestamp, seq):
+    """One ALGO_RECORD_DTYPE record from a dict of stress / meditation / stage / conf / drowsiness"""
+    record = np.empty(1, dtype=ALGO_RECORD_DTYPE)
+    for name in ("stress", "meditation", "conf", "drowsiness"):
+        record[name] = values.get(name, np.nan)
+    record["stage"] = values.get("stage", SleepStage.unknown)
+    record["time"] = timestamp
+    record["seq"] = seq
+    return record
+
+
+def event_record(label, timestamp, seq):
+    """One EVENT_RECORD_DTYPE record; the sample indexes are filled in when it is written"""
+    record = np.empty(1, dtype=EVENT_RECORD_DTYPE)
+    record["label"] = label.encode("utf-8")[:EVENT_LABEL_SIZE]
+    record["time"] = timestamp
+    record["seq"] = seq
+    for stream in DATA_STREAMS:
+        record[stream] = -1
+    return record
+
+
+def event_label(record):
+    return record["label"].decode("utf-8", "ignore")
+
+
+class SessionRecorder(ZenLiteDeviceListener):
+    """
+    Binary recording of one device: <base>_eeg.zlr, <base>_imu.zlr, <base>_ppg_raw.zlr,
+    <base>_ppg_algo.zlr and <base>_algo.zlr, each opened on its first packet and kept open
+    until close(). Every sample is one fixed-size record: host timestamp (time.time() of
+    the packet), sequence number and the sample's fields (see RECORD_DTYPES).
+
+    Use it as a device listener (or as a SessionManager recorder), or call the record_*
+    methods from an existing listener.
+
+    With background=True the files are written by a dedicated "zl-recorder" thread: the
+    record_* methods only build the records and queue them in a bounded StreamQueue of
+    queue_size packets, so the caller never waits for the disk. When the writer falls behind,
+    `overflow` decides (DeliveryPolicy.block waits up to block_timeout for space, then drops the
+    oldest packet; drop_oldest drops at once); drops are counted in io_stats(). close() drains
+    the queue before closing the files.
+
+    add_event(label) stores a label in <base>_evt.zlr with, for every data stream, the index of
+    the first sample recorded after it (see EventIndex).
+
+    codec is a Codec for every stream, or {stream: Codec} (streams not listed are stored raw),
+    e.g. {"eeg": Codec("zlib"), "ppg_raw": Codec("lzma")}; see benchmarks/bench_codec.py.
+
+    For long runs, segment_bytes / segment_seconds roll every stream over to a new segment file
+    (see SegmentedStreamWriter); closed segments are listed in <base>.manifest.json. Files are
+    fsync'ed every fsync_interval seconds (None: never) and when they are closed.
+    """
+
+    def __init__(self, base, meta=None, flush_bytes=_DEFAULT_FLUSH_BYTES, flush_interval=_DEFAULT_FLUSH_INTERVAL,
+                 background=False, queue_size=_DEFAULT_QUEUE_SIZE, overflow=DeliveryPolicy.block,
+                 block_timeout=_DEFAULT_BLOCK_TIMEOUT, codec=None, segment_bytes=None, segment_seconds=None,
+                 fsync_interval=_DEFAULT_FSYNC_INTERVAL):
+        self.base = base
+        self.meta = dict(meta or {})
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.fsync_interval = fsync_interval
+        self.manifest = Manifest(base, self.meta)
+        self.codecs = dict(codec) if isinstance(codec, dict) else dict.fromkeys(RECORD_DTYPES, codec)
+        for stream, stream_codec in self.codecs.items():
+            if stream not in RECORD_DTYPES:
+                raise ValueError("unknown stream %r" % stream)
+            if stream_codec is not None:
+                stream_codec.check(RECORD_DTYPES[stream])
+        self._writers = {}
+        self._algo_seq = 0
+        self._event_seq = 0
+        self._closed = False
+        self._started = time.monotonic()
+        self._batches = 0
+        self._batched_packets = 0
+        self._write_errors = 0
+        self._queue = None
+        self._thread = None
+        if background:
+            if DeliveryPolicy(overflow) == DeliveryPolicy.coalesce:
+                raise ValueError("a recorder cannot coalesce packets, use block or drop_oldest")
+            self._queue = StreamQueue("recorder", queue_size, overflow, block_timeout)
+            self._thread = threading.Thread(target=self._run, name="zl-recorder", daemon=True)
+            self._thread.start()
+
+    def _writer(self, stream):
+        writer = self._writers.get(stream)
+        if writer is None:
+            writer = self._writers[stream] = SegmentedStreamWriter(
+                self.base, stream, RECORD_DTYPES[stream], self.meta, self.segment_bytes, self.segment_seconds,
+                self.manifest.update, flush_bytes=self.flush_bytes, flush_interval=self.flush_interval,
+                codec=self.codecs.get(stream), fsync_interval=self.fsync_interval)
+        return writer
+
+    def write(self, stream, records):
+        if self._closed:
+            return
+        if self._queue is not None:
+            self._queue.put(stream, records)
+        else:
+            self._write_now(stream, records)
+
+    def _write_now(self, stream, records):
+        if stream == "evt":
+            # stamped by the thread writing the files, so the indexes match them exactly
+            for data_stream in DATA_STREAMS:
+                writer = self._writers.get(data_stream)
+                records[data_stream] = writer.count if writer is not None else 0
+        self._writer(stream).write(records)
+
+    def _run(self):
+        # writer thread: the only thread touching the files in background mode
+        queue = self._queue
+        while True:
+            batch = queue.get_batch(_WRITER_BATCH, timeout=self.flush_interval)
+            if not batch and queue.closed:
+                break
+            for stream, records, enqueue_time in batch:
+                try:
+                    if stream is None:
+                        self._flush_writers()
+                    else:
+                        self._write_now(stream, records)
+                except Exception:
+                    self._write_errors += 1
+                    if self._write_errors == 1:
+                        ZLOG.LOG_ERROR("recorder[%s]: write failed\n%s" % (self.base, traceback.format_exc()))
+                finally:
+                    queue.task_done(enqueue_time)
+            if batch:
+                self._batches += 1
+                self._batched_packets += len(batch)
+            for writer in self._writers.values():
+                writer.flush_if_due()
+        self._close_writers()
+
+    def record_eeg(self, eeg_data, timestamp=None):
+        self.write("eeg", eeg_records(eeg_data, time.time() if timestamp is None else timestamp))
+
+    def record_imu(self, imu_data, timestamp=None):
+        self.write("imu", imu_records(imu_data, time.time() if timestamp is None else timestamp))
+
+    def record_ppg(self, ppg_data, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        if ppg_data.raw is not None:
+            self.write("ppg_raw", struct_records(ppg_data.raw, ppg_data.sequence_num, timestamp, PPG_RAW_RECORD_DTYPE))
+        if ppg_data.algo is not None:
+            self.write("ppg_algo", struct_records(ppg_data.algo, ppg_data.sequence_num, timestamp, PPG_ALGO_RECORD_DTYPE))
+
+    def record_algo(self, values, timestamp=None):
+        self._algo_seq += 1
+        self.write("algo", algo_record(values, time.time() if timestamp is None else timestamp, self._algo_seq))
+
+    def add_event(self, label, timestamp=None):
+        self._event_seq += 1
+        self.write("evt", event_record(label, time.time() if timestamp is None else timestamp, self._event_seq))
+
+    # ZenLiteDeviceListener
+    def on_eeg_data(self, eeg_data):
+        self.record_eeg(eeg_data)
+
+    def on_imu_data(self, imu_data):
+        self.record_imu(imu_data)
+
+    def on_ppg_data(self, ppg_data):
+        self.record_ppg(ppg_data)
+
+    def on_stress(self, stress):
+        self.record_algo({"stress": stress})
+
+    def on_meditation(self, meditation):
+        self.record_algo({"meditation": meditation})
+
+    def on_sleep_stage(self, stage, conf, drowsiness):
+        self.record_algo({"stage": stage, "conf": conf, "drowsiness": drowsiness})
+
+    def flush(self):
+        """Write out the pending records (queued behind the packets already queued in background mode)"""
+        if self._queue is not None:
+            self._queue.put(None, None)
+        else:
+            self._flush_writers()
+
+    def _flush_writers(self):
+        for writer in self._writers.values():
+            writer.flush()
+
+    def _close_writers(self):
+        for writer in self._writers.values():
+            writer.close()
+
+    def close(self, drain=True, timeout=5.0):
+        """
+        Stop recording and close the files. In background mode the queued packets are written
+        first when drain is set; whatever is still queued after `timeout` seconds is dropped.
+        Returns False if the writer thread did not finish in time.
+        """
+        self._closed = True
+        if self._thread is None:
+            self._close_writers()
+            return True
+        self._queue.close(drain)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            pending = len(self._queue)
+            self._queue.close(drain=False)
+            ZLOG.LOG_WARNING("recorder[%s]: dropped %d queued packets on close" % (self.base, pending))
+            self._thread.join(self.flush_interval)
+        return not self._thread.is_alive()
+
+    def stats(self):
+        return {stream: {"records": w.records, "bytes": w.bytes_written, "raw_bytes": w.raw_bytes, "chunks": w.chunks,
+                         "segments": len(w.segments)}
+                for stream, w in list(self._writers.items())}
+
+    def io_stats(self):
+        """Queue depth, drops and write throughput of the recording"""
+        writers = list(self._writers.values())
+        written = sum(w.bytes_written for w in writers)
+        elapsed = time.monotonic() - self._started
+        stats = self._queue.stats() if self._queue is not None else {}
+        stats.update({
+            "background": self._queue is not None,
+            "bytes_written": written,
+            "bytes_per_s": written / elapsed if elapsed > 0 else 0.0,
+            "writes": sum(w.chunks for w in writers),
+            "fsyncs": sum(w.fsyncs for w in writers),
+            "packets_per_batch": self._batched_packets / self._batches if self._batches else 0.0,
+            "write_errors": self._write_errors,
+        })
+        return stats
+
+
+class _StreamSlicing:
+    # time / index / sequence slicing on top of len(), records, _search() and _range()
+
+    @property
+    def time(self):
+        return self.records["time"]
+
+    def time_slice(self, t0=None, t1=None):
+        """slice of the samples with t0 <= time < t1 (either bound may be None)"""
+        start = self._search("time", t0) if t0 is not None else 0
+        stop = self._search("time", t1) if t1 is not None else len(self)
+        return slice(start, max(start, stop))
+
+    def seq_slice(self, s0=None, s1=None):
+        """Samples of the packets with s0 <= sequence number < s1, unwrapped as in the ChunkIndex"""
+        start = self._search("seq", s0) if s0 is not None else 0
+        stop = self._search("seq", s1) if s1 is not None else len(self)
+        return self._range(start, max(start, stop))
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            if _is_time(key.start) or _is_time(key.stop):
+                if key.step is not None:
+                    raise ValueError("a time slice has no step")
+                key = self.time_slice(key.start, key.stop)
+            if key.step in (None, 1):
+                start, stop, _ = key.indices(len(self))
+                return self._range(start, stop)
+        return self.records[key]
+
+
+class RecordedStream(_StreamSlicing):
+    """
+    One .zlr stream mapped read-only into memory; nothing is read until it is accessed.
+
+    Indexing with floats selects by host timestamp, with ints by sample index; both return
+    views of the memory map (no copy):
+
+        stream[t0:t1]       samples with t0 <= time < t1
+        stream[1000:2000]   samples 1000..1999
+        stream["value"]     one field of every sample
+        stream.seq_slice(s0, s1)   samples of the packets with s0 <= seq < s1
+
+    Records are in arrival order, so timestamps and (unwrapped) sequence numbers are
+    non-decreasing: a bound is found with a binary search over the chunk index, then within one
+    chunk. A record still being written at the end of the file is ignored.
+
+    Compressed streams (written with a Codec) cannot be mapped as records: slices decode only
+    the chunks they overlap and return new arrays, `records` decodes the whole stream once.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.header, self.offset = read_header(f)
+            f.seek(0, 2)
+            size = f.tell()
+        self.stream = self.header["stream"]
+        self.meta = self.header.get("meta", {})
+        self.dtype = self.header["dtype"]
+        codec = self.header.get("codec")
+        self.codec = Codec.from_spec(codec) if codec else None
+        self._index = None
+        self._cached_chunk = (None, None)
+        if self.codec is not None:
+            self._records = None
+            self._data = np.memmap(path, dtype=np.uint8, mode="r")  # chunk frames
+            return
+        count = max(0, size - self.offset) // self.dtype.itemsize
+        if count:
+            self._records = np.memmap(path, dtype=self.dtype, mode="r", offset=self.offset, shape=(count,))
+        else:
+            self._records = np.empty(0, dtype=self.dtype)  # an empty file cannot be mapped
+
+    @property
+    def records(self):
+        if self._records is None:
+            self._records = self._range(0, len(self))
+        return self._records
+
+    @property
+    def index(self):
+        """ChunkIndex of the stream, rebuilt (and saved, if possible) when the sidecar is missing or stale"""
+        if self._index is None:
+            path = index_path(self.path)
+            try:
+                index = ChunkIndex.load(path)
+            except (OSError, ValueError):
+                index = None
+            if index is None or not self._covers(index):
+                index = self._rebuild_index()
+                try:
+                    index.save(path)
+                except OSError:
+                    pass
+            self._index = index
+        return self._index
+
+    def _covers(self, index):
+        if self.codec is None:
+            return index.records == len(self._records)
+        end = self._frame_end(int(index.entries["offset"][-1])) if len(index) else self.offset
+        return end == len(self._data)
+
+    def _rebuild_index(self):
+        if self.codec is None:
+            return ChunkIndex.rebuild(self._records, self.offset)
+        unwrap = _SeqUnwrapper()
+        entries = []
+        for offset, count, payload in self._frames():
+            records = self.codec.decode(payload, self.dtype, count)
+            entries.append(index_entry(records, offset, unwrap(records["seq"])))
+        return ChunkIndex(np.concatenate(entries) if entries else np.empty(0, dtype=INDEX_DTYPE))
+
+    def _frames(self):
+        # (offset, record count, payload) of every complete chunk frame
+        offset = self.offset
+        while offset + _FRAME.size <= len(self._data):
+            end = self._frame_end(offset)
+            if end > len(self._data):
+                break
+            yield offset, _FRAME.unpack_from(self._data, offset)[1], self._data[offset + _FRAME.size:end].tobytes()
+            offset = end
+
+    def _frame_end(self, offset):
+        return offset + _FRAME.size + _FRAME.unpack_from(self._data, offset)[0]
+
+    def _chunk(self, i):
+        index = self.index
+        if self.codec is None:
+            return self._records[int(index.starts[i]):int(index.starts[i + 1])]
+        cached, records = self._cached_chunk
+        if cached != i:
+            offset = int(index.entries["offset"][i])
+            length, count = _FRAME.unpack_from(self._data, offset)
+            payload = self._data[offset + _FRAME.size:offset + _FRAME.size + length].tobytes()
+            records = self.codec.decode(payload, self.dtype, count)
+            self._cached_chunk = (i, records)
+        return records
+
+    def _range(self, start, stop):
+        # records start..stop-1, decoding only the chunks they are in
+        if self._records is not None:
+            return self._records[start:stop]
+        if start >= stop:
+            return np.empty(0, dtype=self.dtype)
+        starts = self.index.starts
+        first = int(np.searchsorted(starts, start, "right")) - 1
+        last = int(np.searchsorted(starts, stop, "left"))
+        chunks = [self._chunk(i) for i in range(first, last)]
+        records = np.concatenate(chunks) if len(chunks) > 1 else chunks[0]
+        return records[start - int(starts[first]):stop - int(starts[first])]
+
+    def __len__(self):
+        return len(self._records) if self._records is not None else self.index.records
+
+    @property
+    def start_time(self):
+        return float(self.index.entries["first_time"][0]) if len(self) else None
+
+    @property
+    def end_time(self):
+        return float(self.index.entries["last_time"][-1]) if len(self) else None
+
+    def _search(self, field, value):
+        # first record whose field is >= value
+        index = self.index
+        chunk = index.find_time(value) if field == "time" else index.find_seq(value)
+        if chunk >= len(index):
+            return len(self)
+        values = self._chunk(chunk)[field]
+        if field == "seq":
+            values = _unwrap_seq(values, int(index.entries["first_seq"][chunk]))
+        return int(index.starts[chunk]) + int(np.searchsorted(values, value, "left"))
+
+
+def _is_time(value):
+    return isinstance(value, (float, np.floating))
+
+
+class SegmentedStream(_StreamSlicing):
+    """
+    A stream recorded as several segment files (see SegmentedStreamWriter), read as one
+    RecordedStream: sample indexes, time and sequence lookups span all segments. Slices inside
+    one segment are views of its memory map, slices across segments are concatenated.
+    """
+
+    def __init__(self, segments):
+        self.segments = segments
+        first = segments[0]
+        self.path = first.path
+        self.header = first.header
+        self.stream = first.stream
+        self.meta = first.meta
+        self.dtype = first.dtype
+        self.codec = first.codec
+        self.starts = np.concatenate(([0], np.cumsum([len(segment) for segment in segments])))
+        self._records = None
+
+    def __len__(self):
+        return int(self.starts[-1])
+
+    @property
+    def records(self):
+        if self._records is None:
+            self._records = self._range(0, len(self))
+        return self._records
+
+    @property
+    def start_time(self):
+        return next((segment.start_time for segment in self.segments if len(segment)), None)
+
+    @property
+    def end_time(self):
+        return next((segment.end_time for segment in reversed(self.segments) if len(segment)), None)
+
+    def _search(self, field, value):
+        for i, segment in enumerate(self.segments):
+            if len(segment) and segment.index.entries["last_" + field][-1] >= value:
+                return int(self.starts[i]) + segment._search(field, value)
+        return len(self)
+
+    def _range(self, start, stop):
+        if start >= stop:
+            return np.empty(0, dtype=self.dtype)
+        first = int(np.searchsorted(self.starts, start, "right")) - 1
+        last = int(np.searchsorted(self.starts, stop, "left"))
+        parts = [self.segments[i]._range(max(0, start - int(self.starts[i])), min(stop, int(self.starts[i + 1])) - int(self.starts[i]))
+                 for i in range(first, last)]
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+
+def open_stream(base, stream):
+    """RecordedStream or SegmentedStream of a recorded stream, None if it was not recorded"""
+    paths = segment_paths(base, stream)
+    if not paths:
+        return None
+    if len(paths) == 1:
+        return RecordedStream(paths[0])
+    return SegmentedStream([RecordedStream(path) for path in paths])
+
+
+class SessionReader:
+    """
+    The .zlr files of one SessionRecorder session, each stream a RecordedStream (None when the
+    stream was not recorded):
+
+        session = SessionReader("data/20240101/10-00-00_baseline")
+        eeg = session.eeg[session.eeg.start_time + 60.0:session.eeg.start_time + 120.0]
+        values = eeg["value"]
+    """
+
+    def __init__(self, base):
+        for stream in RECORD_DTYPES:
+            suffix = "_" + stream + RECORDING_EXT
+            if base.endswith(suffix):
+                base = base[:-len(suffix)]
+        if base.endswith(MANIFEST_EXT):
+            base = base[:-len(MANIFEST_EXT)]
+        self.base = base
+        self.streams = {}
+        for stream in RECORD_DTYPES:
+            recorded = open_stream(base, stream)
+            if recorded is not None:
+                self.streams[stream] = recorded
+        if not self.streams:
+            raise FileNotFoundError("no recording found at " + base)
+        self.eeg = self.streams.get("eeg")
+        self.imu = self.streams.get("imu")
+        self.ppg_raw = self.streams.get("ppg_raw")
+        self.ppg_algo = self.streams.get("ppg_algo")
+        self.algo = self.streams.get("algo")
+        self.evt = self.streams.get("evt")
+        self._event_index = None
+
+    def __getitem__(self, stream):
+        return self.streams[stream]
+
+    @property
+    def event_index(self):
+        if self._event_index is None:
+            events = self.evt.records if self.evt is not None else np.empty(0, dtype=EVENT_RECORD_DTYPE)
+            self._event_index = EventIndex(events, self.streams)
+        return self._event_index
+
+    def events(self):
+        """(time, label) of every event"""
+        return [(float(record["time"]), event_label(record)) for record in self.event_index.events]
+
+    def intervals(self, start_label, end_label=None):
+        return self.event_index.intervals(start_label, end_label)
+
+    def segments(self, stream, start_label, end_label=None):
+        """Samples of `stream` in every interval from start_label to end_label (see EventIndex.intervals)"""
+        recorded = self.streams.get(stream)
+        if recorded is None:
+            return []
+        intervals = self.intervals(start_label, end_label)
+        return [recorded[int(start):int(stop)]
+                for start, stop in zip(intervals[stream + "_start"], intervals[stream + "_stop"])]
+
+    @property
+    def meta(self):
+        return next(iter(self.streams.values())).meta
+
+    @property
+    def manifest(self):
+        """Contents of <base>.manifest.json, None for recordings without one"""
+        try:
+            return Manifest.load(self.base)
+        except OSError:
+            return None
+
+    def verify(self):
+        return verify_recording(self.base)
+
+    @property
+    def start_time(self):
+        return min((s.start_time for s in self.streams.values() if len(s)), default=None)
+
+    @property
+    def end_time(self):
+        return max((s.end_time for s in self.streams.values() if len(s)), default=None)
+
+
+class EventIndex:
+    """
+    Events of a session with the sample index of every data stream at each event, for
+    vectorized interval queries:
+
+        intervals = index.intervals("task start", "task end")
+        eeg_segments = [eeg[a:b] for a, b in zip(intervals["eeg_start"], intervals["eeg_stop"])]
+
+    Indexes the recorder could not know (-1, e.g. events of converted text recordings) are
+    looked up by time, once.
+    """
+
+    def __init__(self, events, streams):
+        self.events = np.array(events, dtype=EVENT_RECORD_DTYPE)
+        self.lengths = {stream: len(streams[stream]) if stream in streams else 0 for stream in DATA_STREAMS}
+        for stream in DATA_STREAMS:
+            missing = self.events[stream] < 0
+            if missing.any():
+                recorded = streams.get(stream)
+                self.events[stream][missing] = [recorded.time_slice(t).start if recorded is not None else 0
+                                                for t in self.events["time"][missing]]
+
+    def __len__(self):
+        return len(self.events)
+
+    def find(self, label):
+        """Positions of the events labelled `label`"""
+        return np.flatnonzero(self.events["label"] == label.encode("utf-8")[:EVENT_LABEL_SIZE])
+
+    def intervals(self, start_label, end_label=None):
+        """
+        INTERVAL_DTYPE array, one row per start_label event: from it to the first end_label event
+        after it (start events without one are dropped), or to the next event of any label when
+        end_label is None (the last one ends with the recording). Stream ranges are half-open
+        [<stream>_start, <stream>_stop).
+        """
+        starts = self.find(start_label)
+        if end_label is None:
+            ends = starts + 1
+        else:
+            end_events = self.find(end_label)
+            following = np.searchsorted(end_events, starts, "right")
+            starts = starts[following < len(end_events)]
+            ends = end_events[following[following < len(end_events)]]
+        closed = ends < len(self.events)
+        intervals = np.empty(len(starts), dtype=INTERVAL_DTYPE)
+        intervals["start_event"] = starts
+        intervals["end_event"] = np.where(closed, ends, -1)
+        intervals["start_time"] = self.events["time"][starts]
+        intervals["end_time"] = np.where(closed, self.events["time"][np.minimum(ends, len(self.events) - 1)], np.inf)
+        for stream in DATA_STREAMS:
+            intervals[stream + "_start"] = self.events[stream][starts]
+            intervals[stream + "_stop"] = np.where(closed, self.events[stream][np.minimum(ends, len(self.events) - 1)],
+                                                   self.lengths[stream])
+        return intervals
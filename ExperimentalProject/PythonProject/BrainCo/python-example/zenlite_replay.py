@@ -0,0 +1,317 @@
+import csv
+import heapq
+import itertools
+import json
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+from zenlite_sdk import *
+from zen_logger import ZLOG
+
+# order of simultaneous events: state first, then data, then algorithm results
+_KIND_ORDER = {"eeg": 0, "imu": 1, "ppg": 2, "stress": 3, "meditation": 3, "sleep_stage": 3}
+
+
+def _number(value, default=0.0):
+    return default if value is None or value == "None" else value
+
+
+class RecordedSession:
+    """
+    A session written by ZenLiteGUI.save_data_to_file: <base>_eeg.txt|.csv, <base>_imu.txt|.csv,
+    <base>_ppg.txt and <base>_algo.txt, any of which may be missing.
+
+    events() yields (time, name, args) in timestamp order, where name is a listener callback
+    ("eeg", "imu", "ppg", "stress", "meditation", "sleep_stage") and args are the decoded
+    listener arguments: EEGData / IMUData / PPGData objects are rebuilt from native structs
+    and decoded by the SDK classes, exactly as for a live device.
+    """
+
+    def __init__(self, base, eeg_sample_rate=256.0, imu_sample_rate=50.0):
+        for suffix in ("_eeg", "_imu", "_ppg", "_algo"):
+            for ext in (".txt", ".csv"):
+                if base.endswith(suffix + ext):
+                    base = base[:-len(suffix + ext)]
+        self.base = base
+        self.eeg_sample_rate = eeg_sample_rate  # csv files do not store it
+        self.imu_sample_rate = imu_sample_rate
+        self.skipped_lines = 0
+
+    def path(self, stream):
+        for ext in (".txt", ".csv"):
+            path = self.base + "_" + stream + ext
+            if os.path.exists(path):
+                return path
+        return None
+
+    @property
+    def streams(self):
+        return [stream for stream in ("eeg", "imu", "ppg", "algo") if self.path(stream)]
+
+    def events(self):
+        readers = []
+        for stream in self.streams:
+            path = self.path(stream)
+            reader = getattr(self, "_read_%s_%s" % (stream, path.rsplit(".", 1)[1]), None)
+            if reader is None:
+                ZLOG.LOG_WARNING("replay: no reader for " + path)
+                continue
+            readers.append(reader(path))
+        counter = itertools.count()
+        # each file is written in arrival order, so a k-way merge keeps the whole session ordered
+        merged = heapq.merge(*[((t, _KIND_ORDER[name], next(counter), name, build) for t, name, build in reader)
+                               for reader in readers])
+        for t, _, _, name, build in merged:
+            yield t, name, build
+
+    # readers yield (time, name, build) where build() returns the listener arguments
+    def _json_lines(self, path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # typically the last line of a session that was still being written
+                    self.skipped_lines += 1
+
+    def _csv_packets(self, path):
+        # rows of one packet share the packet's timestamp
+        with open(path, newline="") as f:
+            rows = csv.reader(f)
+            next(rows, None)
+            packet_time, packet = None, []
+            for row in rows:
+                try:
+                    values = [float(v) for v in row]
+                except ValueError:
+                    self.skipped_lines += 1
+                    continue
+                if packet and values[0] != packet_time:
+                    yield packet_time, np.array(packet)
+                    packet = []
+                packet_time = values[0]
+                packet.append(values[1:])
+            if packet:
+                yield packet_time, np.array(packet)
+
+    def _read_eeg_txt(self, path):
+        for record in self._json_lines(path):
+            yield record["time"], "eeg", _eeg_builder(record.get("sequence_num", 0),
+                                                      record.get("sample_rate", self.eeg_sample_rate), record["data"])
+
+    def _read_eeg_csv(self, path):
+        for seq, (t, values) in enumerate(self._csv_packets(path)):
+            yield t, "eeg", _eeg_builder(seq, self.eeg_sample_rate, values[:, 0])
+
+    def _read_imu_txt(self, path):
+        for record in self._json_lines(path):
+            acc, gyro, euler = record.get("acc"), record.get("gyro"), record.get("euler")
+            yield record["time"], "imu", _imu_builder(
+                record.get("sample_rate", self.imu_sample_rate),
+                (acc.get("sequence_num", 0), np.column_stack((acc["x"], acc["y"], acc["z"]))) if acc else None,
+                (gyro.get("sequence_num", 0), np.column_stack((gyro["x"], gyro["y"], gyro["z"]))) if gyro else None,
+                np.column_stack((euler["yaw"], euler["pitch"], euler["roll"])) if euler else None)
+
+    def _read_imu_csv(self, path):
+        for seq, (t, values) in enumerate(self._csv_packets(path)):
+            parts = [values[:, i:i + 3] for i in (0, 3, 6)]
+            parts = [None if np.isnan(part).all() else part for part in parts]
+            yield t, "imu", _imu_builder(
+                self.imu_sample_rate,
+                (seq, parts[0]) if parts[0] is not None else None,
+                (seq, parts[1]) if parts[1] is not None else None,
+                parts[2])
+
+    def _read_ppg_txt(self, path):
+        for seq, record in enumerate(self._json_lines(path)):
+            yield record["time"], "ppg", _ppg_builder(seq, record)
+
+    def _read_algo_txt(self, path):
+        for record in self._json_lines(path):
+            t = record.pop("time")
+            if "stage" in record:
+                args = (SleepStage(record["stage"]), record.get("conf", 0.0), record.get("drowsiness", 0.0))
+                yield t, "sleep_stage", lambda args=args: args
+            for name in ("stress", "meditation"):
+                if name in record:
+                    yield t, name, lambda value=record[name]: (value,)
+
+
+def _eeg_builder(seq, sample_rate, data):
+    def build():
+        samples = np.ascontiguousarray(data, dtype=np.float32)
+        buf = ffi.new("float[]", len(samples))
+        ffi.memmove(buf, samples, samples.nbytes)
+        c_data = ffi.new("EEGData *", {"sequence_num": seq, "sample_rate": sample_rate,
+                                       "eeg_data": buf, "eeg_size": len(samples)})
+        # detach: the native buffer is freed when build() returns
+        eeg = EEGData(c_data[0], ZenLiteSDK.array_mode)
+        if getattr(eeg, "_is_view", False):
+            eeg.detach()
+        return eeg,
+    return build
+
+
+def _c_points(values):
+    values = np.ascontiguousarray(values, dtype=np.float32)
+    points = ffi.new("Point3D[]", len(values))
+    ffi.memmove(points, values, values.nbytes)
+    return points
+
+
+def _imu_builder(sample_rate, acc, gyro, euler):
+    def build():
+        keep = []
+        init = {"sample_rate": sample_rate}
+        for field, c_type, part in (("acc_data", "ACCData *", acc), ("gyro_data", "GyroData *", gyro)):
+            if part is not None:
+                seq, values = part
+                points = _c_points(values)
+                keep.append(points)
+                init[field] = ffi.new(c_type, {"sequence_num": seq, "data": points, "size": len(values)})
+        if euler is not None:
+            columns = [ffi.new("float[]", np.asarray(euler[:, i], dtype=np.float32).tolist()) for i in range(3)]
+            keep.extend(columns)
+            init["euler_angle_data"] = ffi.new("EulerAngleData *", {"yaw": columns[0], "pitch": columns[1],
+                                                                    "roll": columns[2], "size": len(euler)})
+        return IMUData(ffi.new("IMUData *", init)[0]),
+    return build
+
+
+def _ppg_rows(rows, c_type, dtype):
+    rows = rows or []
+    c_rows = ffi.new(c_type + "[]", len(rows))
+    for c_row, row in zip(c_rows, rows):
+        for name in dtype.names:
+            if name in row:
+                setattr(c_row, name, row[name])
+    return c_rows, len(rows)
+
+
+def _ppg_builder(seq, record):
+    def build():
+        raw, raw_size = _ppg_rows(record.get("raw_data"), "PPGRawData", PPG_RAW_DTYPE)
+        algo, algo_size = _ppg_rows(record.get("algo_data"), "PPGAlgoData", PPG_ALGO_DTYPE)
+        init = {"sequence_num": seq, "report_rate": record.get("sample_rate", 0.0),
+                "raw_data": raw, "raw_data_size": raw_size, "algo_data": algo, "algo_data_size": algo_size}
+        respiratory = record.get("respiratory") or {}
+        curve = respiratory.get("curve")
+        if isinstance(curve, list) and curve:
+            init.update(respiratory_curve=ffi.new("float[]", curve), respiratory_curve_size=len(curve),
+                        respiratory_rate=_number(respiratory.get("rate")),
+                        respiratory_state=int(_number(respiratory.get("state"), 0)))
+        return PPGData(ffi.new("PPGData *", init)[0]),
+    return build
+
+
+class SessionReplay:
+    """
+    Plays a RecordedSession into a ZenLiteDeviceListener in timestamp order.
+
+      speed=1.0   real time (the recorded gaps between packets are kept)
+      speed=N     N times real time
+      speed=0     as fast as possible
+
+        replay = SessionReplay(RecordedSession("data/subject01"), speed=0)
+        stats = replay.play(listener)      # or replay.start(listener) ... replay.stop()
+        print(stats["events_per_s"], stats["realtime_factor"])
+    """
+
+    def __init__(self, session, speed=1.0, start=None, end=None):
+        self.session = session if isinstance(session, RecordedSession) else RecordedSession(session)
+        self.speed = speed
+        self.start_time = start  # optional recorded time range
+        self.end_time = end
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = None
+
+    def play(self, listener):
+        """Replay on the calling thread; returns the replay statistics"""
+        handlers = {
+            "eeg": listener.on_eeg_data,
+            "imu": listener.on_imu_data,
+            "ppg": listener.on_ppg_data,
+            "stress": listener.on_stress,
+            "meditation": listener.on_meditation,
+            "sleep_stage": listener.on_sleep_stage,
+        }
+        counts = dict.fromkeys(handlers, 0)
+        self._stop.clear()
+        first = last = None
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        listener_ns = 0
+        for t, name, build in self.session.events():
+            if self._stop.is_set():
+                break
+            if self.start_time is not None and t < self.start_time:
+                continue
+            if self.end_time is not None and t > self.end_time:
+                break
+            if first is None:
+                first = t
+            last = t
+            if self.speed:
+                delay = wall_start + (t - first) / self.speed - time.perf_counter()
+                if delay > 0 and self._stop.wait(delay):
+                    break
+            args = build()
+            t0 = time.perf_counter_ns()
+            handlers[name](*args)
+            listener_ns += time.perf_counter_ns() - t0
+            counts[name] += 1
+        wall = time.perf_counter() - wall_start
+        recorded = (last - first) if first is not None else 0.0
+        events = sum(counts.values())
+        self.stats = {
+            "events": events,
+            "counts": counts,
+            "recorded_seconds": recorded,
+            "wall_seconds": wall,
+            "cpu_seconds": time.process_time() - cpu_start,
+            "listener_seconds": listener_ns / 1e9,
+            "events_per_s": events / wall if wall > 0 else math.inf,
+            "realtime_factor": recorded / wall if wall > 0 else math.inf,
+            "skipped_lines": self.session.skipped_lines,
+        }
+        return self.stats
+
+    def start(self, listener):
+        """Replay on a background thread"""
+        self.stop()
+        self._thread = threading.Thread(target=self.play, args=(listener,), name="zl-replay", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def wait(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay a recorded session into a no-op listener and report throughput")
+    parser.add_argument("session", help="session base path, e.g. data/subject01 or data/subject01_eeg.txt")
+    parser.add_argument("--speed", type=float, default=0.0, help="1 = real time, N = N x real time, 0 = as fast as possible")
+    args = parser.parse_args()
+
+    ZenLiteSDK.set_array_mode(ArrayMode.copy)
+    stats = SessionReplay(args.session, speed=args.speed).play(ZenLiteDeviceListener())
+    for key, value in stats.items():
+        print("%-18s %s" % (key, value))
@@ -0,0 +1,271 @@
+import threading
+
+import numpy as np
+
+
+class RingBuffer:
+    """
+    The most recent `capacity` samples of a stream, in fixed storage allocated once.
+
+      RingBuffer(1280, dtype=np.float32)       single channel, samples have shape (n,)
+      RingBuffer(250, channels=3)              multi-channel, samples have shape (channels, n)
+
+    Every sample is stored twice, at i and i + capacity of a buffer of 2 * capacity, so the
+    window is always one contiguous slice: append() costs O(packet), whatever the capacity,
+    and view() never concatenates.
+
+    `version` counts the changes of the window; snapshot(since) copies it only when it changed
+    after the version a consumer last saw.
+    """
+
+    def __init__(self, capacity, channels=None, dtype=np.float64):
+        if capacity < 1:
+            raise ValueError("capacity must be >= 1")
+        self.capacity = int(capacity)
+        self.channels = channels
+        self.dtype = np.dtype(dtype)
+        shape = (2 * self.capacity,) if channels is None else (channels, 2 * self.capacity)
+        self._data = np.zeros(shape, dtype=self.dtype)
+        self._head = 0  # storage index of the next sample, in [0, capacity)
+        self._size = 0
+        self.total = 0  # samples appended since creation
+        self.version = 0
+        self._lock = threading.RLock()
+
+    def append(self, values):
+        """Append a scalar, (n,) samples or, with channels, (channels, n) samples"""
+        values = np.asarray(values, dtype=self.dtype)
+        if self.channels is None:
+            values = values.reshape(-1)
+        elif values.ndim == 1:
+            values = values.reshape(self.channels, -1)
+        if values.shape[-1] == 0:
+            return
+        with self._lock:
+            self._write(values)
+            self.version += 1
+
+    def _write(self, values):
+        n = values.shape[-1]
+        self.total += n
+        if n > self.capacity:
+            values = values[..., -self.capacity:]
+            self._head = (self._head + n - self.capacity) % self.capacity
+            n = self.capacity
+        capacity, head = self.capacity, self._head
+        first = min(n, capacity - head)
+        self._data[..., head:head + first] = values[..., :first]
+        self._data[..., head + capacity:head + capacity + first] = values[..., :first]
+        if first < n:
+            self._data[..., :n - first] = values[..., first:]
+            self._data[..., capacity:capacity + n - first] = values[..., first:]
+        self._head = (head + n) % capacity
+        self._size = min(capacity, self._size + n)
+
+    def view(self):
+        """The window, oldest sample first, as a view of the storage (overwritten by later appends)"""
+        end = self._head + self.capacity
+        return self._data[..., end - self._size:end]
+
+    def read(self):
+        """A copy of the window, oldest sample first"""
+        with self._lock:
+            return self.view().copy()
+
+    def snapshot(self, since=None):
+        """
+        (version, window): a read-only copy of the window, or None if the window did not change
+        since version `since`. Consumers start with since=0, which skips a window that never
+        had a sample.
+        """
+        with self._lock:
+            if self.version == since:
+                return since, None
+            window = self.view().copy()
+            window.flags.writeable = False
+            return self.version, window
+
+    def resize(self, capacity):
+        """Change the capacity, keeping the most recent samples"""
+        capacity = int(capacity)
+        if capacity == self.capacity:
+            return
+        if capacity < 1:
+            raise ValueError("capacity must be >= 1")
+        with self._lock:
+            kept = self.view()[..., -capacity:].copy()
+            if kept.shape[-1] < self._size:
+                self.version += 1
+            shape = (2 * capacity,) if self.channels is None else (self.channels, 2 * capacity)
+            self._data = np.zeros(shape, dtype=self.dtype)
+            self.capacity = capacity
+            self._size = kept.shape[-1]
+            self._head = self._size % capacity
+            self._data[..., :self._size] = kept
+            self._data[..., capacity:capacity + self._size] = kept
+
+    def clear(self):
+        with self._lock:
+            if self._size:
+                self.version += 1
+            self._head = 0
+            self._size = 0
+
+    def __len__(self):
+        return self._size
+
+
+class MinMaxRing(RingBuffer):
+    """
+    RingBuffer that also keeps a min/max pyramid of its samples for plotting: level k holds
+    the min and max of every block of 2**k samples and is extended as samples arrive, so
+    append() stays O(packet). decimate(width) returns at most 2 * width points (6 for a width
+    under 3) that keep every peak of the window, whatever its length; NaN samples are ignored.
+    """
+
+    MIN_BLOCKS = 32  # levels are kept while they have this many blocks; coarser buckets are reduced on demand
+
+    def __init__(self, capacity, channels=None, dtype=np.float64):
+        super(MinMaxRing, self).__init__(capacity, channels, dtype)
+        self._reset_levels()
+
+    def _reset_levels(self):
+        # blocks are aligned to self._origin, the absolute index of the first sample they cover
+        self._origin = self.total - self._size
+        self._levels = []  # [mins ring, maxs ring, carried min, carried max] per level 1, 2, ...
+        blocks = self.capacity // 2
+        while blocks >= self.MIN_BLOCKS:
+            self._levels.append([RingBuffer(blocks + 1, self.channels, self.dtype),
+                                 RingBuffer(blocks + 1, self.channels, self.dtype), None, None])
+            blocks //= 2
+
+    def _write(self, values):
+        super(MinMaxRing, self)._write(values)
+        mins = maxs = values
+        for level in self._levels:
+            level_mins, level_maxs, carried_min, carried_max = level
+            if carried_min is not None:
+                mins = np.concatenate([carried_min, mins], -1)
+                maxs = np.concatenate([carried_max, maxs], -1)
+            paired = mins.shape[-1] // 2 * 2
+            level[2:] = (mins[..., paired:], maxs[..., paired:]) if paired < mins.shape[-1] else (None, None)
+            if not paired:
+                break
+            mins = np.fmin(mins[..., 0:paired:2], mins[..., 1:paired:2])
+            maxs = np.fmax(maxs[..., 0:paired:2], maxs[..., 1:paired:2])
+            level_mins._write(mins)
+            level_maxs._write(maxs)
+
+    def resize(self, capacity):
+        with self._lock:
+            if int(capacity) == self.capacity:
+                return
+            super(MinMaxRing, self).resize(capacity)
+            kept = self.view().copy()
+            self.total -= kept.shape[-1]  # _write counts the samples again
+            self._size = self._head = 0
+            self._reset_levels()
+            self._write(kept)
+
+    def clear(self):
+        with self._lock:
+            super(MinMaxRing, self).clear()
+            self._reset_levels()
+
+    def decimate(self, width):
+        """
+        (x, y) of the window for a plot `width` pixels wide: y holds the min and max of each
+        of at most max(width, 3) buckets ((channels, points) with channels), x the sample
+        offset of each point from the start of the window. Windows of up to 2 * width samples
+        are returned as they are.
+        """
+        with self._lock:
+            size = self._size
+            if size <= 2 * width or not self._levels:
+                return np.arange(size, dtype=np.float64), self.view().copy()
+            k = 1
+            while size >> k > max(1, width - 2):  # room for the partial buckets at both ends
+                k += 1
+            # buckets of 2**k samples, from `group` blocks of the nearest level kept
+            level = min(k, len(self._levels))
+            group = 1 << (k - level)
+            block = 1 << k
+            start = self.total - size - self._origin  # window start, relative to the block alignment
+            first = -(-start // block)  # first bucket entirely inside the window
+            end = (self.total - self._origin) // block
+            level_end = (self.total - self._origin) >> level  # the last complete block of the level is level_end - 1
+            level_mins, level_maxs = self._levels[level - 1][:2]
+            count = len(level_mins)
+            blocks = slice(count - (level_end - first * group), count - (level_end - end * group))
+            window = self.view()
+            head = first * block - start
+            tail = (end * block) - start
+            starts = [np.arange(first, end) * block - start]
+            mins = level_mins.view()[..., blocks]
+            maxs = level_maxs.view()[..., blocks]
+            if group > 1:
+                mins = np.fmin.reduce(mins.reshape(mins.shape[:-1] + (-1, group)), -1)
+                maxs = np.fmax.reduce(maxs.reshape(maxs.shape[:-1] + (-1, group)), -1)
+            mins, maxs = [mins], [maxs]
+            # samples before the first and after the last complete block are one bucket each
+            if head:
+                starts.insert(0, [0])
+                mins.insert(0, np.fmin.reduce(window[..., :head], -1, keepdims=True))
+                maxs.insert(0, np.fmax.reduce(window[..., :head], -1, keepdims=True))
+            if tail < size:
+                starts.append([tail])
+                mins.append(np.fmin.reduce(window[..., tail:], -1, keepdims=True))
+                maxs.append(np.fmax.reduce(window[..., tail:], -1, keepdims=True))
+            starts = np.concatenate(starts).astype(np.float64)
+            widths = np.diff(np.append(starts, size))
+            x = np.column_stack([starts, starts + widths / 2]).reshape(-1)
+            y = np.stack([np.concatenate(mins, -1), np.concatenate(maxs, -1)], -1)
+            return x, y.reshape(y.shape[:-2] + (-1,))
+
+    def snapshot_decimated(self, width, since=None):
+        """(version, (x, y)) as decimate(width), or (since, None) if unchanged since `since`"""
+        with self._lock:
+            if self.version == since:
+                return since, None
+            x, y = self.decimate(width)
+            y.flags.writeable = False
+            return self.version, (x, y)
+
+
+class RingGroup:
+    """
+    Named ring buffers of one stream that are updated together (e.g. IMU acc / gyro / euler).
+
+    They share one lock: appends made under `with group.lock:` are seen all or nothing by
+    snapshot(), which returns {name: window} for all rings.
+    """
+
+    def __init__(self, **rings):
+        self.lock = threading.RLock()
+        self._rings = rings
+        for ring in rings.values():
+            ring._lock = self.lock
+
+    def __getitem__(self, name):
+        return self._rings[name]
+
+    def items(self):
+        return self._rings.items()
+
+    @property
+    def version(self):
+        # every change increments one ring, so the sum changes whenever any ring does
+        return sum(ring.version for ring in self._rings.values())
+
+    def resize(self, capacity):
+        with self.lock:
+            for ring in self._rings.values():
+                ring.resize(capacity)
+
+    def snapshot(self, since=None):
+        """(version, {name: read-only window}), or (since, None) if no ring changed since `since`"""
+        with self.lock:
+            version = self.version
+            if version == since:
+                return since, None
+            return version, {name: ring.snapshot()[1] for name, ring in self._rings.items()}
@@ -1,10 +1,16 @@
 import abc
+import importlib
 import os
 import platform
 import sys
+import time
+from collections import namedtuple
 from enum import IntEnum  # Enum declarations
 from zen_logger import logwrap, ZLOG
+from zenlite_delivery import CallbackDelivery, DeliveryPolicy
+from zenlite_async import DataStream
 
+import numpy as np
 from cffi import FFI
 
 ffi = FFI()
@@ -12,6 +18,7 @@ ffi = FFI()
 # Defining SDK constants
 _DEFAULT_DEVICE_SCAN_INTERVAL = 5  # Seconds
 _ENABLE_SOCIAL_ENGAGEMENT = True
+_RESPONSE_CALLBACK_TTL = 60  # Seconds before an unanswered command callback is dropped
 
 
 def load_library():
@@ -27,7 +34,15 @@ def load_library():
             .replace("#endif", "")
         ffi.cdef(sdk_header)
 
-    # 2. find library path and load
+    # 2. pick the backend: ZENLITE_BACKEND=native (default), synthetic, or "module:factory" called with ffi
+    backend = os.environ.get("ZENLITE_BACKEND", "native")
+    if backend == "synthetic":
+        return _synthetic_backend()
+    if backend != "native":
+        module_name, _, factory = backend.partition(":")
+        return getattr(importlib.import_module(module_name), factory or "create_backend")(ffi)
+
+    # 3. find library path and load
     arch = platform.architecture()[0]
     if platform.system() == "Darwin":
         return ffi.dlopen(os.path.join(lib_dir, "mac", "libzenlite.dylib"))
@@ -37,13 +52,75 @@ def load_library():
         os.environ["PATH"] += os.pathsep + os.path.join(lib_dir, "win")
         return ffi.dlopen(os.path.join(lib_dir, "win", "zenlite.dll"))
     else:
-        raise Exception("Unsupported platform: " + platform.system() + ", arch: " + arch)
+        ZLOG.LOG_WARNING("No native ZenLite library for platform: " + platform.system() + ", arch: " + arch
+                         + "; using the synthetic device backend")
+        return _synthetic_backend()
+
+
+def _synthetic_backend():
+    from zenlite_synthetic import SyntheticBackend
+    return SyntheticBackend.from_environ(ffi)
 
 
 # load ZenLiteSDK library
 libzenlite = load_library()
 
 
+def _struct_dtype(c_type, fields):
+    # numpy dtype with the same field offsets and itemsize as the cdef'd C struct
+    names = [name for name, _ in fields]
+    return np.dtype({"names": names,
+                     "formats": [fmt for _, fmt in fields],
+                     "offsets": [ffi.offsetof(c_type, name) for name in names],
+                     "itemsize": ffi.sizeof(c_type)})
+
+
+def _struct_array(c_ptr, size, dtype):
+    # one buffer copy of `size` C structs into an owned structured array
+    return np.frombuffer(ffi.buffer(c_ptr, size * dtype.itemsize), dtype=dtype).copy()
+
+
+# Structured dtypes mirroring PPGRawData / PPGAlgoData in libzenlite/zenlite_sdk.h
+PPG_RAW_DTYPE = _struct_dtype("PPGRawData", [
+    ("green1_count", "i4"),
+    ("green2_count", "i4"),
+    ("ir_count", "i4"),
+    ("red_count", "i4"),
+])
+
+PPG_ALGO_DTYPE = _struct_dtype("PPGAlgoData", [
+    ("hr", "f4"),
+    ("hr_conf", "i4"),
+    ("rr", "f4"),
+    ("rr_conf", "i4"),
+    ("activity", "i4"),
+    ("spo2", "f4"),
+    ("spo2_r", "f4"),
+    ("spo2_conf", "i4"),
+    ("spo2_progress", "i4"),
+    ("spo2_lsq_flag", "?"),
+    ("spo2_mt_flag", "?"),
+    ("spo2_lp_flag", "?"),
+    ("spo2_ur_flag", "?"),
+    ("hrv", "f4"),
+    ("hrv_stress", "f4"),
+    ("stress", "f4"),
+    ("spo2_state", "i4"),
+    ("contact_state", "i4"),
+])
+
+# One record per IMU sample; axes of a disabled sensor are NaN
+IMU_DTYPE = np.dtype([("acc", "f4", (3,)), ("gyro", "f4", (3,)), ("euler", "f4", (3,))])
+
+# One record per algorithm callback (host time); fields the callback does not report are NaN / -1
+ALGO_DTYPE = np.dtype([("time", "f8"), ("stress", "f4"), ("meditation", "f4"),
+                       ("stage", "i4"), ("conf", "f4"), ("drowsiness", "f4")])
+
+# Row types giving PPGRawData / PPGAlgoData attribute access to structured array records
+_PPGRawRow = namedtuple("_PPGRawRow", PPG_RAW_DTYPE.names)
+_PPGAlgoRow = namedtuple("_PPGAlgoRow", PPG_ALGO_DTYPE.names)
+
+
 def get_sdk_version():
     return ffi.string(libzenlite.zl_get_sdk_version()).decode("utf-8")
 
@@ -222,6 +299,16 @@ class IMUSampleRate(IntEnum):
     sr800 = 7
 
 
+IMU_SAMPLE_RATE_HZ = {
+    IMUSampleRate.sr25: 25,
+    IMUSampleRate.sr50: 50,
+    IMUSampleRate.sr100: 100,
+    IMUSampleRate.sr200: 200,
+    IMUSampleRate.sr400: 400,
+    IMUSampleRate.sr800: 800,
+}
+
+
 class IMUMode(IntEnum):
     none = 0
     acc = 1
@@ -346,6 +433,7 @@ class ZLErrorCode(IntEnum):
 class ZLError:
     code = None
     message = None
+    msg_id = None  # id of the sent command, set when a zl_* command was accepted
 
     def __init__(self, code):
         self.code = code
@@ -368,15 +456,63 @@ class DeviceInfo:
         self.firmware_revision = ffi.string(c_info.firmware, 16).decode("utf-8")
 
 
+class ArrayMode(IntEnum):
+    """
+    How sample buffers of data packets are handed to listeners.
+
+      legacy: Python list of floats (ffi.unpack), owned by Python
+      view:   np.float32 view over the native buffer. The C buffer is only valid
+              while the callback runs, so the array must not be kept (or read from
+              another thread) after the listener returns; call detach() to keep it
+      copy:   np.float32 array owned by Python, filled with a single memcpy
+
+    A preallocated output buffer set with ZenLiteDevice.set_eeg_output_buffer()
+    replaces the per-packet allocation in view/copy mode; it is overwritten by
+    the next packet of the same device. With queued delivery enabled, view/copy
+    mode packets always get their own array.
+    """
+    legacy = 0
+    view = 1
+    copy = 2
+
+
+def _float_view(c_ptr, size):
+    if c_ptr == ffi.NULL or size <= 0:
+        return np.empty(0, dtype=np.float32)
+    return np.frombuffer(ffi.buffer(c_ptr, size * ffi.sizeof("float")), dtype=np.float32)
+
+
 class EEGData:
     sequence_num = None
     sample_rate = None
     eeg_data = None
+    _is_view = False
 
-    def __init__(self, c_data):
+    def __init__(self, c_data, array_mode=ArrayMode.legacy, out=None):
         self.sequence_num = c_data.sequence_num
         self.sample_rate = c_data.sample_rate
-        self.eeg_data = ffi.unpack(c_data.eeg_data, c_data.eeg_size)
+        if array_mode == ArrayMode.legacy:
+            self.eeg_data = ffi.unpack(c_data.eeg_data, c_data.eeg_size)
+            return
+
+        samples = _float_view(c_data.eeg_data, c_data.eeg_size)
+        if out is not None and len(out) >= len(samples):
+            out[:len(samples)] = samples
+            self.eeg_data = out[:len(samples)]
+        elif out is not None or array_mode == ArrayMode.copy:
+            if out is not None:
+                ZLOG.LOG_WARNING("EEG output buffer too small (%d < %d), copying packet" % (len(out), len(samples)))
+            self.eeg_data = samples.copy()
+        else:
+            self.eeg_data = samples
+            self._is_view = True
+
+    def detach(self):
+        """Copy a view-mode packet out of native memory so it outlives the callback"""
+        if self._is_view:
+            self.eeg_data = self.eeg_data.copy()
+            self._is_view = False
+        return self
 
 
 class PPGAlgoData:
@@ -440,34 +576,49 @@ class PPGRawData:
 
 
 class PPGData:
+    """
+    PPG packet. `raw` and `algo` are structured arrays (PPG_RAW_DTYPE / PPG_ALGO_DTYPE),
+    one record per sample, e.g. ppg_data.raw['ir_count'] or ppg_data.algo['hr'].
+
+    raw_data / algo_data are the former lists of PPGRawData / PPGAlgoData objects; they
+    are only built, once, when accessed.
+    """
     sequence_num = None
     sample_rate = None
-    raw_data = None
-    algo_data = None
+    raw = None
+    algo = None
     respiratory_rate = None
     respiratory_curve = None
     respiratory_state = None
+    _raw_data = None
+    _algo_data = None
 
     def __init__(self, c_data):
         self.sequence_num = c_data.sequence_num
         self.sample_rate = c_data.report_rate
 
         if c_data.raw_data != ffi.NULL and c_data.raw_data_size > 0:
-            raw_data = ffi.unpack(c_data.raw_data, c_data.raw_data_size)
-            self.raw_data = []  # * c_data.raw_data_size
-            for i in range(0, c_data.raw_data_size):
-                self.raw_data.append(PPGRawData(raw_data[i]))
+            self.raw = _struct_array(c_data.raw_data, c_data.raw_data_size, PPG_RAW_DTYPE)
             if c_data.respiratory_curve != ffi.NULL and c_data.respiratory_curve_size > 0:
                 self.respiratory_curve = ffi.unpack(c_data.respiratory_curve, c_data.respiratory_curve_size)
                 self.respiratory_rate = c_data.respiratory_rate
                 self.respiratory_state = RespiratoryState(c_data.respiratory_state)
-                
+
         if c_data.algo_data != ffi.NULL and c_data.algo_data_size > 0:
-            algo_data = ffi.unpack(c_data.algo_data, c_data.algo_data_size)
-            self.algo_data = []
-            for i in range(0, c_data.algo_data_size):
-                self.algo_data.append(PPGAlgoData(algo_data[i]))
-        
+            self.algo = _struct_array(c_data.algo_data, c_data.algo_data_size, PPG_ALGO_DTYPE)
+
+    @property
+    def raw_data(self):
+        if self._raw_data is None and self.raw is not None:
+            self._raw_data = [PPGRawData(_PPGRawRow(*row)) for row in self.raw.tolist()]
+        return self._raw_data
+
+    @property
+    def algo_data(self):
+        if self._algo_data is None and self.algo is not None:
+            self._algo_data = [PPGAlgoData(_PPGAlgoRow(*row)) for row in self.algo.tolist()]
+        return self._algo_data
+
     def __str__(self):
         if self.raw_data is not None:
             return "seq_num=%s raw_data=%s" % (self.sequence_num, self.raw_data[0])
@@ -475,58 +626,91 @@ class PPGData:
             return "seq_num=%s raw_data=%s" % (self.sequence_num, self.algo_data[0])
 
 
-class ACCData:
+def _point3d_array(c_ptr, size):
+    # (N, 3) float32 copy of a contiguous Point3D buffer, decoded with a single memmove
+    if c_ptr == ffi.NULL or size <= 0:
+        return np.empty((0, 3), dtype=np.float32)
+    out = np.empty((size, 3), dtype=np.float32)
+    ffi.memmove(out, c_ptr, size * ffi.sizeof("Point3D"))
+    return out
+
+
+_FLOAT_SIZE = ffi.sizeof("float")
+
+
+def _float_columns(c_ptrs, size):
+    # (N, len(c_ptrs)) float32 array from separate float* buffers: the buffers are joined with
+    # one copy and the bytes wrapped column-major, without a reshape or a second copy
+    if size <= 0:
+        return np.empty((0, len(c_ptrs)), dtype=np.float32)
+    nbytes = size * _FLOAT_SIZE
+    data = bytearray().join([ffi.buffer(c_ptr, nbytes) for c_ptr in c_ptrs])
+    return np.ndarray((size, len(c_ptrs)), dtype=np.float32, buffer=data, strides=(_FLOAT_SIZE, nbytes))
+
+
+class _Point3DData:
     sequence_num = None
-    x = None
-    y = None
-    z = None
+    data = None  # (N, 3) float32: x, y, z
 
     def __init__(self, c_data):
         self.sequence_num = c_data.sequence_num
-        points = ffi.unpack(c_data.data, c_data.size)
-        self.x = [0.0] * c_data.size
-        self.y = [0.0] * c_data.size
-        self.z = [0.0] * c_data.size
-        for i in range(0, c_data.size):
-            self.x[i] = points[i].x
-            self.y[i] = points[i].y
-            self.z[i] = points[i].z
+        self.data = _point3d_array(c_data.data, c_data.size)
+
+    @property
+    def x(self):
+        return self.data[:, 0]
+
+    @property
+    def y(self):
+        return self.data[:, 1]
+
+    @property
+    def z(self):
+        return self.data[:, 2]
+
+    def to_json(self):
+        return {"sequence_num": self.sequence_num, "x": self.x.tolist(), "y": self.y.tolist(), "z": self.z.tolist()}
 
     def __str__(self):
         return "sn=%s, x=%s, y=%s, z=%s" % (self.sequence_num, self.x, self.y, self.z)
 
 
-class GyroData:
-    sequence_num = None
-    x = None
-    y = None
-    z = None
+class ACCData(_Point3DData):
+    pass
 
-    def __init__(self, c_data):
-        self.sequence_num = c_data.sequence_num
-        points = ffi.unpack(c_data.data, c_data.size)
 
-        self.x = [0.0] * c_data.size
-        self.y = [0.0] * c_data.size
-        self.z = [0.0] * c_data.size
-        for i in range(0, c_data.size):
-            self.x[i] = points[i].x
-            self.y[i] = points[i].y
-            self.z[i] = points[i].z
+class GyroData(_Point3DData):
+    pass
 
 
 class EulerAngleData:
-    yaw = None
-    pitch = None
-    roll = None
+    data = None  # (N, 3) float32: yaw, pitch, roll
 
     def __init__(self, c_data):
-        self.yaw = ffi.unpack(c_data.yaw, c_data.size)
-        self.pitch = ffi.unpack(c_data.pitch, c_data.size)
-        self.roll = ffi.unpack(c_data.roll, c_data.size)
+        self.data = _float_columns((c_data.yaw, c_data.pitch, c_data.roll), c_data.size)
+
+    @property
+    def yaw(self):
+        return self.data[:, 0]
+
+    @property
+    def pitch(self):
+        return self.data[:, 1]
+
+    @property
+    def roll(self):
+        return self.data[:, 2]
+
+    def to_json(self):
+        return {"yaw": self.yaw.tolist(), "pitch": self.pitch.tolist(), "roll": self.roll.tolist()}
 
 
 class IMUData:
+    """
+    IMU packet. acc / gyro / euler are (N, 3) float32 arrays (x, y, z or yaw, pitch, roll),
+    None when the stream is not enabled; acc_data / gyro_data / euler_angle_data keep the
+    per-axis accessors.
+    """
     acc_data = None
     gyro_data = None
     euler_angle_data = None
@@ -548,6 +732,27 @@ class IMUData:
         if c_data.euler_angle_data != ffi.NULL:
             self.euler_angle_data = EulerAngleData(c_data.euler_angle_data)
 
+    @property
+    def acc(self):
+        return self.acc_data.data if self.acc_data is not None else None
+
+    @property
+    def gyro(self):
+        return self.gyro_data.data if self.gyro_data is not None else None
+
+    @property
+    def euler(self):
+        return self.euler_angle_data.data if self.euler_angle_data is not None else None
+
+    def to_records(self):
+        """The packet as an IMU_DTYPE structured array, NaN for disabled sensors"""
+        parts = (self.acc, self.gyro, self.euler)
+        records = np.full(max((len(p) for p in parts if p is not None), default=0), np.nan, dtype=IMU_DTYPE)
+        for field, data in zip(IMU_DTYPE.names, parts):
+            if data is not None:
+                records[field][:len(data)] = data
+        return records
+
 
 class SleepReport:
     beginTime = None
@@ -587,10 +792,110 @@ class BrainWave:
         self.gamma = c_stats.gamma
 
 
+class CallbackStats:
+    """
+    Per-callback counters of one device: number of calls, time spent before the listener
+    runs (device lookup + decoding) and time spent in the listener, in nanoseconds.
+    Written from the SDK callback thread only.
+    """
+
+    def __init__(self):
+        self._stats = {}
+
+    def record(self, name, overhead_ns, listener_ns):
+        entry = self._stats.get(name)
+        if entry is None:
+            entry = self._stats[name] = [0, 0, 0, 0]
+        entry[0] += 1
+        entry[1] += overhead_ns
+        entry[2] += listener_ns
+        if overhead_ns > entry[3]:
+            entry[3] = overhead_ns
+
+    def reset(self):
+        self._stats = {}
+
+    def snapshot(self):
+        return {name: {"count": count,
+                       "overhead_mean_us": overhead / count / 1e3,
+                       "overhead_max_us": overhead_max / 1e3,
+                       "listener_mean_us": listener / count / 1e3}
+                for name, (count, overhead, listener, overhead_max) in list(self._stats.items())}
+
+
+class _ListenerHandlers:
+    """Listener methods resolved once in set_listener instead of on every packet"""
+    __slots__ = ("on_device_info_ready", "on_eeg_data", "on_imu_data", "on_ppg_data", "on_brain_wave", "on_error",
+                 "on_connectivity_change", "on_contact_state_change", "on_orientation_change", "on_event",
+                 "on_stress", "on_meditation", "on_sleep_stage", "on_blink", "on_sleep_report")
+
+    def __init__(self, listener=None):
+        for name in self.__slots__:
+            setattr(self, name, getattr(listener, name) if listener is not None else None)
+
+
+class _DeviceDispatch:
+    """
+    Maps the device id pointer the native SDK passes to every callback to its ZenLiteDevice,
+    so the 40-byte uuid is decoded once per device instead of once per packet.
+    The SDK hands out the id buffer of the device itself, which lives as long as the
+    connection; entries are dropped when the device disconnects.
+    """
+    _by_ptr = {}
+
+    @classmethod
+    def device(cls, uuid_ptr):
+        key = int(ffi.cast("uintptr_t", uuid_ptr))
+        device = cls._by_ptr.get(key)
+        if device is None:
+            device = ZenLiteDevice._device_map.get(ffi.string(uuid_ptr, 40).decode("utf-8"))
+            if device is not None:
+                cls._by_ptr[key] = device
+        return device
+
+    @classmethod
+    def forget(cls, device):
+        for key in [key for key, value in cls._by_ptr.items() if value is device]:
+            del cls._by_ptr[key]
+
+
+# Delivery stream of each callback name used by ZenLiteDevice._dispatch, for queued delivery
+_CALLBACK_STREAMS = {
+    "eeg": "eeg",
+    "imu": "imu",
+    "ppg": "ppg",
+    "stress": "algo",
+    "meditation": "algo",
+    "sleep_stage": "algo",
+    "brain_wave": "algo",
+    "sleep_report": "algo",
+    "connectivity": "state",
+    "contact_state": "state",
+    "orientation": "state",
+    "event": "state",
+    "error": "state",
+    "blink": "state",
+    "device_info": "state",
+}
+
+_DEFAULT_DELIVERY_POLICIES = {
+    "eeg": DeliveryPolicy.block,
+    "imu": DeliveryPolicy.block,
+    "ppg": DeliveryPolicy.block,
+    "algo": DeliveryPolicy.drop_oldest,
+    "state": DeliveryPolicy.block,
+}
+
+
+def _uuid_str(uuid_ptr):
+    return ffi.string(uuid_ptr, 40).decode("utf-8")
+
+
 class ZenLiteDevice(ZenLiteDeviceListener):
     _device_pointer_map = {}
     _device_map = {}
     _config_response_callbacks = {}
+    _config_response_issued = {}  # msg_id -> time.monotonic() when the command was sent
     _sys_info_cb = None
 
     __address = 0
@@ -601,8 +906,13 @@ class ZenLiteDevice(ZenLiteDeviceListener):
     __in_pairing_mode = False
 
     __listener = None
+    _handlers = _ListenerHandlers()
+    _eeg_out = None
+    _delivery = None
+    _streams = {}  # callback name -> tuple of DataStream, replaced (never mutated) on (un)subscribe
 
     def __init__(self, uuid, name, address, broadcast_battery_level):
+        self.callback_stats = CallbackStats()
         self.__uuid = uuid
         self.__name = name
         self.__address = address
@@ -658,40 +968,56 @@ class ZenLiteDevice(ZenLiteDeviceListener):
     def in_pairing_mode(self):
         return self.__in_pairing_mode
 
+    @staticmethod
+    def _register_response(res, cb):
+        if res > 0:  # res is now msg_id
+            ZenLiteDevice.purge_stale_response_callbacks()
+            if cb is not None:
+                ZenLiteDevice._config_response_callbacks[res] = cb
+                ZenLiteDevice._config_response_issued[res] = time.monotonic()
+            err = ZLError(ZLErrorCode.none)
+            err.msg_id = res
+            return err
+        return ZLError(res)
+
+    @staticmethod
+    def _pop_response_callback(msg_id):
+        ZenLiteDevice._config_response_issued.pop(msg_id, None)
+        return ZenLiteDevice._config_response_callbacks.pop(msg_id, None)
+
+    @staticmethod
+    def discard_response_callback(msg_id):
+        """Forget the response callback of a command, e.g. after the caller gave up waiting"""
+        return ZenLiteDevice._pop_response_callback(msg_id) is not None
+
+    @staticmethod
+    def purge_stale_response_callbacks(max_age=_RESPONSE_CALLBACK_TTL):
+        """Drop response callbacks of commands sent more than max_age seconds ago; returns their msg_ids"""
+        deadline = time.monotonic() - max_age
+        stale = [msg_id for msg_id, issued in list(ZenLiteDevice._config_response_issued.items()) if issued < deadline]
+        for msg_id in stale:
+            ZenLiteDevice._pop_response_callback(msg_id)
+        return stale
+
     # ZenLite msg
     def zl_config_afe(self, sample_rate, cb=None):
         if self.__uuid in ZenLiteDevice._device_pointer_map:
             res = libzenlite.zl_config_afe(ZenLiteDevice._device_pointer_map[self.__uuid], sample_rate, ZenLiteDevice.__on_afe_config_response_internal)
-            if res > 0:  # res is now msg_id
-                if cb is not None:
-                    ZenLiteDevice._config_response_callbacks[res] = cb
-                return ZLError(ZLErrorCode.none)
-            else:
-                return ZLError(res)
+            return self._register_response(res, cb)
         else:
             fatal_error("Calling zl_config_afe before connecting to device")
 
     def zl_config_imu(self, sample_rate, mode=0, cb=None):
         if self.__uuid in ZenLiteDevice._device_pointer_map:
             res = libzenlite.zl_config_imu(ZenLiteDevice._device_pointer_map[self.__uuid], sample_rate, mode, ZenLiteDevice.__on_imu_config_response_internal)
-            if res > 0:  # res is now msg_id
-                if cb is not None:
-                    ZenLiteDevice._config_response_callbacks[res] = cb
-                return ZLError(ZLErrorCode.none)
-            else:
-                return ZLError(res)
+            return self._register_response(res, cb)
         else:
             fatal_error("Calling zl_config_imu before connecting to device")
 
     def zl_config_ppg(self, sample_rate, mode, raw_set_reg=0, raw_set_value=0, cb=None):
         if self.__uuid in ZenLiteDevice._device_pointer_map:
             res = libzenlite.zl_config_ppg(ZenLiteDevice._device_pointer_map[self.__uuid], sample_rate, mode, raw_set_reg, raw_set_value, ZenLiteDevice.__on_afe_config_response_internal)
-            if res > 0:  # res is now msg_id
-                if cb is not None:
-                    ZenLiteDevice._config_response_callbacks[res] = cb
-                return ZLError(ZLErrorCode.none)
-            else:
-                return ZLError(res)
+            return self._register_response(res, cb)
         else:
             fatal_error("Calling zl_config_ppg before connecting to device")
 
@@ -700,60 +1026,35 @@ class ZenLiteDevice(ZenLiteDeviceListener):
         if self.__uuid in ZenLiteDevice._device_pointer_map:
             res = libzenlite.zl_sys_cmd(ZenLiteDevice._device_pointer_map[self.__uuid], cmd, ZenLiteDevice.__on_afe_config_response_internal)
             print("res:", res)
-            if res > 0:  # res is now msg_id
-                if cb is not None:
-                    ZenLiteDevice._config_response_callbacks[res] = cb
-                return ZLError(ZLErrorCode.none)
-            else:
-                return ZLError(res)
+            return self._register_response(res, cb)
         else:
             fatal_error("Calling zl_sys_cmd before connecting to device")
 
     def zl_pair(self, in_pairing_mode, cb=None):
         if self.__uuid in ZenLiteDevice._device_pointer_map:
             res = libzenlite.zl_pair(ZenLiteDevice._device_pointer_map[self.__uuid], in_pairing_mode, ZenLiteDevice.__on_afe_config_response_internal)
-            if res > 0:  # res is now msg_id
-                if cb is not None:
-                    ZenLiteDevice._config_response_callbacks[res] = cb
-                return ZLError(ZLErrorCode.none)
-            else:
-                return ZLError(res)
+            return self._register_response(res, cb)
         else:
             fatal_error("Calling zl_pair before connecting to device")
 
     def zl_set_device_name(self, name, cb=None):
         if self.__uuid in ZenLiteDevice._device_pointer_map:
             res = libzenlite.zl_set_device_name(ZenLiteDevice._device_pointer_map[self.__uuid], name, ZenLiteDevice.__on_afe_config_response_internal)
-            if res > 0:  # res is now msg_id
-                if cb is not None:
-                    ZenLiteDevice._config_response_callbacks[res] = cb
-                return ZLError(ZLErrorCode.none)
-            else:
-                return ZLError(res)
+            return self._register_response(res, cb)
         else:
             fatal_error("Calling zl_set_device_name before connecting to device")
 
     def zl_set_sleep_idle_time(self, sec, cb=None):
         if self.__uuid in ZenLiteDevice._device_pointer_map:
             res = libzenlite.zl_set_sleep_idle_time(ZenLiteDevice._device_pointer_map[self.__uuid], sec, ZenLiteDevice.__on_sys_config_response_internal)
-            if res > 0:  # res is now msg_id
-                if cb is not None:
-                    ZenLiteDevice._config_response_callbacks[res] = cb
-                return ZLError(ZLErrorCode.none)
-            else:
-                return ZLError(res)
+            return self._register_response(res, cb)
         else:
             fatal_error("Calling zl_set_sleep_idle_time before connecting to device")
 
     def zl_set_sleep_mode(self, enabled, cb=None):
         if self.__uuid in ZenLiteDevice._device_pointer_map:
             res = libzenlite.zl_set_sleep_mode(ZenLiteDevice._device_pointer_map[self.__uuid], enabled, ZenLiteDevice.__on_afe_config_response_internal)
-            if res > 0:  # res is now msg_id
-                if cb is not None:
-                    ZenLiteDevice._config_response_callbacks[res] = cb
-                return ZLError(ZLErrorCode.none)
-            else:
-                return ZLError(res)
+            return self._register_response(res, cb)
         else:
             fatal_error("Calling zl_set_sleep_mode before connecting to device")
 
@@ -761,58 +1062,134 @@ class ZenLiteDevice(ZenLiteDeviceListener):
         if self.__uuid in ZenLiteDevice._device_pointer_map:
             self._sys_info_cb = sys_info_cb
             res = libzenlite.zl_get_sys_info(ZenLiteDevice._device_pointer_map[self.__uuid], ZenLiteDevice.__on_afe_config_response_internal, ZenLiteDevice.__on_sys_info_internal)
-            if res > 0:  # res is now msg_id
-                if cb is not None:
-                    ZenLiteDevice._config_response_callbacks[res] = cb
-                return ZLError(ZLErrorCode.none)
-            else:
-                return ZLError(res)
+            return self._register_response(res, cb)
         else:
             fatal_error("Calling zl_get_sys_info before connecting to device")
 
+    def set_eeg_output_buffer(self, out):
+        """
+        Decode EEG packets of this device into a caller-owned buffer (view/copy array mode only).
+
+        out must be a 1-D, C-contiguous np.float32 array at least one packet long;
+        EEGData.eeg_data is then a slice of out that the next packet overwrites.
+        Pass None to go back to per-packet arrays.
+        """
+        if out is not None and (not isinstance(out, np.ndarray) or out.dtype != np.float32
+                                or out.ndim != 1 or not out.flags.c_contiguous):
+            raise ValueError("EEG output buffer must be a 1-D C-contiguous float32 ndarray")
+        self._eeg_out = out
+
+    def enable_queued_delivery(self, policies=None, maxsize=256, block_timeout=1.0):
+        """
+        Deliver listener callbacks from worker threads instead of the SDK's native thread.
+
+        Native callbacks only decode (copying every sample out of native memory) and queue the
+        packet; one worker per stream ("eeg", "imu", "ppg", "algo", "state") calls the listener.
+        policies maps stream names to a DeliveryPolicy, overriding the defaults (block for data
+        and state streams, drop_oldest for algo). Counters are returned by delivery_stats().
+        """
+        self.disable_queued_delivery()
+        merged = dict(_DEFAULT_DELIVERY_POLICIES)
+        merged.update(policies or {})
+        self._delivery = CallbackDelivery(_CALLBACK_STREAMS, merged, maxsize, block_timeout)
+
+    def disable_queued_delivery(self, drain=True, timeout=5.0):
+        """Go back to synchronous callbacks; pending packets are delivered first unless drain is False"""
+        delivery, self._delivery = self._delivery, None
+        if delivery is not None:
+            delivery.close(drain, timeout)
+
+    def delivery_stats(self):
+        """Queue depth, drop, coalesce and latency counters per stream, None when delivery is synchronous"""
+        return self._delivery.stats() if self._delivery is not None else None
+
+    def _call_listener(self, name, handler, args):
+        delivery = self._delivery
+        if delivery is not None:
+            delivery.put(name, handler, args)
+        else:
+            handler(*args)
+
+    def eeg_stream(self, batch=True, maxsize=1024):
+        """Async iterator of EEG samples: 1-D float32 arrays"""
+        return self._open_stream(("eeg",), _combine_eeg, batch, maxsize)
+
+    def imu_stream(self, batch=True, maxsize=1024):
+        """Async iterator of IMU samples: IMU_DTYPE structured arrays"""
+        return self._open_stream(("imu",), _combine_imu, batch, maxsize)
+
+    def ppg_stream(self, batch=True, maxsize=1024):
+        """Async iterator of PPG samples: dicts with 'raw' (PPG_RAW_DTYPE) and 'algo' (PPG_ALGO_DTYPE) arrays or None"""
+        return self._open_stream(("ppg",), _combine_ppg, batch, maxsize)
+
+    def algo_stream(self, batch=True, maxsize=1024):
+        """Async iterator of stress / meditation / sleep stage results: ALGO_DTYPE structured arrays"""
+        return self._open_stream(("stress", "meditation", "sleep_stage"), _combine_algo, batch, maxsize)
+
+    def _open_stream(self, names, combine, batch, maxsize):
+        stream = DataStream(combine, maxsize, batch, on_close=self._close_stream)
+        streams = dict(self._streams)
+        for name in names:
+            streams[name] = streams.get(name, ()) + (stream,)
+        self._streams = streams
+        if self.__listener is None:
+            # a stream works without a listener; it needs the data callbacks all the same
+            self._set_native_callbacks()
+        return stream
+
+    def _close_stream(self, stream):
+        streams = {}
+        for name, subscribers in self._streams.items():
+            subscribers = tuple(s for s in subscribers if s is not stream)
+            if subscribers:
+                streams[name] = subscribers
+        self._streams = streams
+        if self.__listener is None and not streams:
+            # nobody consumes the data any more: stop the calls into Python for every packet
+            self._set_native_callbacks(data=False)
+
     def set_listener(self, listener):
         if isinstance(listener, ZenLiteDeviceListener):
             self.__listener = listener
-            if self.__uuid in ZenLiteDevice._device_pointer_map:
-                device_ptr = ZenLiteDevice._device_pointer_map[self.__uuid]
-                libzenlite.zl_set_signal_quality_warning_callback(device_ptr, ZenLiteDevice.__on_signal_quality_warning_internal)
-
-                if listener is not None:
-                    libzenlite.zl_set_sleep_report_callback(device_ptr, ZenLiteDevice.__on_sleep_report_internal)
-                    libzenlite.zl_set_sleep_stage_callback(device_ptr, ZenLiteDevice.__on_sleep_stage_internal)
-                    libzenlite.zl_set_event_callback(device_ptr, ZenLiteDevice.__on_event_internal)
-                    libzenlite.zl_set_stress_callback(device_ptr, ZenLiteDevice.__on_stress_internal)
-                    libzenlite.zl_set_meditation_callback(device_ptr, ZenLiteDevice.__on_meditation_internal)
-                    libzenlite.zl_set_eeg_data_callback(device_ptr, ZenLiteDevice.__on_eeg_data_internal)
-                    libzenlite.zl_set_imu_data_callback(device_ptr, ZenLiteDevice.__on_imu_data_internal)
-                    libzenlite.zl_set_ppg_data_callback(device_ptr, ZenLiteDevice.__on_ppg_data_internal)
-                    libzenlite.zl_set_eeg_stats_callback(device_ptr, ZenLiteDevice.__on_eeg_stats_internal)
-                    libzenlite.zl_set_error_callback(device_ptr, ZenLiteDevice.__on_error_internal)
-                    libzenlite.zl_set_connectivity_change_callback(device_ptr, ZenLiteDevice.__on_connectivity_change_internal)
-                    libzenlite.zl_set_contact_state_change_callback(device_ptr, ZenLiteDevice.__on_contact_state_change_internal)
-                    libzenlite.zl_set_orientation_change_callback(device_ptr, ZenLiteDevice.__on_orientation_change_internal)
-                    libzenlite.zl_set_blink_callback(device_ptr, ZenLiteDevice.__on_blink_internal)
-                    libzenlite.zl_set_device_info_callback(device_ptr, ZenLiteDevice.__on_device_info_internal)
-                else:
-                    libzenlite.zl_set_sleep_report_callback(device_ptr, ffi.NULL)
-                    libzenlite.zl_set_sleep_stage_callback(device_ptr, ffi.NULL)
-                    libzenlite.zl_set_event_callback(device_ptr, ffi.NULL)
-                    libzenlite.zl_set_stress_callback(device_ptr, ffi.NULL)
-                    libzenlite.zl_set_meditation_callback(device_ptr, ffi.NULL)
-                    libzenlite.zl_set_eeg_data_callback(device_ptr, ffi.NULL)
-                    libzenlite.zl_set_imu_data_callback(device_ptr, ffi.NULL)
-                    libzenlite.zl_set_ppg_data_callback(device_ptr, ffi.NULL)
-                    libzenlite.zl_set_eeg_stats_callback(device_ptr, ffi.NULL)
-                    libzenlite.zl_set_error_callback(device_ptr, ffi.NULL)
-                    libzenlite.zl_set_connectivity_change_callback(device_ptr, ffi.NULL)
-                    libzenlite.zl_set_contact_state_change_callback(device_ptr, ffi.NULL)
-                    libzenlite.zl_set_orientation_change_callback(device_ptr, ffi.NULL)
-                    libzenlite.zl_set_blink_callback(device_ptr, ffi.NULL)
-                    libzenlite.zl_set_device_info_callback(device_ptr, ffi.NULL)
-
+            self._handlers = _ListenerHandlers(listener)
+            self._set_native_callbacks()
         else:
             fatal_error("Listener does not conform to ZenLiteDeviceListener interface")
 
+    def _set_native_callbacks(self, data=True):
+        """
+        Register the callbacks with the C core, for a listener and for data streams alike; a
+        no-op before connect(). data=False clears the data callbacks only: the connectivity
+        and state callbacks stay, the device map is cleaned up on disconnection.
+        """
+        if self.__uuid in ZenLiteDevice._device_pointer_map:
+            device_ptr = ZenLiteDevice._device_pointer_map[self.__uuid]
+            libzenlite.zl_set_signal_quality_warning_callback(device_ptr, ZenLiteDevice.__on_signal_quality_warning_internal)
+            libzenlite.zl_set_sleep_report_callback(device_ptr, ZenLiteDevice.__on_sleep_report_internal)
+            libzenlite.zl_set_event_callback(device_ptr, ZenLiteDevice.__on_event_internal)
+            libzenlite.zl_set_eeg_stats_callback(device_ptr, ZenLiteDevice.__on_eeg_stats_internal)
+            libzenlite.zl_set_error_callback(device_ptr, ZenLiteDevice.__on_error_internal)
+            libzenlite.zl_set_connectivity_change_callback(device_ptr, ZenLiteDevice.__on_connectivity_change_internal)
+            libzenlite.zl_set_contact_state_change_callback(device_ptr, ZenLiteDevice.__on_contact_state_change_internal)
+            libzenlite.zl_set_orientation_change_callback(device_ptr, ZenLiteDevice.__on_orientation_change_internal)
+            libzenlite.zl_set_blink_callback(device_ptr, ZenLiteDevice.__on_blink_internal)
+            libzenlite.zl_set_device_info_callback(device_ptr, ZenLiteDevice.__on_device_info_internal)
+
+            if data:
+                libzenlite.zl_set_sleep_stage_callback(device_ptr, ZenLiteDevice.__on_sleep_stage_internal)
+                libzenlite.zl_set_stress_callback(device_ptr, ZenLiteDevice.__on_stress_internal)
+                libzenlite.zl_set_meditation_callback(device_ptr, ZenLiteDevice.__on_meditation_internal)
+                libzenlite.zl_set_eeg_data_callback(device_ptr, ZenLiteDevice.__on_eeg_data_internal)
+                libzenlite.zl_set_imu_data_callback(device_ptr, ZenLiteDevice.__on_imu_data_internal)
+                libzenlite.zl_set_ppg_data_callback(device_ptr, ZenLiteDevice.__on_ppg_data_internal)
+            else:
+                libzenlite.zl_set_sleep_stage_callback(device_ptr, ffi.NULL)
+                libzenlite.zl_set_stress_callback(device_ptr, ffi.NULL)
+                libzenlite.zl_set_meditation_callback(device_ptr, ffi.NULL)
+                libzenlite.zl_set_eeg_data_callback(device_ptr, ffi.NULL)
+                libzenlite.zl_set_imu_data_callback(device_ptr, ffi.NULL)
+                libzenlite.zl_set_ppg_data_callback(device_ptr, ffi.NULL)
+
     def clamp(self, num, min_value, max_value):
         return max(min(num, max_value), min_value)
 
@@ -834,9 +1211,9 @@ class ZenLiteDevice(ZenLiteDeviceListener):
             device_ptr = libzenlite.zl_connect_ble(self.__get_c_ble_info())
             if device_ptr is not ffi.NULL:
                 ZenLiteDevice._device_pointer_map[self.__uuid] = device_ptr
-        # Make sure listeners are set to the C core
-        if self.__listener is not None:
-            self.set_listener(self.__listener)
+        # Make sure the callbacks of the listener and the open streams are set to the C core
+        if self.__listener is not None or self._streams:
+            self._set_native_callbacks()
 
     def disconnect(self):
         if self.connectivity is not Connectivity.disconnected or self.connectivity is not Connectivity.disconnecting:
@@ -889,9 +1266,9 @@ class ZenLiteDevice(ZenLiteDeviceListener):
                 if c_resp.n_errors > 0:
                     err = AFEConfigError(ffi.unpack(c_resp.errors, c_resp.n_errors)[0])
 
-                cb = ZenLiteDevice._config_response_callbacks[msg_id]
-                cb(device, AFEConfigResponse(err))
-                del ZenLiteDevice._config_response_callbacks[msg_id]
+                cb = ZenLiteDevice._pop_response_callback(msg_id)
+                if cb is not None:
+                    cb(device, AFEConfigResponse(err))
 
     @staticmethod
     @ffi.callback("void(char*, unsigned int, ConfigResp*)")
@@ -904,9 +1281,9 @@ class ZenLiteDevice(ZenLiteDeviceListener):
                 if c_resp.n_errors > 0:
                     err = IMUConfigError(ffi.unpack(c_resp.errors, c_resp.n_errors)[0])
 
-                cb = ZenLiteDevice._config_response_callbacks[msg_id]
-                cb(device, IMUConfigResponse(err))
-                del ZenLiteDevice._config_response_callbacks[msg_id]
+                cb = ZenLiteDevice._pop_response_callback(msg_id)
+                if cb is not None:
+                    cb(device, IMUConfigResponse(err))
 
     @staticmethod
     @ffi.callback("void(char*, unsigned int, ConfigResp*)")
@@ -917,205 +1294,247 @@ class ZenLiteDevice(ZenLiteDeviceListener):
                 device = ZenLiteDevice._device_map[uuid]
                 cmd = ffi.unpack(c_resp.cmds, c_resp.n_errors)[0]
                 err = ffi.unpack(c_resp.errors, c_resp.n_errors)[0]
-                cb = ZenLiteDevice._config_response_callbacks[msg_id]
+                cb = ZenLiteDevice._pop_response_callback(msg_id)
                 if cb is not None:
                     cb(device, SysConfigResponse(ZenLiteCommand(cmd), SysConfigError(err)))
 
-                del ZenLiteDevice._config_response_callbacks[msg_id]
-
     @staticmethod
     @ffi.callback("void(char*, unsigned int, SysInfoData*)")
     def __on_sys_info_internal(uuid_ptr, msg_id, c_data):
         uuid = ffi.string(uuid_ptr, 40).decode("utf-8")
         if uuid in ZenLiteDevice._device_map:
             device = ZenLiteDevice._device_map[uuid]
-            if device._sys_info_cb is not None:
+            # take the callback out first: the callback may start the next zl_get_sys_info
+            sys_info_cb, device._sys_info_cb = device._sys_info_cb, None
+            if sys_info_cb is not None:
                 firmware_info = ffi.string(c_data.firmware_info).decode("utf-8")  # TODO: Validate firmware info is properly unpacked
                 c_errors = ffi.unpack(c_data.hardware_errors, c_data.n_errors)
                 hardware_errors = []
                 for err in c_errors:
                     hardware_errors.append(HardwareError(err))
-                device._sys_info_cb(device, SysInfoData(firmware_info, hardware_errors))
-                device._sys_info_cb = None
+                sys_info_cb(device, SysInfoData(firmware_info, hardware_errors))
 
     @staticmethod
     @ffi.callback("void(char*, int)")
     def __on_signal_quality_warning_internal(uuid_ptr, signal_quality):
         print("Signal quality warning:%i, starting lead off detection" % signal_quality)
 
+    @staticmethod
+    def _dispatch(name, uuid_ptr, handler_name, decode, *c_args):
+        """
+        Common path of the data and state callbacks: resolve the device, decode the native
+        arguments and call the listener. Returns False when the device is unknown.
+        """
+        start = time.perf_counter_ns()
+        device = _DeviceDispatch.device(uuid_ptr)
+        if device is None:
+            return False
+        handler = getattr(device._handlers, handler_name)
+        streams = device._streams.get(name)
+        if handler is not None or streams:
+            args = decode(device, *c_args)
+            decoded = time.perf_counter_ns()
+            if streams:
+                for stream in streams:
+                    stream.push(name, args)
+            if handler is not None:
+                device._call_listener(name, handler, args)
+            device.callback_stats.record(name, decoded - start, time.perf_counter_ns() - decoded)
+        return True
+
     @staticmethod
     @ffi.callback("void(char*, BLEConnectivity)")
     def __on_connectivity_change_internal(uuid_ptr, connectivity):
-        uuid = ffi.string(uuid_ptr, 40).decode("utf-8")
-        if uuid in ZenLiteDevice._device_map:
-            device = ZenLiteDevice._device_map[uuid]
+        device = _DeviceDispatch.device(uuid_ptr)
+        if device is not None:
             connectivity_enum = Connectivity(connectivity)
-            if device.__listener is not None:
-                device.__listener.on_connectivity_change(connectivity_enum)
+            if device._handlers.on_connectivity_change is not None:
+                device._call_listener("connectivity", device._handlers.on_connectivity_change, (connectivity_enum,))
             if connectivity_enum == Connectivity.disconnected:
                 if device.__uuid in ZenLiteDevice._device_pointer_map:
                     del ZenLiteDevice._device_pointer_map[device.__uuid]
+                _DeviceDispatch.forget(device)
         else:
-            fatal_error("__on_connection_change_internal:device unavailable for:" + uuid)
+            fatal_error("__on_connection_change_internal:device unavailable for:" + _uuid_str(uuid_ptr))
 
     @staticmethod
     @ffi.callback("void(char*, EEGData*)")
     def __on_eeg_data_internal(uuid_ptr, eeg_data_ptr):
-        uuid = ffi.string(uuid_ptr, 40).decode("utf-8")
-        if uuid in ZenLiteDevice._device_map:
-            device = ZenLiteDevice._device_map[uuid]
-            if device.__listener is not None:
-                device.__listener.on_eeg_data(EEGData(eeg_data_ptr[0]))
-        else:
-            fatal_error("__eeg_data_internal:device unavailable for:" + uuid)
+        if not ZenLiteDevice._dispatch("eeg", uuid_ptr, "on_eeg_data", _decode_eeg, eeg_data_ptr):
+            fatal_error("__eeg_data_internal:device unavailable for:" + _uuid_str(uuid_ptr))
 
     @staticmethod
     @ffi.callback("void(char*, IMUData*)")
     def __on_imu_data_internal(uuid_ptr, imu_data_ptr):
-        uuid = ffi.string(uuid_ptr, 40).decode("utf-8")
-        if uuid in ZenLiteDevice._device_map:
-            device = ZenLiteDevice._device_map[uuid]
-            if device.__listener is not None:
-                device.__listener.on_imu_data(IMUData(imu_data_ptr[0]))
-        else:
-            fatal_error("__on_imu_data_internal:device unavailable for:" + uuid)
+        if not ZenLiteDevice._dispatch("imu", uuid_ptr, "on_imu_data", _decode_imu, imu_data_ptr):
+            fatal_error("__on_imu_data_internal:device unavailable for:" + _uuid_str(uuid_ptr))
 
     @staticmethod
     @ffi.callback("void(char*, PPGData*)")
     def __on_ppg_data_internal(uuid_ptr, ppg_data_ptr):
-        uuid = ffi.string(uuid_ptr, 40).decode("utf-8")
-        if uuid in ZenLiteDevice._device_map:
-            device = ZenLiteDevice._device_map[uuid]
-            if device.__listener is not None:
-                device.__listener.on_ppg_data(PPGData(ppg_data_ptr[0]))
-        else:
-            fatal_error("__ppg_data_internal:device unavailable for:" + uuid)
+        if not ZenLiteDevice._dispatch("ppg", uuid_ptr, "on_ppg_data", _decode_ppg, ppg_data_ptr):
+            fatal_error("__ppg_data_internal:device unavailable for:" + _uuid_str(uuid_ptr))
 
     @staticmethod
     @ffi.callback("void(char*, SleepReport*)")
     def __on_sleep_report_internal(uuid_ptr, data_str):
-        uuid = ffi.string(uuid_ptr, 40).decode("utf-8")
-        if uuid in ZenLiteDevice._device_map:
-            device = ZenLiteDevice._device_map[uuid]
-            if device.__listener is not None:
-                device.__listener.on_sleep_report(SleepReport(data_str[0]))
-        else:
-            fatal_error("__sleep_report_internal:device unavailable for:" + uuid)
+        if not ZenLiteDevice._dispatch("sleep_report", uuid_ptr, "on_sleep_report", _decode_sleep_report, data_str):
+            fatal_error("__sleep_report_internal:device unavailable for:" + _uuid_str(uuid_ptr))
 
     @staticmethod
     @ffi.callback("void(char*, int)")
     def __on_event_internal(uuid_ptr, event):
-        uuid = ffi.string(uuid_ptr, 40).decode("utf-8")
-        if uuid in ZenLiteDevice._device_map:
-            device = ZenLiteDevice._device_map[uuid]
-            if device.__listener is not None:
-                device.__listener.on_event(ZLEvent(event))
-        else:
-            fatal_error("__event_internal:device unavailable for:" + uuid)
+        if not ZenLiteDevice._dispatch("event", uuid_ptr, "on_event", _decode_event, event):
+            fatal_error("__event_internal:device unavailable for:" + _uuid_str(uuid_ptr))
 
     @staticmethod
     @ffi.callback("void(char*, float)")
     def __on_stress_internal(uuid_ptr, stress):
-        uuid = ffi.string(uuid_ptr, 40).decode("utf-8")
-        if uuid in ZenLiteDevice._device_map:
-            device = ZenLiteDevice._device_map[uuid]
-            if device.__listener is not None:
-                device.__listener.on_stress(stress)
-        else:
-            fatal_error("__stress_internal:device unavailable for:" + uuid)
+        if not ZenLiteDevice._dispatch("stress", uuid_ptr, "on_stress", _decode_value, stress):
+            fatal_error("__stress_internal:device unavailable for:" + _uuid_str(uuid_ptr))
 
     @staticmethod
     @ffi.callback("void(char*, float)")
     def __on_meditation_internal(uuid_ptr, meditation):
-        uuid = ffi.string(uuid_ptr, 40).decode("utf-8")
-        if uuid in ZenLiteDevice._device_map:
-            device = ZenLiteDevice._device_map[uuid]
-            if device.__listener is not None:
-                device.__listener.on_meditation(meditation)
-        else:
-            fatal_error("__meditation_internal:device unavailable for:" + uuid)
+        if not ZenLiteDevice._dispatch("meditation", uuid_ptr, "on_meditation", _decode_value, meditation):
+            fatal_error("__meditation_internal:device unavailable for:" + _uuid_str(uuid_ptr))
 
     @staticmethod
     @ffi.callback("void(char*, SleepStage, float, float)")
     def __on_sleep_stage_internal(uuid_ptr, stage, conf, drowsiness):
-        uuid = ffi.string(uuid_ptr, 40).decode("utf-8")
-        if uuid in ZenLiteDevice._device_map:
-            device = ZenLiteDevice._device_map[uuid]
-            if device.__listener is not None:
-                device.__listener.on_sleep_stage(SleepStage(stage), conf, drowsiness)
-        else:
-            fatal_error("__meditation_internal:device unavailable for:" + uuid)
+        if not ZenLiteDevice._dispatch("sleep_stage", uuid_ptr, "on_sleep_stage", _decode_sleep_stage, stage, conf, drowsiness):
+            fatal_error("__meditation_internal:device unavailable for:" + _uuid_str(uuid_ptr))
 
     @staticmethod
     @ffi.callback("void(char*, EEGStats*)")
     def __on_eeg_stats_internal(uuid_ptr, eeg_stats_ptr):
-        uuid = ffi.string(uuid_ptr, 40).decode("utf-8")
-        if uuid in ZenLiteDevice._device_map:
-            device = ZenLiteDevice._device_map[uuid]
-            if device.__listener is not None:
-                device.__listener.on_brain_wave(BrainWave(eeg_stats_ptr[0]))
-        else:
-            fatal_error("__eeg_stats_internal:device unavailable for:" + uuid)
+        if not ZenLiteDevice._dispatch("brain_wave", uuid_ptr, "on_brain_wave", _decode_brain_wave, eeg_stats_ptr):
+            fatal_error("__eeg_stats_internal:device unavailable for:" + _uuid_str(uuid_ptr))
 
     @staticmethod
     @ffi.callback("void(char*, int)")
     def __on_error_internal(uuid_ptr, error_code):
-        uuid = ffi.string(uuid_ptr, 40).decode("utf-8")
-        if uuid in ZenLiteDevice._device_map:
-            device = ZenLiteDevice._device_map[uuid]
-            if device.__listener is not None:
-                device.__listener.on_error(ZLError(error_code))
-        else:
-            fatal_error("__on_error_internal:device unavailable for:" + uuid)
+        if not ZenLiteDevice._dispatch("error", uuid_ptr, "on_error", _decode_error, error_code):
+            fatal_error("__on_error_internal:device unavailable for:" + _uuid_str(uuid_ptr))
 
     @staticmethod
     @ffi.callback("void(char*, ContactState)")
     def __on_contact_state_change_internal(uuid_ptr, contact_state):
-        uuid = ffi.string(uuid_ptr, 40).decode("utf-8")
-        if uuid in ZenLiteDevice._device_map:
-            device = ZenLiteDevice._device_map[uuid]
-            if device.__listener is not None:
-                device.__listener.on_contact_state_change(ContactState(contact_state))
-        else:
-            fatal_error("__on_contact_state_change_internal:device unavailable for:" + uuid)
+        if not ZenLiteDevice._dispatch("contact_state", uuid_ptr, "on_contact_state_change", _decode_contact_state, contact_state):
+            fatal_error("__on_contact_state_change_internal:device unavailable for:" + _uuid_str(uuid_ptr))
 
     @staticmethod
     @ffi.callback("void(char*, DeviceOrientation)")
     def __on_orientation_change_internal(uuid_ptr, orientation):
-        uuid = ffi.string(uuid_ptr, 40).decode("utf-8")
-        if uuid in ZenLiteDevice._device_map:
-            device = ZenLiteDevice._device_map[uuid]
-            if device.__listener is not None:
-                device.__listener.on_orientation_change(Orientation(orientation))
-        else:
-            fatal_error("__on_orientation_change_internal:device unavailable for:" + uuid)
+        if not ZenLiteDevice._dispatch("orientation", uuid_ptr, "on_orientation_change", _decode_orientation, orientation):
+            fatal_error("__on_orientation_change_internal:device unavailable for:" + _uuid_str(uuid_ptr))
 
     @staticmethod
     @ffi.callback("void(char*)")
     def __on_blink_internal(uuid_ptr):
-        uuid = ffi.string(uuid_ptr, 40).decode("utf-8")
-        if uuid in ZenLiteDevice._device_map:
-            device = ZenLiteDevice._device_map[uuid]
-            if device.__listener is not None:
-                device.__listener.on_blink()
-        else:
-            fatal_error("__on_blink_internal:device unavailable for:" + uuid_ptr)
+        if not ZenLiteDevice._dispatch("blink", uuid_ptr, "on_blink", _decode_none):
+            fatal_error("__on_blink_internal:device unavailable for:" + _uuid_str(uuid_ptr))
 
     @staticmethod
     @ffi.callback("void(char*, BLEDeviceInfo*)")
     def __on_device_info_internal(uuid_ptr, c_info):
-        uuid = ffi.string(uuid_ptr, 40).decode("utf-8")
-        if uuid in ZenLiteDevice._device_map:
-            device = ZenLiteDevice._device_map[uuid]
-            if device.__listener is not None:
-                device.__listener.on_device_info_ready(DeviceInfo(c_info))
+        if not ZenLiteDevice._dispatch("device_info", uuid_ptr, "on_device_info_ready", _decode_device_info, c_info):
+            fatal_error("__on_device_info_ready_internal:device unavailable for:" + _uuid_str(uuid_ptr))
+
+
+# Decoders of the native callback arguments into listener arguments, used by ZenLiteDevice._dispatch
+def _decode_eeg(device, eeg_data_ptr):
+    if (device._delivery is not None or device._streams) and ZenLiteSDK.array_mode != ArrayMode.legacy:
+        # queued / streamed packets outlive the callback and the next packet: give them their own array
+        return EEGData(eeg_data_ptr[0], ArrayMode.copy),
+    return EEGData(eeg_data_ptr[0], ZenLiteSDK.array_mode, device._eeg_out),
+
+
+def _decode_imu(device, imu_data_ptr):
+    return IMUData(imu_data_ptr[0]),
+
+
+def _decode_ppg(device, ppg_data_ptr):
+    return PPGData(ppg_data_ptr[0]),
+
+
+def _decode_sleep_report(device, data_ptr):
+    return SleepReport(data_ptr[0]),
+
+
+def _decode_event(device, event):
+    return ZLEvent(event),
+
+
+def _decode_value(device, value):
+    return value,
+
+
+def _decode_sleep_stage(device, stage, conf, drowsiness):
+    return SleepStage(stage), conf, drowsiness
+
+
+def _decode_brain_wave(device, eeg_stats_ptr):
+    return BrainWave(eeg_stats_ptr[0]),
+
+
+def _decode_error(device, error_code):
+    return ZLError(error_code),
+
+
+def _decode_contact_state(device, contact_state):
+    return ContactState(contact_state),
+
+
+def _decode_orientation(device, orientation):
+    return Orientation(orientation),
+
+
+def _decode_none(device):
+    return ()
+
+
+def _decode_device_info(device, c_info):
+    return DeviceInfo(c_info),
+
+
+# Combine (callback name, listener args, host time) items of a DataStream into one block
+def _combine_eeg(items):
+    return np.concatenate([np.asarray(args[0].eeg_data, dtype=np.float32) for _, args, _ in items])
+
+
+def _combine_imu(items):
+    return np.concatenate([args[0].to_records() for _, args, _ in items])
+
+
+def _combine_ppg(items):
+    raw = [args[0].raw for _, args, _ in items if args[0].raw is not None]
+    algo = [args[0].algo for _, args, _ in items if args[0].algo is not None]
+    return {"raw": np.concatenate(raw) if raw else None, "algo": np.concatenate(algo) if algo else None}
+
+
+def _combine_algo(items):
+    records = np.empty(len(items), dtype=ALGO_DTYPE)
+    for field in ("stress", "meditation", "conf", "drowsiness"):
+        records[field] = np.nan
+    records["stage"] = SleepStage.unknown
+    for record, (name, args, timestamp) in zip(records, items):
+        record["time"] = timestamp
+        if name == "sleep_stage":
+            record["stage"], record["conf"], record["drowsiness"] = args
         else:
-            fatal_error("__on_device_info_ready_internal:device unavailable for:" + uuid_ptr)
+            record[name] = args[0]
+    return records
 
 
 class ZenLiteSDK:
     _on_found_device = None
     _on_scan_error = None
+    array_mode = ArrayMode.legacy
+
+    @classmethod
+    def set_array_mode(cls, mode):
+        cls.array_mode = ArrayMode(mode)
 
     @staticmethod
     def dispose():
@@ -1151,6 +1570,7 @@ class ZenLiteSDK:
 
     @classmethod
     def filter(cls, sdk_filter, signal):
+        # one native call per value, not available on Linux; zenlite_filter.FilterBank filters whole packets
         return libzenlite.dev_filter(sdk_filter, signal)
 
     # TEST Methods
@@ -0,0 +1,347 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from zenlite_sdk import *
+from zen_logger import ZLOG
+
+_EEG_SAMPLE_RATE_HZ = {
+    EEGSampleRate.sr128: 128,
+    EEGSampleRate.sr256: 256,
+}
+
+_PPG_REPORT_RATE_HZ = {
+    PPGReportRate.sr1: 1,
+    PPGReportRate.sr5: 5,
+    PPGReportRate.sr25: 25,
+    PPGReportRate.sr50: 50,
+    PPGReportRate.sr100: 100,
+}
+
+
+class StreamProfile:
+    """Sample rates and modes applied to every device of a session once it is paired"""
+
+    def __init__(self, eeg_rate=EEGSampleRate.sr256,
+                 imu_rate=IMUSampleRate.sr50, imu_mode=IMUMode.acc_gyro,
+                 ppg_rate=PPGReportRate.sr25, ppg_mode=PPGMode.algo):
+        self.eeg_rate = EEGSampleRate(eeg_rate)
+        self.imu_rate = IMUSampleRate(imu_rate)
+        self.imu_mode = IMUMode(imu_mode)
+        self.ppg_rate = PPGReportRate(ppg_rate)
+        self.ppg_mode = PPGMode(ppg_mode)
+
+    def commands(self, device):
+        """(name, send) pairs that configure device; send(cb) issues the command"""
+        return [
+            ("config_afe", lambda cb: device.zl_config_afe(self.eeg_rate, cb)),
+            ("config_imu", lambda cb: device.zl_config_imu(self.imu_rate, self.imu_mode, cb)),
+            ("config_ppg", lambda cb: device.zl_config_ppg(self.ppg_rate, self.ppg_mode, 0, 0, cb)),
+        ]
+
+    def capacity(self, seconds):
+        """Samples per stream needed to hold `seconds` of data"""
+        return {
+            "eeg": int(seconds * _EEG_SAMPLE_RATE_HZ.get(self.eeg_rate, 256)),
+            "imu": int(seconds * IMU_SAMPLE_RATE_HZ.get(self.imu_rate, 50)),
+            "ppg": int(seconds * _PPG_REPORT_RATE_HZ.get(self.ppg_rate, 25)),
+        }
+
+
+class SampleWindow:
+    """
+    The most recent `capacity` samples of one stream, kept as the packets that arrived
+    (no copy on append). read() concatenates them into one array.
+    """
+
+    def __init__(self, capacity, dtype):
+        self.capacity = max(1, capacity)
+        self.dtype = np.dtype(dtype)
+        self._blocks = deque()
+        self._size = 0
+        self.total = 0  # samples appended since creation
+        self._lock = threading.Lock()
+
+    def append(self, block):
+        if not len(block):
+            return
+        with self._lock:
+            self._blocks.append(block)
+            self._size += len(block)
+            self.total += len(block)
+            while self._size - len(self._blocks[0]) >= self.capacity:
+                self._size -= len(self._blocks.popleft())
+
+    def read(self):
+        with self._lock:
+            blocks = list(self._blocks)
+        if not blocks:
+            return np.empty(0, dtype=self.dtype)
+        return np.concatenate(blocks)[-self.capacity:]
+
+    def __len__(self):
+        return min(self._size, self.capacity)
+
+
+class ProfileListener(ZenLiteDeviceListener):
+    """
+    Base of the listeners that own a device: pairs the device once it is connected, applies
+    the StreamProfile (`ready` is set when every command succeeded, failures go to `errors`)
+    and forwards every callback to `recorder` and then to the observers, objects with
+    ZenLiteDeviceListener method names (see add_observer()).
+
+    Subclasses handle the data callbacks and call _forward() themselves.
+    """
+
+    def __init__(self, device, profile=None, recorder=None, configure=True):
+        self.device = device
+        self.profile = profile or StreamProfile()
+        self.recorder = recorder
+        self.configure = configure
+        self.ready = threading.Event()
+        self.errors = []
+        self._pending = set()
+        self._observers = ()
+        self.contact_state = ContactState.unknown
+        self.connectivity = Connectivity.disconnected
+
+    def add_observer(self, observer):
+        self._observers += (observer,)
+
+    def remove_observer(self, observer):
+        self._observers = tuple(o for o in self._observers if o is not observer)
+
+    def _forward(self, name, *args):
+        recorder = self.recorder
+        if recorder is not None:
+            handler = getattr(recorder, name, None)
+            if handler is not None:
+                handler(*args)
+        for observer in self._observers:
+            handler = getattr(observer, name, None)
+            if handler is not None:
+                handler(*args)
+
+    # connection and configuration
+    def on_connectivity_change(self, connectivity):
+        self.connectivity = connectivity
+        ZLOG.LOG_INFO("[%s] connectivity: %s" % (self.device.name, connectivity.name))
+        if connectivity == Connectivity.connected:
+            self.ready.clear()
+            if self.configure:
+                self.device.zl_pair(self.device.in_pairing_mode, self._on_pair_response)
+        self._forward("on_connectivity_change", connectivity)
+
+    def _on_pair_response(self, device, res):
+        if not res.success():
+            self._fail("pair", res)
+            return
+        commands = self.profile.commands(device)
+        self._pending = set(name for name, _ in commands)
+        for name, send in commands:
+            err = send(lambda d, r, name=name: self._on_config_response(name, r))
+            if err is not None and err.code != 0:
+                self._fail(name, err)
+
+    def _on_config_response(self, name, res):
+        if not res.success():
+            self._fail(name, res)
+            return
+        self._pending.discard(name)
+        if not self._pending:
+            ZLOG.LOG_INFO("[%s] stream profile applied" % self.device.name)
+            self.ready.set()
+
+    def _fail(self, command, error):
+        ZLOG.LOG_ERROR("[%s] %s failed: %s" % (self.device.name, command, getattr(error, "error", error)))
+        self.errors.append((command, error))
+
+    # state
+    def on_contact_state_change(self, contact_state):
+        self.contact_state = contact_state
+        self._forward("on_contact_state_change", contact_state)
+
+    def on_orientation_change(self, orientation):
+        self._forward("on_orientation_change", orientation)
+
+    def on_brain_wave(self, brain_wave):
+        self._forward("on_brain_wave", brain_wave)
+
+    def on_error(self, error):
+        ZLOG.LOG_ERROR("[%s] error: %s" % (self.device.name, error))
+        self._forward("on_error", error)
+
+    def on_event(self, event):
+        self._forward("on_event", event)
+
+    def on_blink(self):
+        self._forward("on_blink")
+
+    def on_sleep_report(self, pose):
+        self._forward("on_sleep_report", pose)
+
+    def on_device_info_ready(self, device_info):
+        self._forward("on_device_info_ready", device_info)
+
+
+class DevicePipeline(ProfileListener):
+    """
+    Listener of one device in a session: pairs and configures the device with the session's
+    StreamProfile, keeps its own sample windows and forwards every callback to its recorder.
+
+    Nothing is shared between pipelines, so devices never see each other's data.
+    """
+
+    def __init__(self, device, profile, window_seconds=30, recorder=None):
+        super(DevicePipeline, self).__init__(device, profile, recorder)
+        capacity = self.profile.capacity(window_seconds)
+        self.eeg = SampleWindow(capacity["eeg"], np.float32)
+        self.imu = SampleWindow(capacity["imu"], IMU_DTYPE)
+        self.ppg_raw = SampleWindow(capacity["ppg"], PPG_RAW_DTYPE)
+        self.ppg_algo = SampleWindow(capacity["ppg"], PPG_ALGO_DTYPE)
+        self.algo = SampleWindow(int(window_seconds), ALGO_DTYPE)
+
+    # data
+    def on_eeg_data(self, eeg_data):
+        self.eeg.append(np.array(eeg_data.eeg_data, dtype=np.float32))
+        self._forward("on_eeg_data", eeg_data)
+
+    def on_imu_data(self, imu_data):
+        self.imu.append(imu_data.to_records())
+        self._forward("on_imu_data", imu_data)
+
+    def on_ppg_data(self, ppg_data):
+        if ppg_data.raw is not None:
+            self.ppg_raw.append(ppg_data.raw)
+        if ppg_data.algo is not None:
+            self.ppg_algo.append(ppg_data.algo)
+        self._forward("on_ppg_data", ppg_data)
+
+    def on_stress(self, stress):
+        self._append_algo(stress=stress)
+        self._forward("on_stress", stress)
+
+    def on_meditation(self, meditation):
+        self._append_algo(meditation=meditation)
+        self._forward("on_meditation", meditation)
+
+    def on_sleep_stage(self, stage, conf, drowsiness):
+        self._append_algo(stage=stage, conf=conf, drowsiness=drowsiness)
+        self._forward("on_sleep_stage", stage, conf, drowsiness)
+
+    def _append_algo(self, **values):
+        record = np.empty(1, dtype=ALGO_DTYPE)
+        for field in ("stress", "meditation", "conf", "drowsiness"):
+            record[field] = np.nan
+        record["stage"] = SleepStage.unknown
+        record["time"] = time.time()
+        for field, value in values.items():
+            record[field] = value
+        self.algo.append(record)
+
+    def stats(self):
+        return {
+            "name": self.device.name,
+            "connectivity": self.connectivity.name,
+            "ready": self.ready.is_set(),
+            "errors": len(self.errors),
+            "samples": {"eeg": self.eeg.total, "imu": self.imu.total, "ppg_raw": self.ppg_raw.total,
+                        "ppg_algo": self.ppg_algo.total, "algo": self.algo.total},
+            "callbacks": self.device.callback_stats.snapshot(),
+        }
+
+
+class SessionManager:
+    """
+    Runs several headsets in one process: one scan, then one DevicePipeline per device.
+
+    recorder_factory(device), when given, is called once per device and its result receives
+    every callback of that device (any object with ZenLiteDeviceListener method names; a
+    close() method is called by stop()).
+
+    pipeline_factory(device, profile, recorder) replaces DevicePipeline, e.g. with the
+    AcquisitionCore of zenlite_acquisition; it must return a ProfileListener.
+
+        session = SessionManager(StreamProfile(eeg_rate=EEGSampleRate.sr256))
+        session.start(count=4, timeout=15)
+        session.wait_ready(timeout=20)
+        eeg = session.pipelines[uuid].eeg.read()
+        session.stop()
+    """
+
+    def __init__(self, profile=None, window_seconds=30, recorder_factory=None, pipeline_factory=None):
+        self.profile = profile or StreamProfile()
+        self.window_seconds = window_seconds
+        self.recorder_factory = recorder_factory
+        self.pipeline_factory = pipeline_factory
+        self.pipelines = {}  # uuid -> DevicePipeline (or pipeline_factory result)
+
+    def scan(self, count=None, names=None, timeout=10.0):
+        """
+        Scan until `count` devices (or every device in `names`) were found, or until timeout.
+        Returns the devices in the order they were found.
+        """
+        names = set(names) if names else None
+        found = {}
+        done = threading.Event()
+
+        def on_found_device(device):
+            if device.uuid in found or (names is not None and device.name not in names):
+                return
+            found[device.uuid] = device
+            ZLOG.LOG_INFO("session: found %s (%d)" % (device.name, len(found)))
+            if (count is not None and len(found) >= count) or \
+                    (names is not None and names <= set(d.name for d in found.values())):
+                done.set()
+
+        ZenLiteSDK.start_scan(on_found_device)
+        try:
+            done.wait(timeout)
+        finally:
+            ZenLiteSDK.stop_scan()
+        devices = list(found.values())
+        return devices[:count] if count is not None else devices
+
+    def attach(self, device):
+        """Create the pipeline of device and install it as its listener, without connecting"""
+        pipeline = self.pipelines.get(device.uuid)
+        if pipeline is None:
+            recorder = self.recorder_factory(device) if self.recorder_factory is not None else None
+            if self.pipeline_factory is not None:
+                pipeline = self.pipeline_factory(device, self.profile, recorder)
+            else:
+                pipeline = DevicePipeline(device, self.profile, self.window_seconds, recorder)
+            self.pipelines[device.uuid] = pipeline
+            device.set_listener(pipeline)
+        return pipeline
+
+    def add(self, device):
+        """Attach a pipeline to device and connect it"""
+        pipeline = self.attach(device)
+        device.connect()
+        return pipeline
+
+    def start(self, count=None, names=None, timeout=10.0):
+        """Scan once and connect every device found; returns the pipelines"""
+        return [self.add(device) for device in self.scan(count, names, timeout)]
+
+    def wait_ready(self, timeout=None):
+        """True once every device is connected and configured"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        for pipeline in list(self.pipelines.values()):
+            if not pipeline.ready.wait(None if deadline is None else max(0.0, deadline - time.monotonic())):
+                return False
+        return True
+
+    def stop(self):
+        for pipeline in list(self.pipelines.values()):
+            if pipeline.device.connectivity != Connectivity.disconnected:
+                pipeline.device.disconnect()
+            close = getattr(pipeline.recorder, "close", None)
+            if close is not None:
+                close()
+
+    def stats(self):
+        return {uuid: pipeline.stats() for uuid, pipeline in self.pipelines.items()}
@@ -0,0 +1,133 @@
+import threading
+
+import numpy as np
+from scipy.signal import get_window
+
+from zenlite_ring import RingBuffer
+
+# Hz, [low, high)
+EEG_BANDS = {
+    "delta": (1.0, 4.0),
+    "theta": (4.0, 8.0),
+    "alpha": (8.0, 13.0),
+    "beta": (13.0, 30.0),
+    "gamma": (30.0, 45.0),
+}
+
+
+class WelchSpectrum:
+    """
+    Streaming Welch power spectral density of one channel.
+
+    Samples are fed as they arrive; every `hop` samples the last `segment` samples are
+    detrended (mean removed), windowed and transformed with rfft, and the periodogram
+    replaces the oldest one of a running average over `average_seconds`. The cost of
+    feed() is one rfft of `segment` samples per hop, independent of the averaging span.
+
+      segment_seconds  length of one periodogram (frequency resolution 1 / segment_seconds)
+      overlap          fraction of a segment shared with the next one (0.5 = Welch default)
+      average_seconds  span of the average, e.g. the 5 s EEG plot window
+      window           scipy.signal.get_window name, computed once per sample rate
+
+    psd() is in units^2 / Hz (scipy.signal.welch scaling="density"), band_powers() in units^2.
+    The sample rate may be given later, with the first feed(); a new rate restarts the average.
+    """
+
+    def __init__(self, sample_rate=None, segment_seconds=2.0, overlap=0.5, average_seconds=5.0,
+                 window="hann", bands=EEG_BANDS):
+        if not 0.0 <= overlap < 1.0:
+            raise ValueError("overlap must be in [0, 1)")
+        self.segment_seconds = segment_seconds
+        self.overlap = overlap
+        self.average_seconds = average_seconds
+        self.window = window
+        self.bands = dict(bands)
+        self.sample_rate = None
+        self.version = 0  # periodograms added since creation
+        self._lock = threading.Lock()
+        if sample_rate:
+            self._configure(sample_rate)
+
+    def _configure(self, sample_rate):
+        self.sample_rate = float(sample_rate)
+        self.segment = n = max(8, int(round(self.segment_seconds * self.sample_rate)))
+        self.hop = max(1, int(round(n * (1.0 - self.overlap))))
+        self._window = get_window(self.window, n)
+        self.freqs = np.fft.rfftfreq(n, 1.0 / self.sample_rate)
+        self.freqs.flags.writeable = False
+        # one-sided density: every bin but DC (and Nyquist for even n) counts twice
+        self._scale = np.full(len(self.freqs), 2.0 / (self.sample_rate * np.sum(self._window ** 2)))
+        self._scale[0] /= 2.0
+        if n % 2 == 0:
+            self._scale[-1] /= 2.0
+        df = self.freqs[1]
+        self._band_masks = {name: ((self.freqs >= low) & (self.freqs < high), df)
+                            for name, (low, high) in self.bands.items()}
+        count = max(1, (int(self.average_seconds * self.sample_rate) - n) // self.hop + 1)
+        self._periodograms = np.zeros((count, len(self.freqs)))
+        self._sum = np.zeros(len(self.freqs))
+        self._next = 0
+        self._count = 0
+        self._samples = RingBuffer(n)
+        self._until_segment = n
+
+    def feed(self, samples, sample_rate=None):
+        """Add new samples; returns the number of periodograms that were added"""
+        samples = np.asarray(samples, dtype=np.float64).reshape(-1)
+        with self._lock:
+            if sample_rate and sample_rate != self.sample_rate:
+                self._configure(sample_rate)
+            if self.sample_rate is None:
+                raise ValueError("sample rate unknown, pass it to the constructor or the first feed()")
+            added = 0
+            pos = 0
+            while pos < len(samples):
+                k = min(len(samples) - pos, self._until_segment)
+                self._samples.append(samples[pos:pos + k])
+                pos += k
+                self._until_segment -= k
+                if self._until_segment == 0:
+                    self._add(self._samples.view())
+                    self._until_segment = self.hop
+                    added += 1
+            self.version += added
+            return added
+
+    def _add(self, segment):
+        spectrum = np.fft.rfft((segment - segment.mean()) * self._window)
+        periodogram = (spectrum.real ** 2 + spectrum.imag ** 2) * self._scale
+        self._sum += periodogram - self._periodograms[self._next]
+        self._periodograms[self._next] = periodogram
+        self._next = (self._next + 1) % len(self._periodograms)
+        self._count = min(self._count + 1, len(self._periodograms))
+        if self._next == 0:
+            # once per cycle, drop the rounding errors the subtractions accumulated
+            self._sum = self._periodograms.sum(axis=0)
+
+    def psd(self):
+        """Averaged power spectral density at self.freqs, None before the first full segment"""
+        with self._lock:
+            return self._psd()
+
+    def _psd(self):
+        return self._sum / self._count if self._count else None
+
+    def band_powers(self, psd=None):
+        """{band: power}, the PSD integrated over each band of self.bands"""
+        if psd is None:
+            psd = self.psd()
+        if psd is None:
+            return None
+        return {name: float(psd[mask].sum() * df) for name, (mask, df) in self._band_masks.items()}
+
+    def snapshot(self, since=None):
+        """
+        (version, {"freqs", "psd", "bands"}) with read-only arrays, or (since, None) if no
+        periodogram was added since version `since`.
+        """
+        with self._lock:
+            if self.version == since or not self._count:
+                return since, None
+            psd = self._psd()
+            psd.flags.writeable = False
+            return self.version, {"freqs": self.freqs, "psd": psd, "bands": self.band_powers(psd)}
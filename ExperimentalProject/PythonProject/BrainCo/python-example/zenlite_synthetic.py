@@ -0,0 +1,632 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+
+import numpy as np
+
+from zen_logger import ZLOG
+
+# C enum values of zenlite_sdk.h; this module is loaded while zenlite_sdk is being imported
+_EEG_RATE_HZ = {2: 128, 3: 256}
+_IMU_RATE_HZ = {2: 25, 3: 50, 4: 100, 5: 200, 6: 400, 7: 800}
+_PPG_RATE_HZ = {2: 1, 3: 5, 4: 25, 5: 50, 6: 100}
+_IMU_ACC, _IMU_GYRO, _IMU_ACC_GYRO, _IMU_EULER = 1, 2, 3, 4
+_PPG_RAW, _PPG_ALGO, _PPG_SPO2, _PPG_HR, _PPG_HRV = 1, 2, 3, 4, 5
+
+_CONNECTING, _CONNECTED, _DISCONNECTING, _DISCONNECTED = 0, 1, 2, 3
+_CONTACT_UNKNOWN, _CONTACT_OFF, _CONTACT_EEG, _CONTACT_ALL = 0, 1, 2, 3
+_ORIENTATION_UPWARD = 1
+_PPG_ON_SKIN, _PPG_OFF_SKIN = 3, 1
+_SPO2_SUCCESS = 2
+
+_EEG_PACKETS_PER_SECOND = 16
+_IMU_PACKETS_PER_SECOND = 25
+_PPG_PACKETS_PER_SECOND = 5
+_RESPONSE_DELAY = 0.05  # simulated seconds between a command and its response
+
+_ERROR_MESSAGES = {0: "OK", -1: "Unknown error", -2: "Invalid params", -3: "Invalid data",
+                   -11: "System is busy", -160: "Device not connected"}
+
+_BANDS = (("delta", 1, 4), ("theta", 4, 8), ("alpha", 8, 13),
+          ("low_beta", 13, 20), ("high_beta", 20, 30), ("gamma", 30, 45))
+
+
+class SyntheticDevice:
+    """
+    One simulated headset: connection state, stream configuration, registered callbacks and
+    the generator state of its signals. Runs on its own thread while connected.
+    """
+
+    def __init__(self, backend, index):
+        self.backend = backend
+        self.index = index
+        self.uuid = "SYNTH-%04d-0000-0000-000000000000" % index
+        self.name = "Zenlite-SIM-%02d" % (index + 1)
+        self.address = 0x5A0000000000 + index
+        # the id buffer passed to every callback, stable for the life of the device
+        self.id_ptr = backend.ffi.new("char[40]", self.uuid.encode("utf-8"))
+        self.handle = backend.ffi.cast("ZenLiteDevice *", self.id_ptr)
+        self.connectivity = _DISCONNECTED
+        self.contact_state = _CONTACT_UNKNOWN
+        self.battery_level = 80 + index % 20
+        self.callbacks = {}
+        self.rng = np.random.default_rng(backend.seed + index)
+        self._thread = None
+        self._clock = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()  # set by schedule() and disconnect() to interrupt a wait
+        self._lock = threading.Lock()
+        self._timers = []  # heap of (due, order, fn) in simulated seconds
+        self._order = itertools.count()
+        self._reset_streams()
+
+    def _reset_streams(self):
+        self.eeg_hz = 0
+        self.imu_hz = 0
+        self.imu_mode = 0
+        self.ppg_hz = 0
+        self.ppg_mode = 0
+        self.seq = {"eeg": 0, "acc": 0, "gyro": 0, "ppg": 0}
+        self.sample = {"eeg": 0, "imu": 0, "ppg": 0}
+        self._eeg_history = np.zeros(256, dtype=np.float32)
+        self._euler = np.zeros(3, dtype=np.float32)
+        self._hr = 68.0 + self.index
+        self._meditation = 50.0
+        self._drowsiness = 20.0
+
+    # connection
+    def connect(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._reset_streams()
+            self._timers = []
+            self._clock = _SimClock(self.backend.time_scale)
+            self._thread = threading.Thread(target=self._run, name="zl-synthetic-" + self.name, daemon=True)
+            self.connectivity = _CONNECTING
+            self._thread.start()
+
+    def disconnect(self):
+        if self.connectivity in (_DISCONNECTED, _DISCONNECTING):
+            return
+        self.connectivity = _DISCONNECTING
+        self._emit("connectivity", self.connectivity)
+        self._stop.set()
+        self._wake.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(2.0)
+        self.connectivity = _DISCONNECTED
+        self.contact_state = _CONTACT_UNKNOWN
+        self._emit("connectivity", self.connectivity)
+
+    def schedule(self, delay, fn):
+        """Run fn on the device thread `delay` simulated seconds from now"""
+        with self._lock:
+            heapq.heappush(self._timers, (self._now() + delay, next(self._order), fn))
+        self._wake.set()
+
+    def _now(self):
+        return self._clock.now() if self._clock is not None else 0.0
+
+    def _emit(self, name, *args):
+        cb = self.callbacks.get(name)
+        if cb is not None and cb != self.backend.ffi.NULL:
+            cb(self.id_ptr, *args)
+
+    # device thread
+    def _run(self):
+        self.schedule(0.2, self._on_connected)
+        next_due = {}  # stream -> simulated time of its next packet, active streams only
+        while not self._stop.is_set():
+            self._wake.clear()
+            with self._lock:
+                timer_due = self._timers[0][0] if self._timers else float("inf")
+            periods = self._periods()
+            for stream in list(next_due):
+                if stream not in periods:
+                    del next_due[stream]
+            for stream, period in periods.items():
+                if stream not in next_due:
+                    # packets start one period after the stream is enabled
+                    next_due[stream] = self._now() + period
+            stream, due = min(next_due.items(), key=lambda item: item[1], default=(None, float("inf")))
+            due = min(due, timer_due)
+            if due == float("inf"):
+                # nothing configured yet: idle in real time, also when time_scale is 0
+                self._wake.wait(0.01)
+                continue
+            if not self._clock.sleep_until(due, self._wake):
+                # a timer was scheduled meanwhile (it may be due first) or the device stopped
+                continue
+            if timer_due <= due:
+                with self._lock:
+                    _, _, fn = heapq.heappop(self._timers)
+                fn()
+                continue
+            if stream is not None:
+                next_due[stream] = max(next_due[stream], due) + periods[stream]
+                getattr(self, "_send_" + stream)()
+        self._thread_exit()
+
+    def _thread_exit(self):
+        with self._lock:
+            self._timers = []
+
+    def _periods(self):
+        if self.connectivity != _CONNECTED:
+            return {}
+        periods = {}
+        if self.eeg_hz:
+            periods["eeg"] = 1.0 / _EEG_PACKETS_PER_SECOND
+            periods["algo"] = 1.0
+            periods["sleep_stage"] = 30.0
+        if self.imu_hz and self.imu_mode:
+            periods["imu"] = 1.0 / min(_IMU_PACKETS_PER_SECOND, self.imu_hz)
+        if self.ppg_hz and self.ppg_mode:
+            periods["ppg"] = 1.0 / min(_PPG_PACKETS_PER_SECOND, self.ppg_hz)
+        return periods
+
+    def _on_connected(self):
+        self.connectivity = _CONNECTED
+        self._emit("connectivity", _CONNECTED)
+        info = self.backend.ffi.new("BLEDeviceInfo *")
+        for field, value in (("manufacturer", b"BrainCo"), ("model", b"ZS11"),
+                             ("serial", ("SIM%013d" % self.index).encode()),
+                             ("hardware", b"1.0.0"), ("firmware", b"9.9.9-sim")):
+            setattr(info, field, value)
+        self._emit("device_info", info)
+        self._emit("orientation", _ORIENTATION_UPWARD)
+        self.schedule(0.5, lambda: self._set_contact(_CONTACT_ALL))
+        if self.backend.contact_interval:
+            self.schedule(self.backend.contact_interval, self._contact_event)
+
+    def _set_contact(self, state):
+        if state != self.contact_state:
+            self.contact_state = state
+            self._emit("contact_state", state)
+
+    def _contact_event(self):
+        # the headset slips for a few seconds, then settles again
+        self._set_contact(_CONTACT_OFF if self.rng.random() < 0.5 else _CONTACT_EEG)
+        self.schedule(2.0 + 3.0 * self.rng.random(), lambda: self._set_contact(_CONTACT_ALL))
+        self.schedule(self.backend.contact_interval * (0.5 + self.rng.random()), self._contact_event)
+
+    def _dropped(self):
+        return self.rng.random() < self.backend.dropout_rate
+
+    # signals
+    def _send_eeg(self):
+        ffi = self.backend.ffi
+        n = max(1, self.eeg_hz // _EEG_PACKETS_PER_SECOND)
+        t = (self.sample["eeg"] + np.arange(n)) / self.eeg_hz
+        self.sample["eeg"] += n
+        self.seq["eeg"] += 1
+        rng = self.rng
+        if self.contact_state in (_CONTACT_EEG, _CONTACT_ALL):
+            signal = (20.0 * np.sin(2 * np.pi * 10.0 * t) + 8.0 * np.sin(2 * np.pi * 6.0 * t + 1.0)
+                      + 4.0 * np.sin(2 * np.pi * 50.0 * t) + rng.normal(0.0, 6.0, n))
+        else:
+            signal = rng.normal(0.0, 300.0, n) + 2000.0 * np.sign(np.sin(2 * np.pi * 0.5 * t))
+        samples = signal.astype(np.float32)
+        self._eeg_history = np.concatenate((self._eeg_history[n:], samples))
+        if self._dropped():
+            return
+        buf = ffi.new("float[]", n)
+        ffi.memmove(buf, samples, samples.nbytes)
+        packet = ffi.new("EEGData *", {"sequence_num": self.seq["eeg"], "sample_rate": float(self.eeg_hz),
+                                       "eeg_data": buf, "eeg_size": n})
+        self._emit("eeg", packet)
+
+    def _points(self, values):
+        ffi = self.backend.ffi
+        values = np.ascontiguousarray(values, dtype=np.float32)
+        points = ffi.new("Point3D[]", len(values))
+        ffi.memmove(points, values, values.nbytes)
+        return points
+
+    def _send_imu(self):
+        ffi = self.backend.ffi
+        n = max(1, self.imu_hz // _IMU_PACKETS_PER_SECOND)
+        self.sample["imu"] += n
+        rng = self.rng
+        keep = []
+        init = {"sample_rate": float(self.imu_hz)}
+        if self.imu_mode in (_IMU_ACC, _IMU_ACC_GYRO):
+            self.seq["acc"] += 1
+            acc = rng.normal(0.0, 0.01, (n, 3)) + (0.0, 0.0, 1.0)  # g
+            points = self._points(acc)
+            keep.append(points)
+            init["acc_data"] = ffi.new("ACCData *", {"sequence_num": self.seq["acc"], "data": points, "size": n})
+        if self.imu_mode in (_IMU_GYRO, _IMU_ACC_GYRO):
+            self.seq["gyro"] += 1
+            points = self._points(rng.normal(0.0, 0.5, (n, 3)))  # deg/s
+            keep.append(points)
+            init["gyro_data"] = ffi.new("GyroData *", {"sequence_num": self.seq["gyro"], "data": points, "size": n})
+        if self.imu_mode == _IMU_EULER:
+            steps = np.cumsum(rng.normal(0.0, 0.05, (n, 3)), axis=0) + self._euler
+            self._euler = steps[-1].astype(np.float32)
+            columns = [ffi.new("float[]", steps[:, i].astype(np.float32).tolist()) for i in range(3)]
+            keep.extend(columns)
+            init["euler_angle_data"] = ffi.new("EulerAngleData *", {"yaw": columns[0], "pitch": columns[1],
+                                                                    "roll": columns[2], "size": n})
+        if self._dropped():
+            return
+        self._emit("imu", ffi.new("IMUData *", init))
+
+    def _send_ppg(self):
+        ffi = self.backend.ffi
+        n = max(1, self.ppg_hz // _PPG_PACKETS_PER_SECOND)
+        t = (self.sample["ppg"] + np.arange(n)) / self.ppg_hz
+        self.sample["ppg"] += n
+        self.seq["ppg"] += 1
+        rng = self.rng
+        on_skin = self.contact_state == _CONTACT_ALL
+        self._hr = float(np.clip(self._hr + rng.normal(0.0, 0.3), 50.0, 110.0))
+        init = {"sequence_num": self.seq["ppg"], "report_rate": float(self.ppg_hz)}
+        if self.ppg_mode == _PPG_RAW:
+            pulse = np.sin(2 * np.pi * self._hr / 60.0 * t) if on_skin else np.zeros(n)
+            raw = ffi.new("PPGRawData[]", n)
+            for i in range(n):
+                raw[i].green1_count = int(200000 + 3000 * pulse[i] + rng.normal(0, 50))
+                raw[i].green2_count = int(198000 + 2900 * pulse[i] + rng.normal(0, 50))
+                raw[i].ir_count = int(150000 + 1500 * pulse[i] + rng.normal(0, 50))
+                raw[i].red_count = int(120000 + 1200 * pulse[i] + rng.normal(0, 50))
+            init.update(raw_data=raw, raw_data_size=n)
+        else:
+            algo = ffi.new("PPGAlgoData[]", n)
+            for i in range(n):
+                row = algo[i]
+                row.hr = self._hr if on_skin else 0.0
+                row.hr_conf = 95 if on_skin else 0
+                row.rr = 60000.0 / self._hr
+                row.rr_conf = 100 if on_skin else 0
+                row.spo2 = float(97.5 + rng.normal(0.0, 0.3)) if on_skin else 0.0
+                row.spo2_conf = 90 if on_skin else 0
+                row.spo2_progress = 100
+                row.spo2_state = _SPO2_SUCCESS
+                row.hrv = float(45.0 + rng.normal(0.0, 2.0)) if self.ppg_mode == _PPG_HRV else -1.0
+                row.hrv_stress = -1.0
+                row.stress = -1.0
+                row.contact_state = _PPG_ON_SKIN if on_skin else _PPG_OFF_SKIN
+            init.update(algo_data=algo, algo_data_size=n)
+        if self._dropped():
+            return
+        self._emit("ppg", ffi.new("PPGData *", init))
+
+    def _send_algo(self):
+        ffi = self.backend.ffi
+        spectrum = np.abs(np.fft.rfft(self._eeg_history)) ** 2
+        freqs = np.fft.rfftfreq(len(self._eeg_history), 1.0 / max(self.eeg_hz, 1))
+        stats = ffi.new("EEGStats *")
+        for band, low, high in _BANDS:
+            setattr(stats, band, float(spectrum[(freqs >= low) & (freqs < high)].sum()))
+        self._emit("eeg_stats", stats)
+        self._meditation = float(np.clip(self._meditation + self.rng.normal(0.0, 2.0), 0.0, 100.0))
+        self._emit("meditation", self._meditation)
+        self._emit("stress", float(100.0 - self._meditation))
+        if self.rng.random() < 0.2:
+            self._emit("blink")
+
+    def _send_sleep_stage(self):
+        self._drowsiness = float(np.clip(self._drowsiness + self.rng.normal(0.0, 5.0), 0.0, 100.0))
+        self._emit("sleep_stage", 0, 80.0, self._drowsiness)
+
+    # commands
+    def respond(self, callback, msg_id, cmd=0, error=0):
+        ffi = self.backend.ffi
+
+        def send():
+            cmds = ffi.new("int[]", [cmd])
+            errors = ffi.new("int[]", [error])
+            resp = ffi.new("ConfigResp *", {"success": int(error == 0), "cmds": cmds, "errors": errors, "n_errors": 1})
+            if callback != ffi.NULL:
+                callback(self.id_ptr, msg_id, resp)
+        self.schedule(_RESPONSE_DELAY, send)
+
+    def send_sys_info(self, callback, msg_id):
+        ffi = self.backend.ffi
+
+        def send():
+            firmware = ffi.new("char[]", b"9.9.9-sim")
+            resp = ffi.new("SysInfoData *", {"firmware_info": firmware, "hardware_errors": ffi.new("int[]", [0]),
+                                             "n_errors": 0, "sleep_idle_time_sec": 0, "vibration_intensity": 50})
+            if callback != ffi.NULL:
+                callback(self.id_ptr, msg_id, resp)
+        self.schedule(_RESPONSE_DELAY * 2, send)
+
+
+class _SimClock:
+    """Simulated seconds since connect; time_scale 2.0 runs twice as fast as real time, 0 without waiting"""
+
+    def __init__(self, time_scale):
+        self.time_scale = time_scale
+        self._start = time.perf_counter()
+        self._virtual = 0.0
+
+    def now(self):
+        if self.time_scale <= 0:
+            return self._virtual
+        return (time.perf_counter() - self._start) * self.time_scale
+
+    def sleep_until(self, due, wake):
+        """Wait until simulated time `due`; False if `wake` was set before"""
+        if self.time_scale <= 0:
+            if wake.is_set():
+                return False
+            self._virtual = max(self._virtual, due)
+            return True
+        delay = (due - self.now()) / self.time_scale
+        if delay > 0:
+            return not wake.wait(delay)
+        return not wake.is_set()
+
+
+_CALLBACK_SETTERS = {
+    "zl_set_connectivity_change_callback": "connectivity",
+    "zl_set_contact_state_change_callback": "contact_state",
+    "zl_set_orientation_change_callback": "orientation",
+    "zl_set_eeg_data_callback": "eeg",
+    "zl_set_imu_data_callback": "imu",
+    "zl_set_ppg_data_callback": "ppg",
+    "zl_set_eeg_stats_callback": "eeg_stats",
+    "zl_set_stress_callback": "stress",
+    "zl_set_meditation_callback": "meditation",
+    "zl_set_attention_callback": "attention",
+    "zl_set_sleep_stage_callback": "sleep_stage",
+    "zl_set_sleep_report_callback": "sleep_report",
+    "zl_set_event_callback": "event",
+    "zl_set_blink_callback": "blink",
+    "zl_set_error_callback": "error",
+    "zl_set_device_info_callback": "device_info",
+    "zl_set_signal_quality_warning_callback": "signal_quality",
+    "zl_set_afe_config_resp_callback": "afe_config_resp",
+    "zl_set_imu_config_resp_callback": "imu_config_resp",
+    "zl_set_ppg_config_resp_callback": "ppg_config_resp",
+    "zl_set_sys_config_resp_callback": "sys_config_resp",
+    "zl_set_sys_info_callback": "sys_info",
+}
+
+
+class SyntheticBackend:
+    """
+    Pure-Python stand-in for libzenlite: the same function table, driving the same native
+    callbacks with simulated headsets. Used by zenlite_sdk on platforms without a native
+    library, or when ZENLITE_BACKEND=synthetic.
+
+      devices:          number of headsets reported by start_scan
+      time_scale:       simulated seconds per real second; 0 generates data as fast as possible
+      dropout_rate:     probability that a packet is lost (its sequence number is skipped)
+      contact_interval: mean simulated seconds between contact losses, 0 to disable
+      seed:             random seed of the signal generators
+
+    Data streams start once the corresponding zl_config_* command is sent, as on the device.
+    """
+
+    version = "1.0.0-synthetic"
+
+    def __init__(self, ffi, devices=1, time_scale=1.0, dropout_rate=0.002, contact_interval=20.0, seed=0):
+        self.ffi = ffi
+        self.time_scale = float(time_scale)
+        self.dropout_rate = float(dropout_rate)
+        self.contact_interval = float(contact_interval)
+        self.seed = seed
+        self.devices = []
+        self._by_handle = {}
+        self._strings = {}
+        self._msg_id = itertools.count(1)
+        self._scan_stop = threading.Event()
+        self._scan_thread = None
+        self.configure(devices=devices)
+
+    @classmethod
+    def from_environ(cls, ffi):
+        """Backend configured by ZENLITE_SYNTHETIC_DEVICES / _TIME_SCALE / _DROPOUT / _CONTACT_INTERVAL / _SEED"""
+        env = os.environ.get
+        return cls(ffi,
+                   devices=int(env("ZENLITE_SYNTHETIC_DEVICES", 1)),
+                   time_scale=float(env("ZENLITE_SYNTHETIC_TIME_SCALE", 1.0)),
+                   dropout_rate=float(env("ZENLITE_SYNTHETIC_DROPOUT", 0.002)),
+                   contact_interval=float(env("ZENLITE_SYNTHETIC_CONTACT_INTERVAL", 20.0)),
+                   seed=int(env("ZENLITE_SYNTHETIC_SEED", 0)))
+
+    def configure(self, devices=None, time_scale=None, dropout_rate=None, contact_interval=None):
+        """Change the simulation; new settings apply to devices connected afterwards"""
+        if time_scale is not None:
+            self.time_scale = float(time_scale)
+        if dropout_rate is not None:
+            self.dropout_rate = float(dropout_rate)
+        if contact_interval is not None:
+            self.contact_interval = float(contact_interval)
+        if devices is not None:
+            while len(self.devices) < devices:
+                device = SyntheticDevice(self, len(self.devices))
+                self.devices.append(device)
+                self._by_handle[int(self.ffi.cast("uintptr_t", device.handle))] = device
+
+    def _device(self, handle):
+        return self._by_handle.get(int(self.ffi.cast("uintptr_t", handle)))
+
+    def _string(self, value):
+        # returned char* must outlive the call
+        buf = self._strings.get(value)
+        if buf is None:
+            buf = self._strings[value] = self.ffi.new("char[]", value.encode("utf-8"))
+        return buf
+
+    def __getattr__(self, name):
+        if name in _CALLBACK_SETTERS:
+            slot = _CALLBACK_SETTERS[name]
+
+            def set_callback(handle, cb):
+                device = self._device(handle)
+                if device is None:
+                    return -160
+                device.callbacks[slot] = cb
+                return 0
+            return set_callback
+        raise AttributeError("libzenlite.%s is not available in the synthetic backend" % name)
+
+    # general
+    def zl_get_sdk_version(self):
+        return self._string(self.version)
+
+    def zl_err_code_to_msg(self, err_code):
+        return self._string(_ERROR_MESSAGES.get(err_code, "Error %d" % err_code))
+
+    def zl_gen_msg_id(self):
+        return next(self._msg_id)
+
+    def zl_set_log_callback(self, cb):
+        pass
+
+    def zl_set_log_level(self, level):
+        pass
+
+    # scanning and connection
+    def start_scan(self, cb):
+        self.stop_scan()
+        self._scan_stop = stop = threading.Event()
+
+        def scan():
+            while not stop.is_set():
+                for device in self.devices:
+                    if stop.wait(0.05):
+                        return
+                    if device.connectivity != _DISCONNECTED:
+                        continue
+                    result = self.ffi.new("BLEScanResult *")
+                    result.uuid = device.uuid.encode("utf-8")
+                    result.name = device.name.encode("utf-8")
+                    result.rssi = float(-45 - 5 * device.index + device.rng.normal(0.0, 2.0))
+                    result.address = device.address
+                    result.in_pairing_mode = False
+                    result.battery_level = bytes([device.battery_level])
+                    cb(result)
+                stop.wait(1.0)
+        self._scan_thread = threading.Thread(target=scan, name="zl-synthetic-scan", daemon=True)
+        self._scan_thread.start()
+
+    def stop_scan(self):
+        self._scan_stop.set()
+        thread = self._scan_thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(1.0)
+        self._scan_thread = None
+
+    def zl_connect_ble(self, ble_info):
+        uuid = self.ffi.string(ble_info.uuid, 40).decode("utf-8")
+        for device in self.devices:
+            if device.uuid == uuid:
+                device.connect()
+                return device.handle
+        ZLOG.LOG_WARNING("synthetic backend: unknown device " + uuid)
+        return self.ffi.NULL
+
+    def zl_create_device(self, device_id):
+        uuid = self.ffi.string(device_id).decode("utf-8")
+        for device in self.devices:
+            if device.uuid == uuid:
+                return device.handle
+        return self.ffi.NULL
+
+    def zl_disconnect_ble(self, handle):
+        device = self._device(handle)
+        if device is not None:
+            device.disconnect()
+
+    def zl_get_ble_connectivity(self, handle):
+        device = self._device(handle)
+        return device.connectivity if device is not None else _DISCONNECTED
+
+    def zl_get_contact_state(self, handle):
+        device = self._device(handle)
+        return device.contact_state if device is not None else _CONTACT_UNKNOWN
+
+    def zl_get_battery_level(self, handle):
+        device = self._device(handle)
+        return device.battery_level if device is not None else 0
+
+    def zl_get_device_name(self, handle):
+        device = self._device(handle)
+        return self._string(device.name if device is not None else "")
+
+    def zl_get_manufacturer_name(self, handle):
+        return self._string("BrainCo")
+
+    def zl_get_model_number(self, handle):
+        return self._string("ZS11")
+
+    def zl_get_serial_number(self, handle):
+        device = self._device(handle)
+        return self._string("SIM%013d" % (device.index if device is not None else 0))
+
+    def zl_get_hardware_revision(self, handle):
+        return self._string("1.0.0")
+
+    def zl_get_firmware_revision(self, handle):
+        return self._string("9.9.9-sim")
+
+    # commands: return a msg_id and answer from the device thread
+    def _command(self, handle, cb, apply=None, cmd=0):
+        device = self._device(handle)
+        if device is None or device.connectivity != _CONNECTED:
+            return -160
+        msg_id = self.zl_gen_msg_id()
+        if apply is not None:
+            apply(device)
+        device.respond(cb, msg_id, cmd)
+        return msg_id
+
+    def zl_config_afe(self, handle, sample_rate, cb):
+        def apply(device):
+            device.eeg_hz = _EEG_RATE_HZ.get(int(sample_rate), 0)
+        return self._command(handle, cb, apply)
+
+    def zl_config_imu(self, handle, sample_rate, mode, cb):
+        def apply(device):
+            device.imu_hz = _IMU_RATE_HZ.get(int(sample_rate), 0)
+            device.imu_mode = int(mode)
+        return self._command(handle, cb, apply)
+
+    def zl_config_ppg(self, handle, sample_rate, mode, raw_set_reg, raw_set_value, cb):
+        def apply(device):
+            device.ppg_hz = _PPG_RATE_HZ.get(int(sample_rate), 0)
+            device.ppg_mode = int(mode)
+        return self._command(handle, cb, apply)
+
+    def zl_sys_cmd(self, handle, cmd, cb):
+        return self._command(handle, cb, cmd=int(cmd))
+
+    def zl_pair(self, handle, in_pairing_mode, cb):
+        return self._command(handle, cb, cmd=1 if in_pairing_mode else 2)
+
+    def zl_set_device_name(self, handle, name, cb):
+        def apply(device):
+            device.name = self.ffi.string(name).decode("utf-8") if not isinstance(name, str) else name
+        return self._command(handle, cb, apply, cmd=8)
+
+    def zl_set_sleep_idle_time(self, handle, sec, cb):
+        return self._command(handle, cb, cmd=9)
+
+    def zl_set_sleep_mode(self, handle, enabled, cb):
+        return self._command(handle, cb)
+
+    def zl_get_sys_info(self, handle, cb, info_cb):
+        msg_id = self._command(handle, cb, cmd=10)
+        if msg_id > 0:
+            self._device(handle).send_sys_info(info_cb, msg_id)
+        return msg_id
+
+    # dev methods
+    def dev_create_sdk_filter(self):
+        return self.ffi.NULL
+
+    def dev_filter(self, sdk_filter, signal):
+        return signal
+
+    def dev_analyze_eeg(self, device, eeg_data, size, seg_finished):
+        pass